@@ -1,6 +1,10 @@
+import asyncio
+import importlib
 import os
 import time
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
@@ -9,12 +13,184 @@ from typing import List, Optional
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.llm_parser import LLMParser
-from services.maps_service import MapsService
-from services.mock_maps_service import MockMapsService
-from services.models import ParsedQuery, Location
+import config
+from services.models import ParsedQuery, Location, PlaceResult
+from services.search_pipeline import SearchPipeline, SearchOutcome, InvalidQueryError
+from services.pagination import ResultPages
+from services.cache import LRUCache
+from services.shared_cache import SharedCache, TieredCache
+from services.compression import EncodedBody, negotiate_encoding
+from services.serialization import JSON_MEDIA_TYPE, encode, negotiate
+from services.upstream import UpstreamUnavailableError
+from services.profiling import SearchProfiler
+from services.warm_start import CacheSnapshot, QueryLog
 
-app = FastAPI(title="Intent-Based Maps Search API", version="1.0.0")
+# Backends are imported on demand so only the configured one (and its
+# dependencies, e.g. googlemaps) is loaded
+MAPS_BACKENDS = {
+    "mock": ("services.mock_maps_service", "MockMapsService"),
+    "google": ("services.maps_service", "MapsService"),
+}
+
+
+def create_maps_service(shared_cache: Optional[SharedCache] = None):
+    """
+    Instantiate the maps backend selected by config.MAPS_BACKEND, fanned out
+    to config.MAPS_FANOUT_BACKEND when one is set
+    """
+    if config.MAPS_BACKEND not in MAPS_BACKENDS:
+        raise ValueError(f"Unknown MAPS_BACKEND: {config.MAPS_BACKEND} (expected one of {', '.join(MAPS_BACKENDS)})")
+    module_name, class_name = MAPS_BACKENDS[config.MAPS_BACKEND]
+    maps_service = getattr(importlib.import_module(module_name), class_name)(shared_cache=shared_cache)
+    if not config.MAPS_FANOUT_BACKEND:
+        return maps_service
+    
+    from services.fanout import FanoutMapsService
+    
+    if config.MAPS_FANOUT_BACKEND not in MAPS_BACKENDS:
+        raise ValueError(f"Unknown MAPS_FANOUT_BACKEND: {config.MAPS_FANOUT_BACKEND} (expected one of {', '.join(MAPS_BACKENDS)})")
+    module_name, class_name = MAPS_BACKENDS[config.MAPS_FANOUT_BACKEND]
+    secondary = getattr(importlib.import_module(module_name), class_name)(shared_cache=shared_cache)
+    return FanoutMapsService(
+        maps_service,
+        secondary,
+        deadline=config.MAPS_FANOUT_DEADLINE,
+        cache_size=config.MAPS_FANOUT_CACHE_SIZE,
+        ttl=config.MAPS_FANOUT_CACHE_TTL
+    )
+
+
+def preload():
+    """
+    Import the configured backend in the master process before workers are
+    forked, so modules and read-only data are shared copy-on-write
+    """
+    import gc
+    
+    importlib.import_module("services.llm_parser")
+    importlib.import_module(MAPS_BACKENDS[config.MAPS_BACKEND][0])
+    if config.MAPS_FANOUT_BACKEND:
+        importlib.import_module(MAPS_BACKENDS[config.MAPS_FANOUT_BACKEND][0])
+        importlib.import_module("services.fanout")
+    # Keep the collector from touching (and so copying) preloaded objects in workers
+    gc.collect()
+    gc.freeze()
+
+
+async def warm_up(app: FastAPI):
+    """
+    Replay the example queries and the most frequent recent queries so the
+    caches are hot before the worker reports ready
+    """
+    queries = list(config.EXAMPLE_QUERIES)
+    if app.state.query_log is not None:
+        # Requests are already being served; read the log off the event loop
+        queries += await asyncio.to_thread(app.state.query_log.top_queries,
+                                           config.PRELOAD_TOP_QUERIES, config.PRELOAD_QUERY_WINDOW)
+    queries = list(dict.fromkeys(queries))
+    semaphore = asyncio.Semaphore(config.PRELOAD_CONCURRENCY)
+
+    async def replay(query: str):
+        async with semaphore:
+            try:
+                await run_search(app, query, JSON_MEDIA_TYPE)
+            except Exception:
+                pass  # a query that fails to warm is simply served cold
+
+    start = time.time()
+    try:
+        # A slow or throttled upstream must not keep the worker out of rotation
+        await asyncio.wait_for(asyncio.gather(*(replay(query) for query in queries)), config.PRELOAD_TIMEOUT)
+        print(f"Warmed {len(queries)} queries in {time.time() - start:.1f}s")
+    except asyncio.TimeoutError:
+        print(f"Warm-up stopped after {config.PRELOAD_TIMEOUT}s; remaining queries will be served cold")
+    app.state.ready = True
+
+
+async def persist(app: FastAPI):
+    """
+    Snapshot the in-memory caches and flush the query log
+    """
+    snapshot = app.state.cache_snapshot
+    if snapshot is not None:
+        # Only the copy runs on the event loop; pickling and the write do not
+        await asyncio.to_thread(snapshot.write, snapshot.capture())
+    if app.state.query_log is not None:
+        await app.state.query_log.flush()
+
+
+async def persist_periodically(app: FastAPI):
+    while True:
+        await asyncio.sleep(config.CACHE_SNAPSHOT_INTERVAL)
+        await persist(app)
+
+
+async def evict_periodically(shared_cache: SharedCache):
+    while True:
+        await asyncio.sleep(config.SHARED_CACHE_EVICT_INTERVAL)
+        await shared_cache.evict()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build services and connection pools when the server starts, not at import,
+    then restore the cache snapshot and warm hot queries in the background
+    """
+    from services.llm_parser import LLMParser
+
+    # Host-wide tier shared by all workers, beneath each process's own caches
+    shared_cache = SharedCache(config.SHARED_CACHE_PATH, config.SHARED_CACHE_MAX_ENTRIES,
+                               config.SHARED_CACHE_BUSY_TIMEOUT) if config.SHARED_CACHE_PATH else None
+    app.state.shared_cache = shared_cache
+    app.state.llm_parser = LLMParser()
+    app.state.maps_service = create_maps_service(shared_cache)
+    app.state.search_pipeline = SearchPipeline(
+        app.state.llm_parser,
+        app.state.maps_service,
+        parse_cache=TieredCache("parse", shared_cache, config.PARSE_CACHE_SIZE, config.PARSE_CACHE_TTL),
+        intent_cache=TieredCache("intent", shared_cache, config.INTENT_CACHE_SIZE, config.INTENT_CACHE_TTL),
+        # Shared so a cursor issued by one worker can be followed on any other
+        pages=ResultPages(TieredCache("pages", shared_cache, config.PAGINATION_CACHE_SIZE, config.PAGINATION_TTL)),
+        sessions=TieredCache("sessions", shared_cache, config.SESSION_CACHE_SIZE, config.SESSION_TTL)
+    )
+
+    caches = {
+        "response": response_cache,
+        "parse": app.state.search_pipeline.parse_cache.local,
+        "intent": app.state.search_pipeline.intent_cache.local,
+        "pages": app.state.search_pipeline.pages.store.local
+    }
+    local_caches = getattr(app.state.maps_service, "local_caches", None)
+    if local_caches:
+        caches.update(local_caches())
+    app.state.cache_snapshot = CacheSnapshot(config.CACHE_SNAPSHOT_PATH, caches) \
+        if config.CACHE_SNAPSHOT_PATH else None
+    if app.state.cache_snapshot is not None:
+        app.state.cache_snapshot.load()
+    app.state.query_log = QueryLog(config.QUERY_LOG_PATH) if config.QUERY_LOG_PATH else None
+
+    app.state.ready = not config.PRELOAD_QUERIES
+    background = [asyncio.create_task(persist_periodically(app))]
+    if shared_cache is not None:
+        background.append(asyncio.create_task(evict_periodically(shared_cache)))
+    if config.PRELOAD_QUERIES:
+        background.append(asyncio.create_task(warm_up(app)))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await persist(app)
+        close = getattr(app.state.maps_service, "close", None)
+        if close:
+            close()
+        if shared_cache is not None:
+            shared_cache.close()
+
+
+app = FastAPI(title="Intent-Based Maps Search API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -25,23 +201,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services - use mock service for demo
-llm_parser = LLMParser()
-maps_service = MockMapsService()  # Using mock service for demo
+profiler = SearchProfiler(
+    output_dir=config.PROFILE_OUTPUT_DIR,
+    sample_rate=config.PROFILE_SAMPLE_RATE,
+    token=config.PROFILE_TOKEN,
+    header=config.PROFILE_HEADER,
+    mode=config.PROFILE_MODE,
+    max_files=config.PROFILE_MAX_FILES,
+    sample_interval=config.PROFILE_SAMPLE_INTERVAL
+)
+# Encoded (and lazily compressed) successful responses, keyed by query text and media type
+response_cache = LRUCache(config.RESPONSE_CACHE_SIZE, ttl=config.RESPONSE_CACHE_TTL)
 
 
 class SearchRequest(BaseModel):
     query: str
+    cursor: Optional[str] = None  # next_cursor from a previous response, to fetch the next page
+    session_id: Optional[str] = None  # client-chosen id; refinements within a session reuse its candidates
 
 
 class SearchResponse(BaseModel):
     query: str
     parsed_query: ParsedQuery
-    results: List[dict]
-    midpoint: Optional[dict]
+    results: List[PlaceResult]
+    midpoint: Optional[Location]
     execution_time: float
     success: bool
     error_message: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+
+@app.middleware("http")
+async def profile_search(request: Request, call_next):
+    """
+    Run /search under the profiler when triggered by header or sampling
+    """
+    if request.url.path != "/search" or not profiler.should_profile(request.headers):
+        return await call_next(request)
+
+    session = profiler.start("search")
+    if session is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        session.halt()
+        # Joining the sampler and writing the profile would stall every other request
+        path = await asyncio.to_thread(session.save)
+    # Server-side file names are only for the token holder, not randomly sampled clients
+    if profiler.is_privileged(request.headers):
+        response.headers["X-Profile-Output"] = os.path.basename(path)
+    return response
 
 
 @app.get("/")
@@ -49,66 +259,91 @@ async def root():
     return {"message": "Intent-Based Maps Search API is running!"}
 
 
+def encoded_response(body: EncodedBody, http_request: Request) -> Response:
+    """
+    Send an encoded body, compressed with the negotiated content coding when
+    it is large enough to be worth it
+    """
+    content, encoding = body.variant(negotiate_encoding(http_request.headers.get("accept-encoding")))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=body.media_type, headers=headers)
+
+
+def encode_body(model: BaseModel, media_type: str) -> EncodedBody:
+    """
+    Serialize a response model straight to bytes in the negotiated format
+    (compact JSON by default, MessagePack for Accept: application/msgpack)
+    """
+    return EncodedBody(encode(model, media_type), media_type, min_size=config.COMPRESSION_MIN_SIZE)
+
+
+async def run_search(app: FastAPI, query: str, media_type: str) -> EncodedBody:
+    """
+    Encoded successful response for a query, from the response cache when possible
+    """
+    start_time = time.time()
+    cache_key = (" ".join(query.lower().split()), media_type)
+    
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    outcome = await app.state.search_pipeline.run(query)
+    body = outcome_body(query, outcome, start_time, media_type)
+    # Empty answers are often transient (an upstream hiccup, a failed geocode), so don't pin them
+    if outcome.results:
+        response_cache.set(cache_key, body)
+    return body
+
+
+def outcome_body(query: str, outcome: SearchOutcome, start_time: float, media_type: str) -> EncodedBody:
+    return encode_body(SearchResponse(
+        query=query,
+        parsed_query=outcome.parsed_query,
+        results=outcome.results,
+        midpoint=outcome.midpoint,
+        execution_time=time.time() - start_time,
+        success=True,
+        next_cursor=outcome.next_cursor
+    ), media_type)
+
+
 @app.post("/search", response_model=SearchResponse)
-async def search_places(request: SearchRequest):
+async def search_places(request: SearchRequest, http_request: Request):
     """
     Main search endpoint that processes natural language queries
     """
     start_time = time.time()
+    media_type = negotiate(http_request.headers.get("accept"))
+    if http_request.app.state.query_log is not None and not request.cursor:
+        http_request.app.state.query_log.record(request.query)
     
     try:
-        # Parse the natural language query
-        parsed_query = await llm_parser.parse_query(request.query)
-        
-        if not parsed_query.locations:
-            raise HTTPException(status_code=400, detail="No locations found in query")
-        
-        # Geocode all locations
-        locations = []
-        for location_name in parsed_query.locations:
-            location = await maps_service.geocode_location(location_name)
-            if location:
-                locations.append(location)
-            else:
-                raise HTTPException(status_code=400, detail=f"Could not find location: {location_name}")
-        
-        # Calculate midpoint if requested and we have multiple locations
-        search_location = None
-        midpoint = None
-        
-        if parsed_query.midpoint_calculation and len(locations) >= 2:
-            midpoint = await maps_service.calculate_midpoint(locations[0], locations[1])
-            search_location = midpoint
-        elif len(locations) == 1:
-            search_location = locations[0]
+        if request.cursor:
+            outcome = await http_request.app.state.search_pipeline.next_page(request.cursor)
+            body = outcome_body(request.query, outcome, start_time, media_type)
+        elif request.session_id:
+            # Session searches bypass the response cache so the session tracks every query
+            outcome = await http_request.app.state.search_pipeline.run(request.query, request.session_id)
+            body = outcome_body(request.query, outcome, start_time, media_type)
         else:
-            # Use first location as search center
-            search_location = locations[0]
+            body = await run_search(http_request.app, request.query, media_type)
+        return encoded_response(body, http_request)
         
-        # Search for places
-        results = await maps_service.search_places(
-            place_type=parsed_query.place_type,
-            location=search_location,
-            radius=parsed_query.radius,
-            constraints=parsed_query.constraints
+    except InvalidQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UpstreamUnavailableError as e:
+        # Throttled upstream: tell the client to back off rather than returning no results
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after + 0.999))}
         )
-        
-        execution_time = time.time() - start_time
-        
-        return SearchResponse(
-            query=request.query,
-            parsed_query=parsed_query,
-            results=[result.dict() for result in results],
-            midpoint=midpoint.dict() if midpoint else None,
-            execution_time=execution_time,
-            success=True
-        )
-        
-    except HTTPException:
-        raise
     except Exception as e:
         execution_time = time.time() - start_time
-        return SearchResponse(
+        return encoded_response(encode_body(SearchResponse(
             query=request.query,
             parsed_query=ParsedQuery(place_type="", locations=[], constraints=[], midpoint_calculation=False),
             results=[],
@@ -116,17 +351,50 @@ async def search_places(request: SearchRequest):
             execution_time=execution_time,
             success=False,
             error_message=str(e)
-        )
+        ), media_type), http_request)
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(http_request: Request):
     """
-    Health check endpoint
+    Health check endpoint; not ready (503) until startup warm-up has finished
     """
+    if not http_request.app.state.ready:
+        return JSONResponse({"status": "warming", "timestamp": time.time()}, status_code=503)
     return {"status": "healthy", "timestamp": time.time()}
 
 
+@app.get("/stats")
+async def stats(http_request: Request):
+    """
+    Upstream queue-wait, retry, timeout and hedging metrics, and cache hit ratios
+    """
+    state = http_request.app.state
+    upstream = getattr(state.maps_service, "upstream", None)
+    caches = {
+        "response": response_cache.stats(),  # text level: normalized query text
+        "intent": state.search_pipeline.intent_cache.stats(),  # canonical intent after parse and geocode
+        "parse": state.search_pipeline.parse_cache.stats(),
+        "pages": state.search_pipeline.pages.stats(),
+        "sessions": dict(state.search_pipeline.sessions.stats(), refinements=state.search_pipeline.refinements)
+    }
+    cache_stats = getattr(state.maps_service, "cache_stats", None)
+    if cache_stats:
+        caches.update(cache_stats())
+    if state.shared_cache is not None:
+        caches["shared"] = state.shared_cache.stats()
+    upstream_stats = upstream.stats() if upstream else {}
+    upstream_stats["parser"] = {"timeout_s": state.llm_parser.latency.timeout}
+    return {
+        "upstream": upstream_stats,
+        "caches": caches
+    }
+
+
+if config.PRELOAD_APP:
+    preload()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
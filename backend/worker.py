@@ -0,0 +1,13 @@
+"""
+Gunicorn worker class for production: uvicorn's worker, which already picks
+uvloop and httptools when they are installed, with the lifespan required so
+a failed startup stops the worker instead of serving without services
+"""
+try:
+    from uvicorn_worker import UvicornWorker
+except ImportError:
+    from uvicorn.workers import UvicornWorker
+
+
+class ProductionWorker(UvicornWorker):
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "lifespan": "on"}
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the search path
+
+Usage:
+  python benchmark.py ranking [--sizes 10000 100000 1000000] [--k 3]
+  python benchmark.py results [--candidates 20 60 1000] [--searches 200]
+  python benchmark.py serialization [--results 3 20 100]
+  python benchmark.py imports [--backend mock|google] [--top 25]
+  python benchmark.py coldstart [--backend mock|google] [--runs 3]
+  python benchmark.py workers [--workers 1 2 4] [--concurrency 64] [--duration 10] [--cache-bust]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import tracemalloc
+from typing import List, Optional
+
+import numpy as np
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pydantic import BaseModel
+
+from services.candidates import Candidate, CandidateBatch
+from services.models import ParsedQuery, PlaceResult
+from services.ranking import RankingEngine
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Best wall time of several runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def synthetic_batch(n: int, seed: int = 0) -> CandidateBatch:
+    """Random candidates with realistic gaps (missing ratings, prices, hours)"""
+    rng = np.random.default_rng(seed)
+    rating = rng.uniform(1.0, 5.0, n)
+    rating[rng.random(n) < 0.1] = np.nan
+    price = rng.integers(0, 5, n).astype(np.float64)
+    price[rng.random(n) < 0.3] = np.nan
+    open_now = rng.integers(0, 2, n).astype(np.float64)
+    open_now[rng.random(n) < 0.2] = np.nan
+    return CandidateBatch(
+        place_ids=[f"place_{i}" for i in range(n)],
+        names=[f"Place {i}" for i in range(n)],
+        rating=rating,
+        price_level=price,
+        open_now=open_now,
+        distance=rng.uniform(0, 20000, n),
+        types=[("restaurant",)] * n,
+        constraint_matches=rng.integers(0, 4, n).astype(np.float64)
+    )
+
+
+def bench_ranking(args):
+    engine = RankingEngine()
+    print(f"Top-{args.k} selection (best of 5, ms)")
+    print(f"{'candidates':>12} {'score':>10} {'argpartition':>13} {'argsort':>10} {'sorted()':>10}")
+    for n in args.sizes:
+        batch = synthetic_batch(n)
+        scores = engine.score(batch)
+        score_ms = timed(lambda: engine.score(batch))
+        top_ms = timed(lambda: engine.top_k(batch, args.k, scores))
+        argsort_ms = timed(lambda: np.argsort(-scores, kind="stable")[:args.k])
+        if n <= 100000:
+            pairs = list(zip(scores.tolist(), batch.distance.tolist()))
+            sorted_ms = f"{timed(lambda: sorted(range(n), key=lambda i: (-pairs[i][0], pairs[i][1]))[:args.k], repeat=3):10.2f}"
+        else:
+            sorted_ms = f"{'-':>10}"
+        print(f"{n:>12,} {score_ms:10.2f} {top_ms:13.2f} {argsort_ms:10.2f} {sorted_ms}")
+
+
+class LegacySearchResponse(BaseModel):
+    """Response model as it was before results stayed typed end to end"""
+    query: str
+    parsed_query: ParsedQuery
+    results: List[dict]
+    midpoint: Optional[dict]
+    execution_time: float
+    success: bool
+
+
+def raw_places(n: int) -> List[dict]:
+    """Text search entries shaped like the Places API response"""
+    return [{
+        "place_id": f"place_{i}",
+        "name": f"Place {i}",
+        "formatted_address": f"{i} Market St, San Francisco, CA",
+        "rating": 3.0 + (i % 20) / 10,
+        "price_level": i % 4,
+        "opening_hours": {"open_now": bool(i % 2)},
+        "types": ["restaurant", "food", "point_of_interest", "establishment"],
+        "geometry": {"location": {"lat": 37.77 + i * 1e-5, "lng": -122.42}},
+    } for i in range(n)]
+
+
+def legacy_search(places: List[dict], parsed: ParsedQuery):
+    """Pydantic model per candidate, full sort, dump to dicts and revalidate"""
+    results = [PlaceResult(
+        name=p["name"], place_id=p["place_id"], address=p["formatted_address"],
+        rating=p["rating"], price_level=p["price_level"], opening_hours=p["opening_hours"],
+        photos=[], distance_from_midpoint=float(i), distance_text=f"{i}m", types=p["types"]
+    ) for i, p in enumerate(places)]
+    results.sort(key=lambda x: (-(x.rating or 0), x.distance_from_midpoint))
+    return LegacySearchResponse(
+        query="q", parsed_query=parsed, results=[r.model_dump() for r in results[:3]],
+        midpoint=None, execution_time=0.0, success=True
+    )
+
+
+def compact_search(places: List[dict], parsed: ParsedQuery, engine: RankingEngine, response_model):
+    """Slotted candidates, top-k selection, models only for the final results"""
+    candidates = [Candidate(
+        place_id=p["place_id"], name=p["name"], address=p["formatted_address"],
+        rating=p["rating"], price_level=p["price_level"], opening_hours=p["opening_hours"],
+        types=p["types"], lat=p["geometry"]["location"]["lat"], lng=p["geometry"]["location"]["lng"],
+        distance_from_midpoint=float(i)
+    ) for i, p in enumerate(places)]
+    top = engine.top_k(CandidateBatch.from_results(candidates), 3)
+    return response_model(
+        query="q", parsed_query=parsed, results=[candidates[i].to_result() for i in top],
+        midpoint=None, execution_time=0.0, success=True
+    )
+
+
+def allocation_profile(fn, searches: int):
+    """(peak KiB per search, allocated blocks per search, microseconds per search)"""
+    fn()  # warm up
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    peak = 0
+    kept = []
+    for _ in range(searches):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        kept.append(fn())
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename")) - before
+    tracemalloc.stop()
+    del kept
+    elapsed = timed(lambda: [fn() for _ in range(searches)], repeat=3) / searches
+    return peak / 1024, blocks / searches, elapsed * 1000
+
+
+def bench_results(args):
+    from backend.main import SearchResponse
+
+    engine = RankingEngine()
+    parsed = ParsedQuery(place_type="restaurant", locations=["San Francisco"], constraints=[])
+    print("Per-search cost of building results (top 3)")
+    print(f"{'candidates':>10} {'path':>8} {'peak KiB':>9} {'retained blocks':>16} {'us/search':>10}")
+    for n in args.candidates:
+        places = raw_places(n)
+        for name, fn in (
+            ("legacy", lambda: legacy_search(places, parsed)),
+            ("compact", lambda: compact_search(places, parsed, engine, SearchResponse)),
+        ):
+            peak, blocks, micros = allocation_profile(fn, args.searches)
+            print(f"{n:>10} {name:>8} {peak:9.1f} {blocks:16.1f} {micros:10.1f}")
+
+
+def sample_response(n: int):
+    from backend.main import SearchResponse
+    from services.models import Location
+
+    places = raw_places(n)
+    parsed = ParsedQuery(
+        place_type="coffee shop", locations=["San Francisco", "San Jose"],
+        constraints=[{"type": "parking", "value": True}], midpoint_calculation=True, radius=5000
+    )
+    results = [Candidate(
+        place_id=p["place_id"], name=p["name"], address=p["formatted_address"],
+        rating=p["rating"], price_level=p["price_level"],
+        opening_hours={"open_now": True, "weekday_text": [f"{day}: 7:00 AM - 10:00 PM" for day in
+                                                          ("Monday", "Tuesday", "Wednesday", "Thursday",
+                                                           "Friday", "Saturday", "Sunday")]},
+        types=p["types"], lat=p["geometry"]["location"]["lat"], lng=p["geometry"]["location"]["lng"],
+        distance_from_midpoint=float(i * 37)
+    ).to_result([f"photo_reference_{i}_{j}" for j in range(2)]) for i, p in enumerate(places)]
+    return SearchResponse(
+        query="Find me a coffee shop halfway between San Francisco and San Jose with parking",
+        parsed_query=parsed, results=results,
+        midpoint=Location(lat=37.556, lng=-122.152, address="San Mateo, CA"),
+        execution_time=0.123, success=True
+    )
+
+
+def bench_serialization(args):
+    from fastapi.encoders import jsonable_encoder
+    from services.serialization import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, encode, msgpack
+
+    def default_path(model):
+        # What FastAPI does for a returned model: dump, jsonable_encoder, json.dumps
+        content = jsonable_encoder(model.model_dump())
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    paths = [("default", default_path), ("fast json", lambda m: encode(m, JSON_MEDIA_TYPE))]
+    if msgpack is not None:
+        paths.append(("msgpack", lambda m: encode(m, MSGPACK_MEDIA_TYPE)))
+
+    print("SearchResponse encoding (best of 5)")
+    print(f"{'results':>8} {'encoder':>10} {'us/encode':>10} {'bytes':>8}")
+    for n in args.results:
+        model = sample_response(n)
+        for name, fn in paths:
+            micros = timed(lambda: [fn(model) for _ in range(200)]) / 200 * 1000
+            print(f"{n:>8} {name:>10} {micros:10.1f} {len(fn(model)):8,}")
+
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def backend_env(backend: str, warm: bool = False) -> dict:
+    env = dict(os.environ, MAPS_BACKEND=backend, PYTHONPATH=PROJECT_ROOT)
+    env.setdefault("GOOGLE_MAPS_API_KEY", "AIza" + "0" * 35)  # googlemaps validates the key format
+    if not warm:
+        # No snapshot, shared cache or query replay, so the server starts with empty caches
+        env.update(PRELOAD_QUERIES="0", CACHE_SNAPSHOT_PATH="", SHARED_CACHE_PATH="")
+    return env
+
+
+def bench_imports(args):
+    """Import cost of the app module plus the selected backend, from python -X importtime"""
+    code = ("import backend.main as m, importlib; "
+            "importlib.import_module('services.llm_parser'); "
+            "importlib.import_module(m.MAPS_BACKENDS[m.config.MAPS_BACKEND][0])")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=PROJECT_ROOT, env=backend_env(args.backend), capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        return
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    top_level = [row for row in rows if not row[2].startswith("  ")]
+    print(f"Import time with MAPS_BACKEND={args.backend}: {sum(r[0] for r in top_level) / 1000:.1f} ms total")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative, own, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:14.1f} {own / 1000:8.1f}  {name}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_search(port: int, timeout: float = 60.0) -> bool:
+    """Poll until /search answers successfully"""
+    request_body = json.dumps({"query": config_example_query()}).encode()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request = urllib.request.Request(f"http://127.0.0.1:{port}/search", data=request_body,
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.01)
+    return False
+
+
+def config_example_query() -> str:
+    import config
+    return config.EXAMPLE_QUERIES[0]
+
+
+def bench_coldstart(args):
+    """Time from process spawn to the first successfully served /search"""
+    print(f"{'Warm' if args.warm else 'Cold'} start to first served /search (MAPS_BACKEND={args.backend})")
+    for run in range(args.runs):
+        port = free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=PROJECT_ROOT, env=backend_env(args.backend, args.warm),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            served = wait_for_search(port)
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"  run {run + 1}: {elapsed * 1000:.0f} ms" + ("" if served else " (timed out)"))
+
+
+async def load_test(url: str, concurrency: int, duration: float, cache_bust: bool = False) -> dict:
+    """Closed-loop load: `concurrency` clients cycle the example queries for `duration` seconds"""
+    import asyncio
+    import itertools
+    import config
+    import httpx
+
+    queries = itertools.cycle(config.EXAMPLE_QUERIES)
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def client_loop(client, deadline):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            query = next(queries)
+            if cache_bust:
+                query = f"{query} #{next(counter)}"
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json={"query": query})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(client_loop(client, deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    percentiles = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else [float("nan")] * 3
+    return {"rps": len(latencies) / elapsed, "p50": percentiles[0], "p95": percentiles[1],
+            "p99": percentiles[2], "errors": errors}
+
+
+def wait_for_health(port: int, timeout: float = 60.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def bench_workers(args):
+    """Throughput and latency of the production server as the worker count grows"""
+    import asyncio
+    from start import production_command
+
+    print(f"Production server, MAPS_BACKEND={args.backend}, concurrency {args.concurrency}, "
+          f"{args.duration:.0f}s per run" + (", cache busting" if args.cache_bust else "")
+          + (", warm start" if args.warm else ""))
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for workers in args.workers:
+        port = free_port()
+        command, env = production_command("127.0.0.1", port, workers)
+        env.update(backend_env(args.backend, args.warm))
+        server = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_health(port):
+                print(f"{workers:>8} server did not come up")
+                continue
+            url = f"http://127.0.0.1:{port}/search"
+            asyncio.run(load_test(url, args.concurrency, 1.0))  # warm up every worker
+            result = asyncio.run(load_test(url, args.concurrency, args.duration, args.cache_bust))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{workers:>8} {result['rps']:10.1f} {result['p50']:9.1f} {result['p95']:9.1f} "
+              f"{result['p99']:9.1f} {result['errors']:7d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search path benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ranking = subparsers.add_parser("ranking", help="weighted scoring and top-k selection")
+    ranking.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ranking.add_argument("--k", type=int, default=3)
+    ranking.set_defaults(func=bench_ranking)
+
+    results = subparsers.add_parser("results", help="memory and allocations of result construction")
+    results.add_argument("--candidates", type=int, nargs="+", default=[20, 60, 1000])
+    results.add_argument("--searches", type=int, default=200)
+    results.set_defaults(func=bench_results)
+
+    serialization = subparsers.add_parser("serialization", help="response encode time and payload size")
+    serialization.add_argument("--results", type=int, nargs="+", default=[3, 20, 100])
+    serialization.set_defaults(func=bench_serialization)
+
+    imports = subparsers.add_parser("imports", help="per-module import time report")
+    imports.add_argument("--backend", choices=["mock", "google"], default="mock")
+    imports.add_argument("--top", type=int, default=25)
+    imports.set_defaults(func=bench_imports)
+
+    coldstart = subparsers.add_parser("coldstart", help="time from process start to first served request")
+    coldstart.add_argument("--backend", choices=["mock", "google"], default="mock")
+    coldstart.add_argument("--runs", type=int, default=3)
+    coldstart.add_argument("--warm", action="store_true",
+                           help="keep the cache snapshot, shared cache and query warm-up enabled")
+    coldstart.set_defaults(func=bench_coldstart)
+
+    workers = subparsers.add_parser("workers", help="load test the production server per worker count")
+    workers.add_argument("--backend", choices=["mock", "google"], default="mock")
+    workers.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    workers.add_argument("--concurrency", type=int, default=64)
+    workers.add_argument("--duration", type=float, default=10.0)
+    workers.add_argument("--cache-bust", action="store_true",
+                         help="make every query unique so the response cache never hits")
+    workers.add_argument("--warm", action="store_true",
+                         help="keep the cache snapshot, shared cache and query warm-up enabled")
+    workers.set_defaults(func=bench_workers)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,134 @@ API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", 8000))
 FRONTEND_PORT = int(os.getenv("FRONTEND_PORT", 8501))
 
+# Backend Configuration
+MAPS_BACKEND = os.getenv("MAPS_BACKEND", "mock")  # "mock" (demo data) or "google"
+MAPS_FANOUT_BACKEND = os.getenv("MAPS_FANOUT_BACKEND", "")  # secondary backend queried alongside MAPS_BACKEND, e.g. "mock"; empty disables fan-out
+MAPS_FANOUT_DEADLINE = float(os.getenv("MAPS_FANOUT_DEADLINE", 1.5))  # seconds to wait for a provider with enough results
+MAPS_FANOUT_CACHE_SIZE = 2000  # merged multi-provider pools kept per process
+MAPS_FANOUT_CACHE_TTL = 600  # seconds
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))  # server processes on this host; set by `start.py --production`
+PRELOAD_APP = os.getenv("PRELOAD_APP", "0") == "1"  # set by `start.py --production` before forking workers
+
 # Search Configuration
 DEFAULT_SEARCH_RADIUS = 5000  # meters
-MAX_RESULTS = 3
+MAX_RESULTS = 3  # results per page
+PAGINATION_MAX_CANDIDATES = 60  # ranked candidates kept behind a cursor
+PAGINATION_CACHE_SIZE = 2000  # ranked searches kept per process
+PAGINATION_TTL = int(os.getenv("PAGINATION_TTL", 900))  # seconds a cursor stays valid
+SESSION_CACHE_SIZE = 10000  # client sessions kept per process for refinements
+SESSION_TTL = int(os.getenv("SESSION_TTL", 1800))  # seconds of inactivity before a session is dropped
+PLACES_MIN_CANDIDATES = 10  # candidates to consider before stopping early
+PLACES_MAX_PAGES = 3  # Places text search serves at most 3 pages of 20
+PLACES_PAGE_TOKEN_DELAY = 2.0  # seconds before a next_page_token becomes valid
 DEFAULT_TIMEOUT = 30  # seconds
+RADIUS_EXPANSION_FACTORS = [2, 4]  # wider radii searched concurrently when results are sparse
+RADIUS_EXPANSION_MAX = 50000  # meters; the Places API maximum
+RADIUS_EXPANSION_PRECISION = 5  # geohash length of areas remembered as sparse (~4.9km)
+RADIUS_EXPANSION_MEMORY = 3600  # seconds an area stays predicted sparse
+
+# Ranking Configuration
+RANKING_WEIGHTS = {  # each feature is normalized to [0, 1], higher is better
+    "rating": float(os.getenv("RANK_WEIGHT_RATING", 1.0)),
+    "distance": float(os.getenv("RANK_WEIGHT_DISTANCE", 0.3)),
+    "price": float(os.getenv("RANK_WEIGHT_PRICE", 0.0)),
+    "open_now": float(os.getenv("RANK_WEIGHT_OPEN_NOW", 0.1)),
+    "constraint_matches": float(os.getenv("RANK_WEIGHT_CONSTRAINTS", 0.2)),
+}
+RANKING_DISTANCE_SCALE = 2000  # meters at which the distance score halves
+
+# Meeting Point Configuration
+MEETING_POINT_OBJECTIVE = os.getenv("MEETING_POINT_OBJECTIVE", "minimax")  # "minimax" or "total"
+MEETING_POINT_GRID_SIZE = 5  # candidates per side of the grid around the centroid
+MEETING_POINT_PRECISION = 3  # decimal places for travel-time cache cells (~100m)
+MEETING_POINT_CACHE_SIZE = 10000  # cached origin/candidate travel-time cells
+TRAVEL_MODE = os.getenv("TRAVEL_MODE", "driving")
+
+# Corridor Search Configuration
+CORRIDOR_PRECISION = 5  # geohash length of the cells searched along a route (~4.9km)
+CORRIDOR_MAX_CELLS = 20  # longer routes fall back to coarser cells, up to the RADIUS_EXPANSION_MAX radius
+CORRIDOR_CONCURRENCY = int(os.getenv("CORRIDOR_CONCURRENCY", 8))  # cell searches in flight across all requests
+CORRIDOR_DETOUR_STEP = 500  # meters; detours this close rank as equal and the better rated stop wins
+
+# Upstream Client Configuration
+UPSTREAM_QPS = {  # per-API query rate limits (requests per second) for the whole host, split across WORKERS
+    "geocoding": float(os.getenv("GEOCODE_QPS", 50)),
+    "places": float(os.getenv("PLACES_QPS", 10)),
+    "distance_matrix": float(os.getenv("DISTANCE_MATRIX_QPS", 10)),
+}
+UPSTREAM_QUOTAS = {  # the API (UPSTREAM_QPS entry) whose quota each endpoint draws on
+    "geocode": "geocoding",
+    "reverse_geocode": "geocoding",
+    "places": "places",
+    "place": "places",
+    "distance_matrix": "distance_matrix",
+}
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", 32))  # threads and pooled connections
+UPSTREAM_MAX_RETRIES = 3
+UPSTREAM_BACKOFF_BASE = 0.2  # seconds, doubled per retry with full jitter
+UPSTREAM_BACKOFF_MAX = 5.0  # seconds
+UPSTREAM_TIMEOUT_MIN = 1.0  # seconds; adaptive timeouts never drop below this, nor rise above DEFAULT_TIMEOUT
+UPSTREAM_TIMEOUT_PERCENTILE = 0.99  # recent latency percentile an endpoint's timeout is based on
+UPSTREAM_TIMEOUT_MULTIPLIER = 3.0  # headroom over that percentile
+UPSTREAM_LATENCY_WINDOW = 200  # recent calls per endpoint the percentiles are computed over
+UPSTREAM_HEDGE_ENDPOINTS = {"geocode", "reverse_geocode", "place"}  # idempotent lookups safe to send twice
+UPSTREAM_HEDGE_PERCENTILE = 0.95  # latency after which a duplicate request is sent
+UPSTREAM_HEDGE_BUDGET = float(os.getenv("UPSTREAM_HEDGE_BUDGET", 0.05))  # max hedges as a fraction of the last UPSTREAM_LATENCY_WINDOW calls
+PARSER_TIMEOUT = 10  # seconds; upper bound of the parser's adaptive timeout
+
+# Reverse Geocode Cache Configuration
+REVERSE_GEOCODE_PRECISION = int(os.getenv("REVERSE_GEOCODE_PRECISION", 6))  # geohash length (~1.2km cells)
+REVERSE_GEOCODE_CACHE_SIZE = 10000
+REVERSE_GEOCODE_TTL = 24 * 3600  # seconds before a cached address is served stale and refreshed
+
+# Cache Configuration
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "cache/shared.sqlite3")  # host-wide tier; empty disables it
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", 100000))
+SHARED_CACHE_BUSY_TIMEOUT = 0.05  # seconds to wait on another worker's write lock before treating it as a miss
+SHARED_CACHE_EVICT_INTERVAL = 60  # seconds between trims of expired and excess entries
+PARSE_CACHE_SIZE = 10000  # parsed queries kept per process
+PARSE_CACHE_TTL = 24 * 3600  # seconds
+GEOCODE_CACHE_SIZE = 10000  # geocoded location names kept per process
+GEOCODE_CACHE_SOFT_TTL = 24 * 3600  # seconds before a geocode is served stale and refreshed
+GEOCODE_CACHE_TTL = 7 * 24 * 3600  # seconds before a geocode is dropped
+PLACE_DETAILS_CACHE_SIZE = 10000  # place details kept per process
+PLACE_DETAILS_CACHE_SOFT_TTL = 3600  # seconds before details are served stale and refreshed
+PLACE_DETAILS_CACHE_TTL = 24 * 3600  # seconds before details are dropped
+CACHE_REFRESH_CONCURRENCY = int(os.getenv("CACHE_REFRESH_CONCURRENCY", 4))  # background refreshes in flight
+BATCH_LOADER_WINDOW = float(os.getenv("BATCH_LOADER_WINDOW", 0.002))  # seconds to collect lookups into a batch
+BATCH_LOADER_MAX_BATCH = 50  # lookups dispatched at once without waiting for the window
+INTENT_CACHE_SIZE = 10000  # ranked results kept per process, keyed by canonical intent
+INTENT_CACHE_TTL = int(os.getenv("INTENT_CACHE_TTL", 900))  # seconds
+INTENT_CACHE_PRECISION = 4  # decimal places of the search point (~11m)
+INTENT_CACHE_RADIUS_BUCKET = 1000  # meters; radii in the same bucket share results
+SPATIAL_CACHE_PRECISION = 6  # geohash length of candidate set cells (~1.2km x 0.6km)
+SPATIAL_CACHE_SLACK = float(os.getenv("SPATIAL_CACHE_SLACK", 0.1))  # fraction a cached radius may stretch
+SPATIAL_CACHE_SIZE = 5000  # cached candidate sets per process
+SPATIAL_CACHE_TTL = int(os.getenv("SPATIAL_CACHE_TTL", 600))  # seconds
+
+# Warm Start Configuration
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "cache/snapshot.pickle")  # empty disables snapshots
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", 300))  # seconds between snapshots
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "logs/queries.jsonl")  # empty disables the query log
+PRELOAD_QUERIES = os.getenv("PRELOAD_QUERIES", "1") == "1"  # replay hot queries before reporting ready
+PRELOAD_TOP_QUERIES = int(os.getenv("PRELOAD_TOP_QUERIES", 50))  # most frequent logged queries to replay
+PRELOAD_QUERY_WINDOW = 24 * 3600  # seconds of query log considered recent
+PRELOAD_CONCURRENCY = 4  # replayed queries in flight at once
+PRELOAD_TIMEOUT = float(os.getenv("PRELOAD_TIMEOUT", 60))  # seconds before a worker reports ready regardless
+
+# Response Configuration
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # bytes; smaller bodies go uncompressed
+RESPONSE_CACHE_SIZE = 1000  # encoded /search responses kept per process
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))  # seconds
+
+# Profiling Configuration
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # header trigger is disabled when empty
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))  # fraction of /search requests
+PROFILE_MODE = os.getenv("PROFILE_MODE", "stacks")  # "stacks" (collapsed, for flamegraphs) or "pstats"
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))
+PROFILE_SAMPLE_INTERVAL = 0.001  # seconds between stack samples
 
 # LLM Configuration
 OPENAI_MODEL = "gpt-3.5-turbo"
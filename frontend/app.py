@@ -88,7 +88,7 @@ def display_result(result: Dict, index: int):
         <div class="result-card">
             <div class="result-title">{index + 1}. {result['name']}</div>
             <p><strong>Address:</strong> {result['address']}</p>
-            <p><strong>Distance:</strong> {result.get('distance_text', 'N/A')}</p>
+            <p><strong>{'Detour' if result.get('detour_text') else 'Distance'}:</strong> {result.get('detour_text') or result.get('distance_text', 'N/A')}</p>
         """, unsafe_allow_html=True)
         
         # Rating and price level
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Profile a single search query end to end against the mock backend
+"""
+import argparse
+import os
+import secrets
+import sys
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile one /search request end to end")
+    parser.add_argument("query", nargs="?",
+                        default="Find me a coffee shop halfway between San Francisco and San Jose with parking")
+    parser.add_argument("--mode", choices=["stacks", "pstats"], default="stacks",
+                        help="collapsed stacks for flamegraphs, or cProfile pstats")
+    parser.add_argument("--output-dir", default="profiles")
+    parser.add_argument("--top", type=int, default=20, help="pstats rows to print")
+    parser.add_argument("--warm", action="store_true",
+                        help="keep the cache snapshot, shared cache and query warm-up, i.e. profile a cache hit")
+    args = parser.parse_args()
+
+    # Configure the profiler before the app reads its settings
+    token = secrets.token_hex(8)
+    os.environ["PROFILE_TOKEN"] = token
+    os.environ["PROFILE_MODE"] = args.mode
+    os.environ["PROFILE_OUTPUT_DIR"] = args.output_dir
+    os.environ["PROFILE_SAMPLE_RATE"] = "0"
+    os.environ["MAPS_BACKEND"] = "mock"
+    if not args.warm:
+        # Profile the full search path rather than a cached answer
+        os.environ.update(PRELOAD_QUERIES="0", CACHE_SNAPSHOT_PATH="", SHARED_CACHE_PATH="")
+
+    from fastapi.testclient import TestClient
+    import config
+    from backend.main import app
+
+    with TestClient(app) as client:
+        response = client.post("/search", json={"query": args.query},
+                               headers={config.PROFILE_HEADER: token})
+
+    body = response.json()
+    print(f"🔍 Query: '{args.query}'")
+    print(f"   Status: {response.status_code}, results: {len(body.get('results', []))}, "
+          f"execution time: {body.get('execution_time', 0):.3f}s")
+
+    output = response.headers.get("X-Profile-Output")
+    if not output:
+        print("❌ Request was not profiled")
+        return 1
+
+    path = os.path.join(args.output_dir, output)
+    print(f"✅ Profile written to {path}")
+    if args.mode == "pstats":
+        import pstats
+        pstats.Stats(path).sort_stats("cumulative").print_stats(args.top)
+    else:
+        print("   Render with: flamegraph.pl", path, "> flame.svg  (or load it in speedscope)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class BatchLoader:
+    """
+    DataLoader-style coalescing of single-key lookups.
+
+    Keys requested within `window` seconds of each other (0 means the same
+    event-loop tick) are collected into one batch, deduplicated, and loaded
+    with one concurrent call per distinct key; every caller waiting on a key
+    gets the same result or exception. A key already being loaded by an
+    earlier batch is joined rather than requested again. A batch that
+    reaches max_batch keys is dispatched without waiting for the window.
+    """
+
+    def __init__(self,
+                 load_one: Callable[[Hashable], Awaitable[Any]],
+                 window: float = 0.0,
+                 max_batch: int = 100):
+        self.load_one = load_one
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = 0
+        self.batches = 0
+        self.loads = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._timer: Optional[asyncio.Handle] = None
+        self._tasks = set()
+
+    async def load(self, key: Hashable) -> Any:
+        self.requests += 1
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            # Callers may all go away; don't warn about an unobserved error then
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = future
+            self._queue.append(key)
+            if len(self._queue) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = (loop.call_soon(self._dispatch) if self.window <= 0
+                               else loop.call_later(self.window, self._dispatch))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "loads": self.loads,
+            "avg_batch_size": self.loads / self.batches if self.batches else 0.0
+        }
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._queue = self._queue, []
+        if not keys:
+            return
+        self.batches += 1
+        self.loads += len(keys)
+        task = asyncio.get_running_loop().create_task(self._run(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: List[Hashable]):
+        results = await asyncio.gather(*(self.load_one(key) for key in keys), return_exceptions=True)
+        for key, result in zip(keys, results):
+            future = self._inflight.pop(key)
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+class LRUCache:
+    """
+    Size-bounded in-memory cache that evicts the least recently used entry,
+    with an optional time-to-live after which entries are treated as missing
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._expires: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if self.ttl is not None and self._expires[key] < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value; ttl shortens this entry's lifetime below the cache's own TTL
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        while len(self._data) > self.max_size:
+            oldest, _ = self._data.popitem(last=False)
+            self._expires.pop(oldest, None)
+
+    def _remove(self, key: Hashable):
+        self._data.pop(key, None)
+        self._expires.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        if key not in self._data:
+            return False
+        return self.ttl is None or self._expires[key] >= time.monotonic()
+
+    def dump(self) -> List[Tuple[Hashable, Any, Optional[float]]]:
+        """
+        Live entries from least to most recently used, with their remaining TTL
+        """
+        now = time.monotonic()
+        entries = []
+        for key, value in self._data.items():
+            remaining = self._expires[key] - now if self.ttl is not None else None
+            if remaining is None or remaining > 0:
+                entries.append((key, value, remaining))
+        return entries
+
+    def load(self, entries: Iterable[Tuple[Hashable, Any, Optional[float]]]):
+        """
+        Restore entries produced by dump(), keeping their remaining TTL
+        """
+        for key, value, remaining in entries:
+            self.set(key, value, ttl=remaining)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+class RefreshSlots:
+    """
+    Non-blocking budget of concurrent background refreshes, shared by caches.
+
+    A slot is claimed synchronously when the refresh is scheduled, so several
+    stale reads in the same tick cannot all pass the check before any of
+    their tasks has started.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_use = 0
+
+    def claim(self) -> bool:
+        if self.in_use >= self.size:
+            return False
+        self.in_use += 1
+        return True
+
+    def release(self):
+        self.in_use -= 1
+
+
+class RefreshingCache:
+    """
+    Stale-while-revalidate layer over a TieredCache whose own TTL acts as
+    the hard TTL.
+
+    Entries younger than soft_ttl are served as-is. Older ones are still
+    served immediately, and one background task per key reloads them; the
+    refresh only runs if one of the shared refresh slots is free, so
+    refresh traffic never queues ahead of foreground requests. Concurrent
+    misses for the same key share a single foreground load.
+    """
+
+    def __init__(self, store, soft_ttl: float, refresh_slots: Optional[RefreshSlots] = None):
+        self.store = store
+        self.soft_ttl = soft_ttl
+        self.refresh_slots = refresh_slots or RefreshSlots(4)
+        self.refreshes = 0
+        self.stale_hits = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def peek(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """
+        Value cached in this process (or None) and whether it is still fresh
+        """
+        return self._unpack(self.store.get_local(key))
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Value for key, loading it in the foreground only on a miss
+        """
+        value, fresh = self._unpack(await self.store.get(key))
+        if value is not None:
+            if not fresh:
+                self.stale_hits += 1
+                self.refresh(key, loader)
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start(key, loader)
+            # The caller sees any error; this only keeps an abandoned load from warning
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    def refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """
+        Reload a key in the background unless it is already being loaded or
+        the refresh budget is used up
+        """
+        if key in self._inflight or not self.refresh_slots.claim():
+            return
+        self.refreshes += 1
+        task = self._start(key, loader, self.refresh_slots)
+        task.add_done_callback(self._report)
+
+    def set(self, key: Hashable, value: Any):
+        self.store.set(key, (value, time.time()))
+
+    def stats(self) -> dict:
+        stats = self.store.stats()
+        stats["stale_hits"] = self.stale_hits
+        stats["refreshes"] = self.refreshes
+        return stats
+
+    def _unpack(self, entry: Optional[Tuple[Any, float]]) -> Tuple[Optional[Any], bool]:
+        if entry is None:
+            return None, False
+        value, stored_at = entry
+        return value, time.time() - stored_at < self.soft_ttl
+
+    def _start(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+               slots: Optional[RefreshSlots] = None) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, loader, slots))
+        self._inflight[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    slots: Optional[RefreshSlots]) -> Any:
+        try:
+            value = await loader()
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            if slots is not None:
+                slots.release()
+
+    @staticmethod
+    def _report(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error refreshing cache entry: {task.exception()}")
@@ -0,0 +1,301 @@
+import re
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from . import geohash
+from .models import PlaceResult
+
+# Place types are tracked as bits in a uint64 so type tests vectorize; the
+# last bit is shared by every type seen after the first 63. Types the
+# constraints test are reserved at import (reserve_type_bits) so they always
+# get a bit of their own, and overflowing types are checked exactly.
+_TYPE_BITS: Dict[str, int] = {}
+_OVERFLOW_BIT = 63
+
+# Places closing at or after this time (HHMM) count as open late
+LATE_CLOSING_TIME = 2200
+
+
+def type_bit(place_type: str) -> int:
+    """Bit assigned to a place type"""
+    bit = _TYPE_BITS.get(place_type)
+    if bit is None:
+        bit = len(_TYPE_BITS) if len(_TYPE_BITS) < _OVERFLOW_BIT else _OVERFLOW_BIT
+        _TYPE_BITS[place_type] = bit
+    return bit
+
+
+def reserve_type_bits(types: Iterable[str]):
+    """Give these place types their own bits before arbitrary upstream types can use them up"""
+    for place_type in types:
+        if type_bit(place_type) == _OVERFLOW_BIT:
+            raise ValueError(f"No type bit left to reserve for {place_type!r}")
+
+
+def type_mask(types: Iterable[str]) -> int:
+    """Bitmask with the bits of all the given place types set"""
+    mask = 0
+    for place_type in types:
+        mask |= 1 << type_bit(place_type)
+    return mask
+
+
+class Candidate:
+    """
+    Compact record for a candidate place, used until the final top-k is known.
+
+    Attribute names mirror PlaceResult so the same checks work on both, but
+    there is no validation, no per-instance __dict__, and type strings are
+    interned so thousands of candidates share a handful of type objects.
+    """
+
+    __slots__ = ("place_id", "name", "address", "rating", "price_level",
+                 "opening_hours", "types", "lat", "lng", "distance_from_midpoint", "detour")
+
+    def __init__(self,
+                 place_id: str,
+                 name: str,
+                 address: str,
+                 rating: Optional[float],
+                 price_level: Optional[int],
+                 opening_hours: Optional[Dict[str, Any]],
+                 types: Iterable[str],
+                 lat: float,
+                 lng: float,
+                 distance_from_midpoint: Optional[float],
+                 detour: Optional[float] = None):
+        self.place_id = place_id
+        self.name = name
+        self.address = address
+        self.rating = rating
+        self.price_level = price_level
+        self.opening_hours = opening_hours
+        self.types = tuple(map(sys.intern, types))
+        self.lat = lat
+        self.lng = lng
+        self.distance_from_midpoint = distance_from_midpoint
+        self.detour = detour  # meters added to a trip by stopping here (corridor searches)
+
+    def __setstate__(self, state):
+        # Pickles from before a slot was added (snapshots, the shared cache) lack it
+        self.detour = None
+        for name, value in (state[1] if isinstance(state, tuple) else state).items():
+            setattr(self, name, value)
+
+    def with_distance(self, distance_from_midpoint: float) -> "Candidate":
+        """Copy of the candidate measured from a different search point"""
+        copy = self._copy()
+        copy.distance_from_midpoint = distance_from_midpoint
+        return copy
+
+    def with_detour(self, detour: float) -> "Candidate":
+        """Copy of the candidate measured by its detour from a route rather than from a point"""
+        copy = self._copy()
+        copy.distance_from_midpoint = None
+        copy.detour = detour
+        return copy
+
+    def _copy(self) -> "Candidate":
+        copy = Candidate.__new__(Candidate)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        return copy
+
+    def to_result(self,
+                  photos: Optional[List[str]] = None,
+                  opening_hours: Optional[Dict[str, Any]] = None) -> PlaceResult:
+        """
+        Materialize the API model for a candidate that made the final cut;
+        opening_hours from place details take precedence over the search's
+        """
+        return PlaceResult(
+            name=self.name,
+            place_id=self.place_id,
+            address=self.address,
+            rating=self.rating,
+            price_level=self.price_level,
+            opening_hours=opening_hours or self.opening_hours,
+            photos=photos or [],
+            distance_from_midpoint=self.distance_from_midpoint,
+            distance_text=format_distance(self.distance_from_midpoint),
+            detour=self.detour,
+            detour_text=format_distance(self.detour),
+            types=list(self.types)
+        )
+
+
+class CandidatePool(list):
+    """
+    Candidates fetched for one search. complete is False when fetching
+    stopped early because enough of them passed the constraints of the
+    time, so a stricter filter may find more upstream than in the pool.
+    """
+
+    def __init__(self, candidates: Iterable[Candidate] = (), complete: bool = True):
+        super().__init__(candidates)
+        self.complete = complete
+
+
+def is_complete(pool: Sequence[Candidate]) -> bool:
+    """Whether a pool holds everything its search could return; plain lists count as complete"""
+    return getattr(pool, "complete", True)
+
+
+class CandidateBatch:
+    """
+    Columnar view of a set of candidate places.
+
+    Numeric attributes are NumPy arrays so ranking and filtering can run as
+    array operations over the whole batch; missing values are NaN.
+    """
+
+    def __init__(self,
+                 place_ids: Sequence[str],
+                 names: Sequence[str],
+                 rating: np.ndarray,
+                 price_level: np.ndarray,
+                 open_now: np.ndarray,
+                 distance: np.ndarray,
+                 types: Sequence[Sequence[str]],
+                 constraint_matches: Optional[np.ndarray] = None,
+                 opening_hours: Optional[Sequence[Optional[Dict[str, Any]]]] = None):
+        self.place_ids = place_ids
+        self.names = names
+        self.rating = rating
+        self.price_level = price_level
+        self.open_now = open_now
+        self.distance = distance
+        self.types = types
+        self.constraint_matches = (constraint_matches if constraint_matches is not None
+                                   else np.zeros(len(place_ids)))
+        self.opening_hours = opening_hours
+        # Derived columns are built on first use, only for the checks a request needs
+        self._type_bits = None
+        self._closes_late = None
+        self._lower_names = None
+
+    @property
+    def type_bits(self) -> np.ndarray:
+        if self._type_bits is None:
+            self._type_bits = np.fromiter((type_mask(t) for t in self.types), dtype=np.uint64, count=len(self.types))
+        return self._type_bits
+
+    @property
+    def closes_late(self) -> np.ndarray:
+        if self._closes_late is None:
+            if self.opening_hours is None:
+                self._closes_late = np.full(len(self), np.nan)
+            else:
+                self._closes_late = _column([closes_late(h) for h in self.opening_hours])
+        return self._closes_late
+
+    def has_any_type(self, types: Iterable[str]) -> np.ndarray:
+        """Boolean mask of candidates having at least one of the given types"""
+        types = set(types)
+        overflow = {t for t in types if type_bit(t) == _OVERFLOW_BIT}
+        mask = (self.type_bits & np.uint64(type_mask(types - overflow))) != 0
+        if overflow:
+            # The shared bit would match unrelated types, so test these by name
+            mask |= np.fromiter((not overflow.isdisjoint(t) for t in self.types), dtype=bool, count=len(self.types))
+        return mask
+
+    def name_contains(self, *keywords: str) -> np.ndarray:
+        """Boolean mask of candidates whose name contains any keyword (case-insensitive)"""
+        if self._lower_names is None:
+            self._lower_names = np.char.lower(np.array(self.names, dtype=str))
+        mask = np.zeros(len(self), dtype=bool)
+        for keyword in keywords:
+            mask |= np.char.find(self._lower_names, keyword) >= 0
+        return mask
+
+    def __len__(self) -> int:
+        return len(self.place_ids)
+
+    @classmethod
+    def from_results(cls, results: Sequence[Any]) -> "CandidateBatch":
+        """Build a batch from Candidate records (or anything shaped like PlaceResult)"""
+        return cls(
+            place_ids=[r.place_id for r in results],
+            names=[r.name for r in results],
+            rating=_column([r.rating for r in results]),
+            price_level=_column([r.price_level for r in results]),
+            open_now=_column([_open_now(r.opening_hours) for r in results]),
+            distance=_column([r.distance_from_midpoint for r in results]),
+            types=[r.types for r in results],
+            opening_hours=[r.opening_hours for r in results]
+        )
+
+
+def dedupe_candidates(candidates: Iterable[Candidate], precision: int = 7) -> List[Candidate]:
+    """
+    Keep the first of each place: repeats share a place_id, or have the same
+    normalized name in the same or a neighbouring geohash cell (precision 7
+    cells are ~150m), e.g. when overlapping searches or providers list it
+    """
+    unique = []
+    seen_ids = set()
+    names_by_cell: Dict[str, set] = {}
+    for candidate in candidates:
+        if candidate.place_id in seen_ids:
+            continue
+        name = " ".join(candidate.name.lower().split())
+        cell = geohash.encode(candidate.lat, candidate.lng, precision)
+        if any(name in names_by_cell.get(nearby, ()) for nearby in [cell] + geohash.neighbors(cell)):
+            continue
+        seen_ids.add(candidate.place_id)
+        names_by_cell.setdefault(cell, set()).add(name)
+        unique.append(candidate)
+    return unique
+
+
+def format_distance(distance_meters: Optional[float]) -> Optional[str]:
+    """
+    Format distance in a human-readable way
+    """
+    if distance_meters is None:
+        return None
+    if distance_meters < 1000:
+        return f"{int(distance_meters)}m"
+    return f"{distance_meters/1000:.1f}km"
+
+
+def _column(values: List[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _open_now(opening_hours: Optional[Dict[str, Any]]) -> Optional[float]:
+    if not opening_hours or "open_now" not in opening_hours:
+        return None
+    return 1.0 if opening_hours["open_now"] else 0.0
+
+
+def closes_late(opening_hours: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    1.0 if the opening hours show closing at/after LATE_CLOSING_TIME or past
+    midnight, 0.0 if they show earlier closing, None when unknown
+    """
+    if not opening_hours:
+        return None
+
+    periods = opening_hours.get("periods")
+    if periods:
+        for period in periods:
+            close = period.get("close")
+            if close is None:
+                return 1.0  # open 24 hours
+            if close.get("day") != period.get("open", {}).get("day") or int(close.get("time", 0)) >= LATE_CLOSING_TIME:
+                return 1.0
+        return 0.0
+
+    # Fall back to the display text, e.g. "Mon-Sun: 7:00 AM - 10:00 PM"
+    closing_times = []
+    for line in opening_hours.get("weekday_text") or []:
+        match = re.search(r"(\d{1,2}):(\d{2})\s*([AP]M)\s*$", line)
+        if match:
+            hour = int(match.group(1)) % 12 + (12 if match.group(3) == "PM" else 0)
+            closing_times.append(hour * 100 + int(match.group(2)))
+        elif "open 24 hours" in line.lower():
+            closing_times.append(2400)
+    if not closing_times:
+        return None
+    return 1.0 if max(closing_times) >= LATE_CLOSING_TIME or min(closing_times) < 600 else 0.0
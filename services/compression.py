@@ -0,0 +1,71 @@
+import gzip
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # fall back to gzip-only negotiation
+    brotli = None
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header, preferring brotli
+    over gzip at equal quality; None means send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    offered = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        offered[coding.lower()] = quality
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = offered.get(coding, offered.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5 if level is None else level)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6 if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class EncodedBody:
+    """
+    A serialized response body plus its compressed variants.
+
+    Variants are produced on first request for each coding and kept with
+    the body, so a cached body is compressed at most once per coding.
+    Bodies below min_size are always sent as-is.
+    """
+
+    def __init__(self, body: bytes, media_type: str, min_size: int = 1024):
+        self.body = body
+        self.media_type = media_type
+        self.min_size = min_size
+        self.variants: Dict[str, bytes] = {}
+
+    def variant(self, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """
+        Body to send for the negotiated encoding, and the Content-Encoding to label it with
+        """
+        if encoding is None or len(self.body) < self.min_size:
+            return self.body, None
+        if encoding not in self.variants:
+            self.variants[encoding] = compress(self.body, encoding)
+        return self.variants[encoding], encoding
@@ -0,0 +1,177 @@
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from .candidates import CandidateBatch, closes_late, reserve_type_bits
+from .models import PlaceResult
+
+# Place types that suggest a constraint is met
+NIGHTLIFE_TYPES = ("bar", "night_club", "casino", "stadium")
+WIFI_TYPES = ("cafe", "coffee shop", "library", "lodging", "book_store")
+QUICK_SERVICE_TYPES = ("cafe", "coffee shop", "bakery", "meal_takeaway", "fast_food")
+PARKING_TYPES = ("parking",)
+OUTDOOR_KEYWORDS = ("patio", "garden", "terrace", "rooftop", "beach", "park")
+
+reserve_type_bits(NIGHTLIFE_TYPES + WIFI_TYPES + QUICK_SERVICE_TYPES + PARKING_TYPES)
+
+
+class ConstraintEvaluator:
+    """
+    Fast check for one constraint, both per place and over a batch.
+
+    Hard constraints filter candidates out. Soft constraints cannot be
+    verified from Places data (there is no wifi or parking field), so they
+    only count toward the constraint_matches ranking feature.
+    """
+
+    def __init__(self,
+                 name: str,
+                 place_check: Callable[[PlaceResult], bool],
+                 batch_check: Callable[[CandidateBatch], np.ndarray],
+                 hard: bool):
+        self.name = name
+        self.place_check = place_check
+        self.batch_check = batch_check
+        self.hard = hard
+
+
+class CompiledConstraints:
+    """
+    A request's constraints compiled once into a predicate.
+
+    Call it on a single place, or use mask()/matches() on a columnar batch.
+    """
+
+    def __init__(self, evaluators: List[ConstraintEvaluator]):
+        self.evaluators = evaluators
+        self.hard = [e for e in evaluators if e.hard]
+
+    def __call__(self, place: PlaceResult) -> bool:
+        return all(e.place_check(place) for e in self.hard)
+
+    def mask(self, batch: CandidateBatch) -> np.ndarray:
+        """Boolean mask of candidates passing every hard constraint"""
+        mask = np.ones(len(batch), dtype=bool)
+        for evaluator in self.hard:
+            mask &= evaluator.batch_check(batch)
+        return mask
+
+    def matches(self, batch: CandidateBatch) -> np.ndarray:
+        """Number of constraints (hard or soft) each candidate satisfies"""
+        counts = np.zeros(len(batch))
+        for evaluator in self.evaluators:
+            counts += evaluator.batch_check(batch)
+        return counts
+
+    def match_count(self, place: PlaceResult) -> int:
+        return sum(1 for e in self.evaluators if e.place_check(place))
+
+
+def _types(place: PlaceResult) -> set:
+    return set(place.types)
+
+
+def _name_has(place: PlaceResult, keywords) -> bool:
+    name = place.name.lower()
+    return any(keyword in name for keyword in keywords)
+
+
+def _rating_min(value: Any) -> ConstraintEvaluator:
+    minimum = float(value)
+    return ConstraintEvaluator(
+        "rating_min",
+        lambda p: p.rating is None or p.rating >= minimum,
+        lambda b: np.isnan(b.rating) | (b.rating >= minimum),
+        hard=True
+    )
+
+
+def _price_range(value: Any) -> ConstraintEvaluator:
+    maximum = float(value)
+    return ConstraintEvaluator(
+        "price_range",
+        lambda p: p.price_level is None or p.price_level <= maximum,
+        lambda b: np.isnan(b.price_level) | (b.price_level <= maximum),
+        hard=True
+    )
+
+
+def _open_late(value: Any) -> ConstraintEvaluator:
+    # Unknown hours pass: the text search query already asks for "open late"
+    return ConstraintEvaluator(
+        "open_late",
+        lambda p: closes_late(p.opening_hours) != 0.0,
+        lambda b: b.closes_late != 0.0,
+        hard=True
+    )
+
+
+def _parking(value: Any) -> ConstraintEvaluator:
+    return ConstraintEvaluator(
+        "parking",
+        lambda p: bool(_types(p) & set(PARKING_TYPES)) or _name_has(p, ("parking",)),
+        lambda b: b.has_any_type(PARKING_TYPES) | b.name_contains("parking"),
+        hard=False
+    )
+
+
+def _quiet(value: Any) -> ConstraintEvaluator:
+    return ConstraintEvaluator(
+        "quiet",
+        lambda p: not _types(p) & set(NIGHTLIFE_TYPES),
+        lambda b: ~b.has_any_type(NIGHTLIFE_TYPES),
+        hard=False
+    )
+
+
+def _wifi(value: Any) -> ConstraintEvaluator:
+    return ConstraintEvaluator(
+        "wifi",
+        lambda p: bool(_types(p) & set(WIFI_TYPES)) or _name_has(p, ("coffee", "cafe")),
+        lambda b: b.has_any_type(WIFI_TYPES) | b.name_contains("coffee", "cafe"),
+        hard=False
+    )
+
+
+def _time_limit(value: Any) -> ConstraintEvaluator:
+    return ConstraintEvaluator(
+        "time_limit",
+        lambda p: bool(_types(p) & set(QUICK_SERVICE_TYPES)),
+        lambda b: b.has_any_type(QUICK_SERVICE_TYPES),
+        hard=False
+    )
+
+
+def _outdoor_seating(value: Any) -> ConstraintEvaluator:
+    return ConstraintEvaluator(
+        "outdoor_seating",
+        lambda p: _name_has(p, OUTDOOR_KEYWORDS),
+        lambda b: b.name_contains(*OUTDOOR_KEYWORDS),
+        hard=False
+    )
+
+
+# One evaluator factory per entry in config.CONSTRAINT_TYPES
+EVALUATORS: Dict[str, Callable[[Any], ConstraintEvaluator]] = {
+    "parking": _parking,
+    "quiet": _quiet,
+    "open_late": _open_late,
+    "wifi": _wifi,
+    "rating_min": _rating_min,
+    "time_limit": _time_limit,
+    "price_range": _price_range,
+    "outdoor_seating": _outdoor_seating,
+}
+
+
+def compile_constraints(constraints: Optional[List[Dict[str, Any]]]) -> CompiledConstraints:
+    """
+    Compile a ParsedQuery.constraints list into a predicate; unknown types
+    and disabled flags (value False/None) are ignored
+    """
+    evaluators = []
+    for constraint in constraints or []:
+        factory = EVALUATORS.get(constraint.get("type"))
+        value = constraint.get("value")
+        if factory is None or value is None or value is False:
+            continue
+        evaluators.append(factory(value))
+    return CompiledConstraints(evaluators)
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Any, Dict, List, Tuple
+import config
+from . import geohash
+from .candidates import Candidate, CandidatePool, dedupe_candidates, is_complete
+from .constraints import compile_constraints
+from .geo import detour, great_circle_points, haversine
+from .models import Location
+from .upstream import UpstreamUnavailableError
+
+
+class CorridorSearch:
+    """
+    Search for places anywhere along the path through a query's locations.
+
+    The great-circle path is sampled and each sample is snapped to the
+    center of its geohash cell, so corridors between the same cities (in
+    either direction) search exactly the same points, and those per-cell
+    searches are answered by the backend's candidate caches. Long paths use
+    coarser cells to stay within max_cells, but never cells too big for a
+    max_radius search (the Places limit): past that, the path gets as many
+    max_radius searches as it takes to cover it. Cell searches run concurrently
+    under one semaphore shared by every corridor request. Hits from
+    overlapping cells are deduplicated and measured by detour cost: the
+    extra distance of stopping there instead of going straight along the
+    nearest leg of the trip. They are ranked by detour, rounded to
+    detour_step so that among stops costing about the same the better
+    rated one comes first.
+    """
+
+    def __init__(self, maps_service, precision: int = 5, max_cells: int = 20, concurrency: int = 8,
+                 detour_step: float = 500, max_radius: float = 50000):
+        self.maps_service = maps_service
+        self.precision = precision
+        self.max_cells = max_cells
+        self.max_radius = max_radius
+        self.detour_step = detour_step
+        self.slots = asyncio.Semaphore(concurrency)
+
+    async def candidate_pool(self,
+                             place_type: str,
+                             locations: List[Location],
+                             constraints: List[Dict[str, Any]] = None,
+                             exhaustive: bool = False) -> List[Candidate]:
+        waypoints = [(location.lat, location.lng) for location in locations]
+        cells, radius = self.cells(waypoints)
+
+        searches = await asyncio.gather(
+            *(self._search_cell(place_type, cell, radius, constraints, exhaustive) for cell in cells),
+            return_exceptions=True
+        )
+        found = []
+        complete = True
+        for result in searches:
+            if isinstance(result, UpstreamUnavailableError):
+                complete = False
+                continue
+            if isinstance(result, BaseException):
+                print(f"Error searching corridor cell: {result}")
+                complete = False
+                continue
+            complete = complete and is_complete(result)
+            found.extend(result)
+        if not found:
+            unavailable = [r for r in searches if isinstance(r, UpstreamUnavailableError)]
+            if unavailable:
+                raise unavailable[0]
+
+        return CandidatePool((candidate.with_detour(self.detour_cost(waypoints, candidate.lat, candidate.lng))
+                              for candidate in dedupe_candidates(found)), complete)
+
+    def rank(self, pool: List[Candidate], constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        """
+        Candidates passing the constraints, smallest detour first, keeping enough for later pages
+        """
+        predicate = compile_constraints(constraints)
+        matching = [candidate for candidate in pool if predicate(candidate)]
+        matching.sort(key=lambda c: (round(c.detour / self.detour_step), -(c.rating or 0.0), c.detour))
+        return matching[:config.PAGINATION_MAX_CANDIDATES]
+
+    def cells(self, waypoints: List[Tuple[float, float]]) -> Tuple[List[str], float]:
+        """
+        Geohash cells along the path, in path order, and the search radius
+        that covers one cell
+        """
+        # Cells narrow away from the equator: sample at the narrowest, cover the widest
+        widest = min(waypoints, key=lambda point: (abs(point[0]), point))
+        narrowest = max(waypoints, key=lambda point: (abs(point[0]), point))
+        for precision in range(self.precision, 0, -1):
+            spacing, _ = self._cell_size(narrowest, precision)
+            _, radius = self._cell_size(widest, precision)
+            if radius > self.max_radius:
+                break
+            cells = self._cells_along(waypoints, precision, spacing)
+            if len(cells) <= self.max_cells:
+                return cells, radius
+        # Too long for max_cells of searchable cells: search max_radius circles
+        # around fine cells, sampled so that every point of the path lies
+        # within max_radius of one (half a step to a sample, then at most the
+        # cell radius to its center)
+        _, snap = self._cell_size(widest, self.precision)
+        return self._cells_along(waypoints, self.precision, 2 * (self.max_radius - snap)), self.max_radius
+
+    @staticmethod
+    def _cell_size(point: Tuple[float, float], precision: int) -> Tuple[float, float]:
+        """
+        Sampling spacing that visits every cell the path crosses, and the
+        radius that covers a cell (half its diagonal reaches every corner)
+        """
+        min_lat, min_lng, max_lat, max_lng = geohash.bounds(geohash.encode(*point, precision))
+        spacing = min(haversine(min_lat, min_lng, max_lat, min_lng),
+                      haversine(min_lat, min_lng, min_lat, max_lng)) / 2
+        return spacing, haversine(min_lat, min_lng, max_lat, max_lng) / 2
+
+    @staticmethod
+    def _cells_along(waypoints: List[Tuple[float, float]], precision: int, spacing: float) -> List[str]:
+        cells = {}
+        for start, end in zip(waypoints, waypoints[1:]):
+            # Sample each leg in one fixed direction so a trip and its return search the same points
+            points = great_circle_points(*min(start, end), *max(start, end), spacing)
+            if start > end:
+                points.reverse()
+            for lat, lng in points:
+                cells.setdefault(geohash.encode(lat, lng, precision), None)
+        return list(cells)
+
+    @staticmethod
+    def detour_cost(waypoints: List[Tuple[float, float]], lat: float, lng: float) -> float:
+        """
+        Smallest extra distance in meters for a stop at (lat, lng) on any leg of the trip
+        """
+        return min(max(0.0, detour(lat1, lng1, lat2, lng2, lat, lng))
+                   for (lat1, lng1), (lat2, lng2) in zip(waypoints, waypoints[1:]))
+
+    async def _search_cell(self, place_type: str, cell: str, radius: float,
+                           constraints: List[Dict[str, Any]], exhaustive: bool = False) -> List[Candidate]:
+        lat, lng = geohash.decode(cell)
+        async with self.slots:
+            return await self.maps_service.candidate_pool(
+                place_type,
+                Location(lat=lat, lng=lng, address=cell),
+                int(radius),
+                constraints,
+                expand=False,
+                exhaustive=exhaustive
+            )
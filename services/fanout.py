@@ -0,0 +1,219 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+import config
+from .cache import LRUCache
+from .candidates import Candidate, CandidatePool, dedupe_candidates, is_complete
+from .constraints import compile_constraints
+from .models import PlaceResult, Location
+from .upstream import UpstreamUnavailableError
+
+
+class FanoutMapsService:
+    """
+    Maps backend that sends each place search to several providers at once.
+
+    The first provider (in order) that answers with at least MAX_RESULTS
+    candidates passing the constraints wins and the search returns without
+    waiting for the rest. At the deadline the search returns whatever has
+    arrived, or the first answer after it if nothing has. Providers still
+    running keep going in the background and their candidates are merged
+    into the pool cached for that search, so a repeat gets every provider's
+    results. The same place listed by several providers is deduplicated by
+    place_id and by normalized name in nearby geohash cells, keeping the
+    winner's copy. Geocoding, meeting points and ranking use the primary.
+    """
+
+    def __init__(self, primary, secondary, deadline: float = 1.5,
+                 cache_size: int = 2000, ttl: float = 600):
+        self.primary = primary
+        self.upstream = getattr(primary, "upstream", None)
+        self.providers = [primary, secondary]
+        self.deadline = deadline
+        self.pools = LRUCache(cache_size, ttl=ttl)
+        # Which provider a candidate came from, so it is enriched by the same one
+        self.origins = LRUCache(cache_size * config.PAGINATION_MAX_CANDIDATES,
+                                ttl=max(config.PAGINATION_TTL, config.SESSION_TTL))
+        self.wins = [0] * len(self.providers)
+        self.shortfalls = 0
+        self.late_merges = 0
+        self._late = set()
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        stats = {}
+        for provider in self.providers:
+            cache_stats = getattr(provider, "cache_stats", None)
+            if cache_stats:
+                stats.update(cache_stats())
+        stats["fanout"] = {
+            **self.pools.stats(),
+            "primary_wins": self.wins[0],
+            "secondary_wins": self.wins[1],
+            "shortfalls": self.shortfalls,
+            "late_merges": self.late_merges
+        }
+        return stats
+
+    def local_caches(self) -> Dict[str, LRUCache]:
+        """
+        In-memory caches worth persisting across restarts
+        """
+        caches = {}
+        for index, provider in enumerate(self.providers):
+            local_caches = getattr(provider, "local_caches", None)
+            if local_caches:
+                prefix = "" if index == 0 else f"provider{index}_"
+                caches.update({prefix + name: cache for name, cache in local_caches().items()})
+        return caches
+
+    def close(self):
+        for task in self._late:
+            task.cancel()
+        for provider in self.providers:
+            close = getattr(provider, "close", None)
+            if close:
+                close()
+
+    async def geocode_location(self, location_name: str) -> Optional[Location]:
+        return await self.primary.geocode_location(location_name)
+
+    async def calculate_midpoint(self, location1: Location, location2: Location) -> Location:
+        return await self.primary.calculate_midpoint(location1, location2)
+
+    async def find_meeting_point(self, locations: List[Location]) -> Location:
+        return await self.primary.find_meeting_point(locations)
+
+    async def search_places(self,
+                            place_type: str,
+                            location: Location,
+                            radius: int = 5000,
+                            constraints: List[Dict[str, Any]] = None) -> List[PlaceResult]:
+        ranked = await self.rank_candidates(place_type, location, radius, constraints)
+        return await self.enrich(ranked[:config.MAX_RESULTS])
+
+    async def rank_candidates(self,
+                              place_type: str,
+                              location: Location,
+                              radius: int = 5000,
+                              constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        try:
+            pool = await self.candidate_pool(place_type, location, radius, constraints)
+            return self.rank(pool, constraints)
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            print(f"Error searching places: {e}")
+            return []
+
+    async def candidate_pool(self,
+                             place_type: str,
+                             location: Location,
+                             radius: int = 5000,
+                             constraints: List[Dict[str, Any]] = None,
+                             expand: bool = True,
+                             exhaustive: bool = False) -> List[Candidate]:
+        """
+        Candidates from the first provider with enough of them, plus anything
+        the others returned by then; exhaustive searches wait for every provider
+        """
+        key = (place_type, location.lat, location.lng, radius, expand, exhaustive,
+               json.dumps(constraints or [], sort_keys=True))
+        pool = self.pools.get(key)
+        if pool is not None:
+            return pool
+
+        predicate = compile_constraints(constraints)
+        tasks = {
+            asyncio.create_task(provider.candidate_pool(place_type, location, radius, constraints, expand, exhaustive)): index
+            for index, provider in enumerate(self.providers)
+        }
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline if not exhaustive else None
+        found: Dict[int, List[Candidate]] = {}
+        errors = []
+        winner = None
+        pending = set(tasks)
+        while pending and winner is None:
+            remaining = deadline - loop.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0 and found:
+                break
+            # Past the deadline with nothing to show, take the first answer
+            done, pending = await asyncio.wait(pending, timeout=remaining if remaining and remaining > 0 else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.get):
+                index = tasks[task]
+                try:
+                    candidates = task.result()
+                except Exception as e:
+                    if not isinstance(e, UpstreamUnavailableError):
+                        print(f"Error searching provider {type(self.providers[index]).__name__}: {e}")
+                    errors.append(e)
+                    continue
+                self._remember(index, candidates)
+                found[index] = candidates
+                if (winner is None and not exhaustive
+                        and sum(1 for c in candidates if predicate(c)) >= config.MAX_RESULTS):
+                    winner = index
+
+        if not found:
+            raise next((e for e in errors if isinstance(e, UpstreamUnavailableError)), errors[0])
+        if winner is not None:
+            self.wins[winner] += 1
+        elif not exhaustive:
+            self.shortfalls += 1
+
+        order = sorted(found, key=lambda index: (index != winner, index))
+        complete = not pending and not errors and all(is_complete(found[index]) for index in found)
+        pool = CandidatePool(dedupe_candidates(candidate for index in order for candidate in found[index]), complete)
+        self.pools.set(key, pool)
+        for task in pending:
+            self._late.add(task)
+            task.add_done_callback(lambda task, key=key: self._merge_late(key, tasks[task], task))
+        return pool
+
+    def rank(self, pool: List[Candidate], constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        return self.primary.rank(pool, constraints)
+
+    async def enrich(self, candidates: List[Candidate]) -> List[PlaceResult]:
+        """
+        Enrich each candidate through the provider it came from, keeping the order
+        """
+        by_provider: Dict[int, List[int]] = {}
+        for position, candidate in enumerate(candidates):
+            by_provider.setdefault(self.origins.get(candidate.place_id, 0), []).append(position)
+        enriched = await asyncio.gather(*(
+            self.providers[index].enrich([candidates[position] for position in positions])
+            for index, positions in by_provider.items()
+        ))
+        results = [None] * len(candidates)
+        for positions, batch in zip(by_provider.values(), enriched):
+            for position, result in zip(positions, batch):
+                results[position] = result
+        return results
+
+    def get_directions_url(self, destination_place_id: str, origin: str = None) -> str:
+        return self.primary.get_directions_url(destination_place_id, origin)
+
+    def get_embed_map_url(self, place_id: str) -> str:
+        return self.primary.get_embed_map_url(place_id)
+
+    def _remember(self, index: int, candidates: List[Candidate]):
+        for candidate in candidates:
+            if candidate.place_id not in self.origins:
+                self.origins.set(candidate.place_id, index)
+
+    def _merge_late(self, key, index: int, task: asyncio.Task):
+        """
+        Fold a provider that answered after the search returned into its cached pool
+        """
+        self._late.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            return
+        candidates = task.result()
+        self._remember(index, candidates)
+        pool = self.pools.get(key)
+        if pool is None:
+            return
+        # Other providers may still be missing, so a merged pool is never known complete
+        self.pools.set(key, CandidatePool(dedupe_candidates(pool + candidates), complete=False))
+        self.late_merges += 1
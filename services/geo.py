@@ -0,0 +1,88 @@
+import math
+from typing import List, Tuple
+
+EARTH_RADIUS = 6371000  # meters
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Great-circle distance between two points in meters
+    """
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lng = math.radians(lng2 - lng1)
+
+    a = (math.sin(delta_lat / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(delta_lng / 2) ** 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS * c
+
+
+def _to_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+    return (math.cos(lat_rad) * math.cos(lng_rad),
+            math.cos(lat_rad) * math.sin(lng_rad),
+            math.sin(lat_rad))
+
+
+def _from_vector(x: float, y: float, z: float) -> Tuple[float, float]:
+    return (math.degrees(math.atan2(z, math.hypot(x, y))),
+            math.degrees(math.atan2(y, x)))
+
+
+def spherical_centroid(points: List[Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    Centroid of (lat, lng) points on the sphere, correct across long spans
+    and the antimeridian unlike averaging degrees
+    """
+    vectors = [_to_vector(lat, lng) for lat, lng in points]
+    x = sum(v[0] for v in vectors) / len(vectors)
+    y = sum(v[1] for v in vectors) / len(vectors)
+    z = sum(v[2] for v in vectors) / len(vectors)
+    if math.isclose(math.hypot(x, y, z), 0.0, abs_tol=1e-12):
+        # Antipodal inputs have no meaningful centroid; fall back to the first point
+        return points[0]
+    return _from_vector(x, y, z)
+
+
+def offset(lat: float, lng: float, north: float, east: float) -> Tuple[float, float]:
+    """
+    Move a point by the given meters north and east (local flat-earth approximation)
+    """
+    new_lat = lat + math.degrees(north / EARTH_RADIUS)
+    new_lng = lng + math.degrees(east / (EARTH_RADIUS * max(math.cos(math.radians(lat)), 1e-6)))
+    return new_lat, (new_lng + 180) % 360 - 180
+
+
+def great_circle_points(lat1: float, lng1: float, lat2: float, lng2: float,
+                        spacing: float) -> List[Tuple[float, float]]:
+    """
+    Points at most `spacing` meters apart along the great circle between
+    two points, both ends included
+    """
+    angle = haversine(lat1, lng1, lat2, lng2) / EARTH_RADIUS
+    if math.sin(angle) < 1e-12:
+        # Same or antipodal points: no unique path between them
+        return [(lat1, lng1), (lat2, lng2)] if angle > 0 else [(lat1, lng1)]
+
+    start, end = _to_vector(lat1, lng1), _to_vector(lat2, lng2)
+    steps = max(1, math.ceil(angle * EARTH_RADIUS / spacing))
+    points = []
+    for step in range(steps + 1):
+        fraction = step / steps
+        a = math.sin((1 - fraction) * angle) / math.sin(angle)
+        b = math.sin(fraction * angle) / math.sin(angle)
+        points.append(_from_vector(*(a * s + b * e for s, e in zip(start, end))))
+    return points
+
+
+def detour(lat1: float, lng1: float, lat2: float, lng2: float, lat: float, lng: float) -> float:
+    """
+    Extra meters travelled going from the first point to the second via (lat, lng)
+    instead of directly
+    """
+    return (haversine(lat1, lng1, lat, lng) + haversine(lat, lng, lat2, lng2)
+            - haversine(lat1, lng1, lat2, lng2))
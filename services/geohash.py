@@ -0,0 +1,80 @@
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+
+
+def encode(lat: float, lng: float, precision: int = 6) -> str:
+    """
+    Encode a point as a geohash of the given length (precision 6 is ~1.2km x 0.6km)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coordinate >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Bounding box of a geohash cell as (min_lat, min_lng, max_lat, max_lng)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """
+    Center point (lat, lng) of a geohash cell
+    """
+    min_lat, min_lng, max_lat, max_lng = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+def neighbors(geohash: str) -> List[str]:
+    """
+    The eight cells surrounding a geohash cell, at the same precision
+    """
+    min_lat, min_lng, max_lat, max_lng = bounds(geohash)
+    lat, lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    height, width = max_lat - min_lat, max_lng - min_lng
+    cells = []
+    for d_lat in (-1, 0, 1):
+        for d_lng in (-1, 0, 1):
+            if d_lat == 0 and d_lng == 0:
+                continue
+            n_lat = lat + d_lat * height
+            if not -90 <= n_lat <= 90:
+                continue
+            n_lng = (lng + d_lng * width + 180) % 360 - 180
+            cells.append(encode(n_lat, n_lng, len(geohash)))
+    return cells
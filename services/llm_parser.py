@@ -1,9 +1,13 @@
+import asyncio
 import requests
 import json
 import os
 import re
+import time
 from typing import Dict, Any, List
+import config
 from .models import ParsedQuery
+from .upstream import AdaptiveTimeout
 
 
 class LLMParser:
@@ -11,6 +15,13 @@ class LLMParser:
         # Use Hugging Face free API instead of OpenAI
         self.hf_api_url = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
         self.hf_token = os.getenv("HUGGINGFACE_TOKEN", "")  # Optional, works without token too
+        self.latency = AdaptiveTimeout(
+            config.PARSER_TIMEOUT,
+            minimum=config.UPSTREAM_TIMEOUT_MIN,
+            percentile=config.UPSTREAM_TIMEOUT_PERCENTILE,
+            multiplier=config.UPSTREAM_TIMEOUT_MULTIPLIER,
+            window=config.UPSTREAM_LATENCY_WINDOW
+        )
     
     async def parse_query(self, user_input: str) -> ParsedQuery:
         """
@@ -24,6 +35,12 @@ class LLMParser:
             # Fallback to improved local parsing
             return self._improved_fallback_parse(user_input)
     
+    def parse_query_fast(self, user_input: str) -> ParsedQuery:
+        """
+        Parse with the local rules only; cheap enough to run before the full parse
+        """
+        return self._improved_fallback_parse(user_input)
+    
     async def _parse_with_hf_api(self, user_input: str) -> ParsedQuery:
         """Try to use Hugging Face free API"""
         headers = {}
@@ -35,7 +52,17 @@ class LLMParser:
             "parameters": {"max_length": 100, "temperature": 0.1}
         }
         
-        response = requests.post(self.hf_api_url, headers=headers, json=payload, timeout=10)
+        # Run the blocking HTTP call off the event loop so other stages can overlap it
+        timeout = self.latency.timeout
+        start = time.monotonic()
+        try:
+            response = await asyncio.to_thread(
+                requests.post, self.hf_api_url, headers=headers, json=payload, timeout=timeout
+            )
+        except requests.Timeout:
+            self.latency.record(timeout)
+            raise
+        self.latency.record(time.monotonic() - start)
         
         if response.status_code == 200:
             result = response.json()
@@ -119,8 +146,13 @@ class LLMParser:
             if "km" in unit or "mile" in unit:
                 radius = value * 1000  # convert to meters
         
+        # A stop anywhere along the trip rather than around one point
+        corridor = len(locations) >= 2 and any(phrase in user_lower for phrase in [
+            "along the way", "on the way", "on my way", "en route", "along the route", "road trip"
+        ])
+        
         # Determine if midpoint calculation is needed
-        midpoint_calculation = any(phrase in user_lower for phrase in [
+        midpoint_calculation = not corridor and any(phrase in user_lower for phrase in [
             "halfway", "between", "midpoint", "middle"
         ])
         
@@ -129,5 +161,6 @@ class LLMParser:
             locations=locations,
             constraints=constraints,
             midpoint_calculation=midpoint_calculation,
-            radius=radius
+            radius=radius,
+            corridor=corridor
         )
@@ -1,19 +1,168 @@
+import asyncio
 import googlemaps
 import os
-from typing import List, Optional, Dict, Any, Tuple
+import requests
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+import config
+from . import geohash
+from .geo import haversine, spherical_centroid
+from .batch_loader import BatchLoader
+from .cache import LRUCache, RefreshingCache, RefreshSlots
+from .candidates import Candidate, CandidateBatch, CandidatePool, format_distance, is_complete
+from .constraints import compile_constraints
+from .meeting_point import MeetingPoint, MeetingPointEngine
 from .models import PlaceResult, Location
+from .ranking import RankingEngine
+from .reverse_geocode import ReverseGeocodeCache
+from .shared_cache import SharedCache, TieredCache
+from .spatial_cache import SpatialCandidateCache
+from .upstream import UpstreamClient, UpstreamUnavailableError, attempt_timeout
+
+# Statuses worth retrying: quota/rate throttling and transient server errors
+RETRYABLE_STATUSES = {"OVER_QUERY_LIMIT", "RESOURCE_EXHAUSTED", "UNKNOWN_ERROR"}
+RETRYABLE_HTTP_CODES = {429, 500, 502, 503, 504}
+
+
+class SingleAttemptClient(googlemaps.Client):
+    """
+    googlemaps client that never retries on its own, so UpstreamClient's
+    backoff and rate limiting see every attempt, and that gives up on a
+    request when UpstreamClient abandons its attempt, so the thread is freed
+    """
+
+    def _request(self, url, params, first_request_time=None, retry_counter=0, *args, **kwargs):
+        # The SDK retries 5xx and transient statuses by calling itself again
+        if retry_counter > 0:
+            raise googlemaps.exceptions.TransportError("upstream returned a retryable status")
+        timeout = attempt_timeout()
+        if timeout is not None:
+            kwargs["requests_kwargs"] = dict(kwargs.get("requests_kwargs") or {}, timeout=timeout)
+        return super()._request(url, params, first_request_time, retry_counter, *args, **kwargs)
 
 
 class MapsService:
-    def __init__(self):
-        self.gmaps = googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY"))
+    def __init__(self, shared_cache: Optional[SharedCache] = None):
+        # Keep-alive connection pool shared by all upstream threads
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=config.UPSTREAM_MAX_CONCURRENCY
+        )
+        session.mount("https://", adapter)
+        
+        # Rate limiting, retries and adaptive timeouts are handled by
+        # UpstreamClient, which also bounds each SDK request to its attempt's
+        # timeout; the client-level timeout applies outside of it
+        self.session = session
+        self.gmaps = SingleAttemptClient(
+            key=os.getenv("GOOGLE_MAPS_API_KEY"),
+            timeout=config.DEFAULT_TIMEOUT,
+            retry_timeout=config.DEFAULT_TIMEOUT,
+            retry_over_query_limit=False,
+            queries_per_second=10000,
+            queries_per_minute=600000,
+            requests_session=session
+        )
+        # Token buckets are per process, so each worker gets its share of the quota
+        self.upstream = UpstreamClient(
+            qps={endpoint: qps / config.WORKERS for endpoint, qps in config.UPSTREAM_QPS.items()},
+            is_retryable=self._is_retryable,
+            is_throttled=self._is_throttled,
+            max_retries=config.UPSTREAM_MAX_RETRIES,
+            base_delay=config.UPSTREAM_BACKOFF_BASE,
+            max_delay=config.UPSTREAM_BACKOFF_MAX,
+            max_concurrency=config.UPSTREAM_MAX_CONCURRENCY,
+            timeout=config.DEFAULT_TIMEOUT,
+            min_timeout=config.UPSTREAM_TIMEOUT_MIN,
+            timeout_percentile=config.UPSTREAM_TIMEOUT_PERCENTILE,
+            timeout_multiplier=config.UPSTREAM_TIMEOUT_MULTIPLIER,
+            latency_window=config.UPSTREAM_LATENCY_WINDOW,
+            hedge_endpoints=config.UPSTREAM_HEDGE_ENDPOINTS,
+            hedge_percentile=config.UPSTREAM_HEDGE_PERCENTILE,
+            hedge_budget=config.UPSTREAM_HEDGE_BUDGET,
+            quotas=config.UPSTREAM_QUOTAS
+        )
+        self.meeting_points = MeetingPointEngine(
+            self.travel_time_matrix,
+            objective=config.MEETING_POINT_OBJECTIVE,
+            grid_size=config.MEETING_POINT_GRID_SIZE,
+            precision=config.MEETING_POINT_PRECISION,
+            cache_size=config.MEETING_POINT_CACHE_SIZE
+        )
+        self.ranking = RankingEngine(config.RANKING_WEIGHTS, config.RANKING_DISTANCE_SCALE)
+        # Lookups from concurrent requests are coalesced into batches below the caches
+        self.geocode_loader = BatchLoader(self._geocode, config.BATCH_LOADER_WINDOW, config.BATCH_LOADER_MAX_BATCH)
+        self.details_loader = BatchLoader(
+            self._fetch_place_details, config.BATCH_LOADER_WINDOW, config.BATCH_LOADER_MAX_BATCH
+        )
+        # Stale entries are served while one background refresh per key runs,
+        # limited to a few concurrent refreshes across all caches
+        refresh_slots = RefreshSlots(config.CACHE_REFRESH_CONCURRENCY)
+        self.geocode_cache = RefreshingCache(
+            TieredCache("geocode", shared_cache, config.GEOCODE_CACHE_SIZE, config.GEOCODE_CACHE_TTL),
+            soft_ttl=config.GEOCODE_CACHE_SOFT_TTL,
+            refresh_slots=refresh_slots
+        )
+        self.details_cache = RefreshingCache(
+            TieredCache("place_details", shared_cache, config.PLACE_DETAILS_CACHE_SIZE, config.PLACE_DETAILS_CACHE_TTL),
+            soft_ttl=config.PLACE_DETAILS_CACHE_SOFT_TTL,
+            refresh_slots=refresh_slots
+        )
+        self.reverse_geocodes = ReverseGeocodeCache(
+            self._reverse_geocode,
+            precision=config.REVERSE_GEOCODE_PRECISION,
+            max_size=config.REVERSE_GEOCODE_CACHE_SIZE,
+            ttl=config.REVERSE_GEOCODE_TTL,
+            refresh_slots=refresh_slots
+        )
+        self.sparse_areas = LRUCache(config.SPATIAL_CACHE_SIZE, ttl=config.RADIUS_EXPANSION_MEMORY)
+        self.spatial_cache = SpatialCandidateCache(
+            precision=config.SPATIAL_CACHE_PRECISION,
+            slack=config.SPATIAL_CACHE_SLACK,
+            max_size=config.SPATIAL_CACHE_SIZE,
+            ttl=config.SPATIAL_CACHE_TTL
+        )
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "geocode": self.geocode_cache.stats(),
+            "place_details": self.details_cache.stats(),
+            "spatial": self.spatial_cache.stats(),
+            "geocode_loader": self.geocode_loader.stats(),
+            "place_details_loader": self.details_loader.stats()
+        }
+    
+    def local_caches(self) -> Dict[str, LRUCache]:
+        """
+        In-memory caches worth persisting across restarts
+        """
+        return {
+            "geocode": self.geocode_cache.store.local,
+            "place_details": self.details_cache.store.local,
+            "reverse_geocode": self.reverse_geocodes.cache.store.local,
+            "travel_times": self.meeting_points.cells,
+            "spatial": self.spatial_cache.areas
+        }
+    
+    def close(self):
+        """
+        Release the upstream thread pool and pooled connections
+        """
+        self.upstream.close()
+        self.session.close()
     
     async def geocode_location(self, location_name: str) -> Optional[Location]:
         """
         Convert location name to coordinates
         """
+        key = " ".join(location_name.lower().split())
+        return await self.geocode_cache.get(key, lambda: self.geocode_loader.load(key))
+    
+    async def _geocode(self, location_name: str) -> Optional[Location]:
         try:
-            geocode_result = self.gmaps.geocode(location_name)
+            geocode_result = await self.upstream.call("geocode", self.gmaps.geocode, location_name)
             if geocode_result:
                 location = geocode_result[0]['geometry']['location']
                 return Location(
@@ -21,25 +170,59 @@ class MapsService:
                     lng=location['lng'],
                     address=geocode_result[0]['formatted_address']
                 )
+        except UpstreamUnavailableError:
+            raise
         except Exception as e:
             print(f"Error geocoding {location_name}: {e}")
         return None
     
     async def calculate_midpoint(self, location1: Location, location2: Location) -> Location:
         """
-        Calculate midpoint between two locations
+        Calculate the travel-time-balanced meeting point between two locations
         """
-        mid_lat = (location1.lat + location2.lat) / 2
-        mid_lng = (location1.lng + location2.lng) / 2
-        
-        # Reverse geocode to get address
+        return await self.find_meeting_point([location1, location2])
+    
+    async def find_meeting_point(self, locations: List[Location]) -> Location:
+        """
+        Find the point that balances travel time from every location
+        """
+        origins = [(location.lat, location.lng) for location in locations]
         try:
-            reverse_result = self.gmaps.reverse_geocode((mid_lat, mid_lng))
-            address = reverse_result[0]['formatted_address'] if reverse_result else "Midpoint Location"
-        except:
-            address = "Midpoint Location"
+            point = await self.meeting_points.find(origins)
+        except Exception as e:
+            print(f"Error scoring meeting point candidates: {e}")
+            point = MeetingPoint(*spherical_centroid(origins))
+        
+        # Display address comes from the cache so it never blocks the search
+        address = self.reverse_geocodes.lookup(point.lat, point.lng)
         
-        return Location(lat=mid_lat, lng=mid_lng, address=address)
+        return Location(lat=point.lat, lng=point.lng, address=address)
+    
+    async def _reverse_geocode(self, lat: float, lng: float) -> Optional[str]:
+        """
+        Look up the formatted address of a point
+        """
+        reverse_result = await self.upstream.call("reverse_geocode", self.gmaps.reverse_geocode, (lat, lng))
+        return reverse_result[0]['formatted_address'] if reverse_result else None
+    
+    async def travel_time_matrix(self,
+                                 origins: List[Tuple[float, float]],
+                                 destinations: List[Tuple[float, float]]) -> List[List[Optional[float]]]:
+        """
+        Travel times in seconds from every origin to every destination in one Distance Matrix request
+        """
+        matrix_result = await self.upstream.call(
+            "distance_matrix",
+            self.gmaps.distance_matrix,
+            origins,
+            destinations,
+            mode=config.TRAVEL_MODE
+        )
+        return [
+            [element['duration']['value'] if element.get('status') == 'OK' else None
+             for element in row['elements']]
+            for row in matrix_result.get('rows', [])
+        ]
     
     async def search_places(self, 
                           place_type: str, 
@@ -49,132 +232,296 @@ class MapsService:
         """
         Search for places using Google Places API
         """
+        ranked = await self.rank_candidates(place_type, location, radius, constraints)
+        return await self.enrich(ranked[:config.MAX_RESULTS])
+    
+    async def rank_candidates(self,
+                              place_type: str,
+                              location: Location,
+                              radius: int = 5000,
+                              constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        """
+        Candidates passing the constraints, best first, without place details
+        """
         try:
-            # Build the search query
-            query = place_type
-            
-            # Add constraints to query if they affect search terms
-            if constraints:
-                for constraint in constraints:
-                    if constraint.get("type") == "quiet" and constraint.get("value"):
-                        query += " quiet"
-                    elif constraint.get("type") == "open_late" and constraint.get("value"):
-                        query += " open late"
-            
-            # Perform text search
-            places_result = self.gmaps.places(
-                query=query,
-                location=(location.lat, location.lng),
-                radius=radius,
-                type='establishment'
-            )
-            
-            results = []
-            for place in places_result.get('results', [])[:10]:  # Limit to 10 results
-                # Get detailed information
-                place_details = self._get_place_details(place['place_id'])
-                
-                # Calculate distance from search location
-                distance = self._calculate_distance(
-                    location.lat, location.lng,
-                    place['geometry']['location']['lat'],
-                    place['geometry']['location']['lng']
-                )
-                
-                result = PlaceResult(
-                    name=place.get('name', 'Unknown'),
-                    place_id=place['place_id'],
-                    address=place.get('formatted_address', 'Address not available'),
-                    rating=place.get('rating'),
-                    price_level=place.get('price_level'),
-                    opening_hours=place_details.get('opening_hours', {}),
-                    photos=place_details.get('photos', []),
-                    distance_from_midpoint=distance,
-                    distance_text=self._format_distance(distance),
-                    types=place.get('types', [])
-                )
-                
-                # Apply constraints filtering
-                if self._meets_constraints(result, constraints or []):
-                    results.append(result)
-            
-            # Sort by rating and distance
-            results.sort(key=lambda x: (
-                -(x.rating or 0),  # Higher rating first
-                x.distance_from_midpoint or float('inf')  # Closer first
-            ))
-            
-            return results[:3]  # Return top 3 results
+            pool = await self.candidate_pool(place_type, location, radius, constraints)
+            return self.rank(pool, constraints)
             
+        except UpstreamUnavailableError:
+            # Quota/overload must not look like "no results"
+            raise
         except Exception as e:
             print(f"Error searching places: {e}")
             return []
     
-    def _get_place_details(self, place_id: str) -> Dict[str, Any]:
+    async def candidate_pool(self,
+                             place_type: str,
+                             location: Location,
+                             radius: int = 5000,
+                             constraints: List[Dict[str, Any]] = None,
+                             expand: bool = True,
+                             exhaustive: bool = False) -> List[Candidate]:
+        """
+        Every candidate fetched for a search, before constraint filtering;
+        with expand, sparse results widen the radius. Without exhaustive,
+        fetching stops once enough candidates match (and the pool is marked
+        incomplete); with it, every page of every radius is fetched.
+        """
+        # Build the search query
+        query = place_type
+        
+        # Add constraints to query if they affect search terms
+        if constraints:
+            for constraint in constraints:
+                if constraint.get("type") == "quiet" and constraint.get("value"):
+                    query += " quiet"
+                elif constraint.get("type") == "open_late" and constraint.get("value"):
+                    query += " open late"
+        
+        predicate = compile_constraints(constraints)
+        radius = radius or config.DEFAULT_SEARCH_RADIUS
+        
+        # Sparse results widen the search to several larger radii at once
+        # instead of one round trip at a time. Areas that came up short before
+        # are predicted sparse and search every radius concurrently from the start.
+        wider = [min(radius * factor, config.RADIUS_EXPANSION_MAX) for factor in config.RADIUS_EXPANSION_FACTORS]
+        wider = sorted({r for r in wider if r > radius}) if expand else []
+        sparse_key = (query, geohash.encode(location.lat, location.lng, config.RADIUS_EXPANSION_PRECISION))
+        if wider and sparse_key in self.sparse_areas:
+            return await self._expand(query, location, [radius] + wider, predicate, exhaustive=exhaustive)
+        
+        pool = await self._pool_within(query, location, radius, predicate, exhaustive)
+        if not wider or self._count_matching(pool, predicate) >= config.MAX_RESULTS:
+            return pool
+        self.sparse_areas.set(sparse_key, True)
+        return await self._expand(query, location, wider, predicate, pool, exhaustive)
+    
+    async def _pool_within(self, query: str, location: Location, radius: int, predicate,
+                           exhaustive: bool = False) -> List[Candidate]:
+        """
+        Candidates for one radius, from the spatial cache when a nearby earlier search covers it
+        """
+        # An incomplete cached set that comes up short (or must be exhaustive) still goes upstream
+        area = self.spatial_cache.lookup(query, location.lat, location.lng, radius)
+        if area is not None and (area.complete or (
+                not exhaustive and self._count_matching(area.candidates, predicate) >= config.MAX_RESULTS)):
+            return CandidatePool(area.candidates, area.complete)
+        return await self._fetch_candidates(query, location, radius, predicate, exhaustive)
+    
+    async def _expand(self,
+                      query: str,
+                      location: Location,
+                      radii: List[int],
+                      predicate,
+                      pool: Optional[List[Candidate]] = None,
+                      exhaustive: bool = False) -> List[Candidate]:
+        """
+        Search all radii concurrently and merge candidates by place_id as each
+        search lands, stopping as soon as enough of them pass the constraints
+        unless the search is exhaustive
+        """
+        merged = {candidate.place_id: candidate for candidate in pool or []}
+        tasks = [asyncio.create_task(self._pool_within(query, location, r, predicate, exhaustive)) for r in radii]
+        unavailable = None
+        # Complete only if every radius was searched to the end
+        complete = pool is None or is_complete(pool)
+        finished = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    found = await next_done
+                except UpstreamUnavailableError as e:
+                    unavailable = e
+                    complete = False
+                    continue
+                except Exception as e:
+                    print(f"Error widening search: {e}")
+                    complete = False
+                    continue
+                finished += 1
+                complete = complete and is_complete(found)
+                for candidate in found:
+                    merged.setdefault(candidate.place_id, candidate)
+                if not exhaustive and self._count_matching(merged.values(), predicate) >= config.MAX_RESULTS:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        if not finished and not pool and unavailable is not None:
+            raise unavailable
+        return CandidatePool(merged.values(), complete and finished == len(tasks))
+    
+    @staticmethod
+    def _count_matching(candidates, predicate) -> int:
+        return sum(1 for candidate in candidates if predicate(candidate))
+    
+    def rank(self, pool: List[Candidate], constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        """
+        Apply the constraints to a candidate pool and rank the survivors by
+        weighted score, keeping enough for later pages
+        """
+        predicate = compile_constraints(constraints)
+        matching = [c for c in pool if predicate(c)]
+        batch = CandidateBatch.from_results(matching)
+        batch.constraint_matches = predicate.matches(batch)
+        order = self.ranking.top_k(batch, min(len(matching), config.PAGINATION_MAX_CANDIDATES))
+        return [matching[i] for i in order]
+    
+    async def enrich(self, candidates: List[Candidate]) -> List[PlaceResult]:
+        """
+        Fetch details for the places we actually return and materialize them
+        """
+        details = await asyncio.gather(*(self._get_place_details(c.place_id) for c in candidates))
+        return [self._enrich(candidate, place_details) for candidate, place_details in zip(candidates, details)]
+    
+    async def _fetch_candidates(self, query: str, location: Location, radius: int, predicate,
+                                exhaustive: bool = False) -> List[Candidate]:
+        """
+        Pull candidates lazily: later pages are only fetched while we are still
+        short of candidates passing the hard constraints after the minimum
+        candidate window, or always when exhaustive. A page already fetched
+        is always used whole. Everything fetched goes to the spatial cache.
+        """
+        fetched = []
+        matching = 0
+        complete = True
+        async with aclosing(self.iter_pages(query, location, radius)) as pages:
+            async for places, more in pages:
+                for place in places:
+                    candidate = self._to_candidate(place, location)
+                    fetched.append(candidate)
+                    if predicate(candidate):
+                        matching += 1
+                
+                if (more and not exhaustive and matching >= config.MAX_RESULTS
+                        and len(fetched) >= config.PLACES_MIN_CANDIDATES):
+                    complete = False
+                    break
+        
+        self.spatial_cache.store(query, location.lat, location.lng, radius, fetched, complete)
+        return CandidatePool(fetched, complete)
+    
+    async def iter_pages(self,
+                         query: str,
+                         location: Location,
+                         radius: int) -> AsyncIterator[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        Yield text search result pages with whether another page follows,
+        fetching the next page only when the consumer asks for it
+        """
+        places_result = await self.upstream.call(
+            "places",
+            self.gmaps.places,
+            query=query,
+            location=(location.lat, location.lng),
+            radius=radius,
+            type='establishment'
+        )
+        
+        for page in range(config.PLACES_MAX_PAGES):
+            issued_at = time.monotonic()
+            page_token = places_result.get('next_page_token')
+            more = bool(page_token) and page + 1 < config.PLACES_MAX_PAGES
+            yield places_result.get('results', []), more
+            if not more:
+                return
+            
+            # A page token only becomes valid a short while after it is issued;
+            # wait out the remainder without holding up other requests
+            remaining = config.PLACES_PAGE_TOKEN_DELAY - (time.monotonic() - issued_at)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            places_result = await self._next_page(page_token)
+    
+    async def _next_page(self, page_token: str) -> Dict[str, Any]:
+        """
+        Fetch the next page of a text search, retrying while the token is not yet active
+        """
+        for attempt in range(3):
+            try:
+                return await self.upstream.call("places", self.gmaps.places, page_token=page_token)
+            except googlemaps.exceptions.ApiError as e:
+                if e.status != "INVALID_REQUEST" or attempt == 2:
+                    raise
+                await asyncio.sleep(config.PLACES_PAGE_TOKEN_DELAY / 2)
+    
+    def _to_candidate(self, place: Dict[str, Any], location: Location) -> Candidate:
+        """
+        Build a compact candidate from a text search entry
+        """
+        lat = place['geometry']['location']['lat']
+        lng = place['geometry']['location']['lng']
+        
+        return Candidate(
+            place_id=place['place_id'],
+            name=place.get('name', 'Unknown'),
+            address=place.get('formatted_address', 'Address not available'),
+            rating=place.get('rating'),
+            price_level=place.get('price_level'),
+            opening_hours=place.get('opening_hours', {}),
+            types=place.get('types', []),
+            lat=lat,
+            lng=lng,
+            # Calculate distance from search location
+            distance_from_midpoint=self._calculate_distance(location.lat, location.lng, lat, lng)
+        )
+    
+    def _enrich(self, candidate: Candidate, place_details: Dict[str, Any]) -> PlaceResult:
+        """
+        Materialize the API result with place details merged in. The candidate
+        itself is left untouched: it is shared with cached pools, sessions and
+        pages, which must keep ranking on the same search-level data.
+        """
+        photos = [photo['photo_reference'] for photo in place_details.get('photos', [])
+                  if 'photo_reference' in photo]
+        return candidate.to_result(photos, place_details.get('opening_hours'))
+    
+    async def _get_place_details(self, place_id: str) -> Dict[str, Any]:
         """
         Get detailed information about a place
         """
         try:
-            details = self.gmaps.place(
-                place_id=place_id,
-                fields=['opening_hours', 'photos', 'reviews']
-            )
-            return details.get('result', {})
+            return await self.details_cache.get(place_id, lambda: self.details_loader.load(place_id)) or {}
         except Exception as e:
             print(f"Error getting place details for {place_id}: {e}")
             return {}
     
+    async def _fetch_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
+        details = await self.upstream.call(
+            "place",
+            self.gmaps.place,
+            place_id=place_id,
+            fields=['opening_hours', 'photos', 'reviews']
+        )
+        return details.get('result') or None
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """
+        Only throttling and transient failures are retried; bad requests are not
+        """
+        if isinstance(error, googlemaps.exceptions.ApiError):
+            return error.status in RETRYABLE_STATUSES
+        if isinstance(error, googlemaps.exceptions.HTTPError):
+            return error.status_code in RETRYABLE_HTTP_CODES
+        return isinstance(error, (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError))
+    
+    @staticmethod
+    def _is_throttled(error: Exception) -> bool:
+        return isinstance(error, googlemaps.exceptions.ApiError) and error.status in {"OVER_QUERY_LIMIT", "RESOURCE_EXHAUSTED"}
+    
     def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """
         Calculate distance between two points using Haversine formula
         """
-        import math
-        
-        R = 6371000  # Earth's radius in meters
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
-        
-        a = (math.sin(delta_lat / 2) ** 2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * 
-             math.sin(delta_lng / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
+        return haversine(lat1, lng1, lat2, lng2)
     
     def _format_distance(self, distance_meters: float) -> str:
         """
         Format distance in a human-readable way
         """
-        if distance_meters < 1000:
-            return f"{int(distance_meters)}m"
-        else:
-            return f"{distance_meters/1000:.1f}km"
-    
-    def _meets_constraints(self, place: PlaceResult, constraints: List[Dict[str, Any]]) -> bool:
-        """
-        Check if a place meets the specified constraints
-        """
-        for constraint in constraints:
-            constraint_type = constraint.get("type")
-            constraint_value = constraint.get("value")
-            
-            if constraint_type == "rating_min" and place.rating:
-                if place.rating < constraint_value:
-                    return False
-            
-            elif constraint_type == "parking" and constraint_value:
-                # This is a simplified check - in production you'd analyze place details
-                if "parking" not in place.types and "parking" not in place.name.lower():
-                    return False
-            
-            elif constraint_type == "price_range" and place.price_level:
-                if place.price_level > constraint_value:
-                    return False
-        
-        return True
+        return format_distance(distance_meters)
     
     def get_directions_url(self, destination_place_id: str, origin: str = None) -> str:
         """
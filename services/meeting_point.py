@@ -0,0 +1,133 @@
+from typing import Awaitable, Callable, List, Optional, Tuple
+from .cache import LRUCache
+from .geo import haversine, offset, spherical_centroid
+
+Point = Tuple[float, float]
+# (origins, destinations) -> seconds[origin][destination], None where unreachable
+TravelTimeMatrix = Callable[[List[Point], List[Point]], Awaitable[List[List[Optional[float]]]]]
+
+# Distance Matrix API limits for a single request
+MAX_MATRIX_ORIGINS = 25
+MAX_MATRIX_DESTINATIONS = 25
+MAX_MATRIX_ELEMENTS = 100
+
+
+class MeetingPoint:
+    """The chosen meeting point and the travel times that justified it"""
+
+    def __init__(self, lat: float, lng: float, travel_times: Optional[List[float]] = None):
+        self.lat = lat
+        self.lng = lng
+        self.travel_times = travel_times  # seconds from each origin, None if unscored
+
+
+class MeetingPointEngine:
+    """
+    Picks a meeting point for N origins that balances travel time.
+
+    A grid of candidates is laid around the spherical centroid, scaled to
+    the spread of the origins and snapped to the cache quantization grid.
+    All candidates are scored with a single batched travel-time matrix
+    call, so upstream cost per search is one request no matter how many
+    candidates are considered; cells already in the cache are not
+    requested again.
+
+    Objectives:
+    - "minimax": minimize the longest travel time (fairest for everyone)
+    - "total": minimize the sum of travel times
+    """
+
+    OBJECTIVES = ("minimax", "total")
+
+    def __init__(self,
+                 travel_time_matrix: TravelTimeMatrix,
+                 objective: str = "minimax",
+                 grid_size: int = 5,
+                 precision: int = 3,
+                 cache_size: int = 10000):
+        if objective not in self.OBJECTIVES:
+            raise ValueError(f"Unknown meeting point objective: {objective}")
+        self.travel_time_matrix = travel_time_matrix
+        self.objective = objective
+        self.grid_size = grid_size
+        self.precision = precision
+        self.cells = LRUCache(cache_size)
+        self.upstream_calls = 0
+
+    async def find(self, origins: List[Point]) -> MeetingPoint:
+        """
+        Find the meeting point for the given (lat, lng) origins
+        """
+        centroid = spherical_centroid(origins)
+        if len(origins) > MAX_MATRIX_ORIGINS:
+            return MeetingPoint(*centroid)
+
+        origins = [self._quantize(point) for point in origins]
+        candidates = self.candidates(centroid, origins)
+        times = await self._travel_times(origins, candidates)
+
+        best, best_score = None, None
+        for candidate, column in zip(candidates, times):
+            if any(t is None for t in column):
+                continue
+            score = self._score(column)
+            if best_score is None or score < best_score:
+                best, best_score = (candidate, column), score
+
+        if best is None:
+            return MeetingPoint(*centroid)
+        return MeetingPoint(best[0][0], best[0][1], best[1])
+
+    def candidates(self, centroid: Point, origins: List[Point]) -> List[Point]:
+        """
+        Grid of candidate points around the centroid, nearest first, capped so
+        that scoring them fits in one matrix request
+        """
+        spread = max(haversine(centroid[0], centroid[1], lat, lng) for lat, lng in origins)
+        step = max(spread / self.grid_size, 200.0)
+        half = self.grid_size // 2
+
+        points = []
+        for i in range(-half, half + 1):
+            for j in range(-half, half + 1):
+                points.append((i * i + j * j, self._quantize(offset(centroid[0], centroid[1], i * step, j * step))))
+        points.sort(key=lambda item: item[0])
+
+        limit = min(MAX_MATRIX_DESTINATIONS, MAX_MATRIX_ELEMENTS // len(origins))
+        unique = list(dict.fromkeys(point for _, point in points))
+        return unique[:limit]
+
+    async def _travel_times(self, origins: List[Point], candidates: List[Point]) -> List[List[Optional[float]]]:
+        """
+        Travel times per candidate (one column per candidate, one entry per
+        origin), fetching every uncached cell in one request
+        """
+        missing = [c for c in candidates if any((o, c) not in self.cells for o in origins)]
+        if missing:
+            self.upstream_calls += 1
+            matrix = await self.travel_time_matrix(origins, missing)
+            for i, origin in enumerate(origins):
+                for j, candidate in enumerate(missing):
+                    self.cells.set((origin, candidate), matrix[i][j])
+
+        return [[self.cells.get((o, c)) for o in origins] for c in candidates]
+
+    def _score(self, column: List[float]) -> Tuple[float, float]:
+        if self.objective == "minimax":
+            return max(column), sum(column)
+        return sum(column), max(column)
+
+    def _quantize(self, point: Point) -> Point:
+        return round(point[0], self.precision), round(point[1], self.precision)
+
+
+def estimate_travel_times(origins: List[Point],
+                          destinations: List[Point],
+                          speed: float = 13.4,
+                          detour_factor: float = 1.3) -> List[List[float]]:
+    """
+    Local stand-in for a Distance Matrix call: great-circle distance scaled by
+    a road detour factor, at a constant speed in meters per second
+    """
+    return [[haversine(o[0], o[1], d[0], d[1]) * detour_factor / speed for d in destinations]
+            for o in origins]
@@ -1,7 +1,14 @@
 import random
 import math
-from typing import List, Optional, Dict, Any
+import numpy as np
+from typing import List, Optional, Dict, Any, Tuple
+import config
+from .cache import LRUCache
+from .candidates import Candidate, CandidateBatch, format_distance
+from .constraints import compile_constraints
+from .meeting_point import MeetingPointEngine, estimate_travel_times
 from .models import PlaceResult, Location
+from .ranking import RankingEngine
 
 
 class MockMapsService:
@@ -9,7 +16,17 @@ class MockMapsService:
     Mock Google Maps service that provides demo data without requiring API keys
     """
     
-    def __init__(self):
+    def __init__(self, shared_cache=None):
+        # Mock lookups are local dictionary reads, so shared_cache is accepted but not used
+        self.meeting_points = MeetingPointEngine(
+            self.travel_time_matrix,
+            objective=config.MEETING_POINT_OBJECTIVE,
+            grid_size=config.MEETING_POINT_GRID_SIZE,
+            precision=config.MEETING_POINT_PRECISION,
+            cache_size=config.MEETING_POINT_CACHE_SIZE
+        )
+        self.ranking = RankingEngine(config.RANKING_WEIGHTS, config.RANKING_DISTANCE_SCALE)
+        
         # Mock location data for San Francisco Bay Area
         self.mock_locations = {
             "san francisco": Location(lat=37.7749, lng=-122.4194, address="San Francisco, CA"),
@@ -22,6 +39,8 @@ class MockMapsService:
             "downtown": Location(lat=37.7749, lng=-122.4194, address="Downtown San Francisco, CA")
         }
         
+        self.mock_opening_hours = {"weekday_text": ["Mon-Sun: 7:00 AM - 10:00 PM"]}
+        
         # Mock place data
         self.mock_places = {
             "coffee shop": [
@@ -52,73 +71,102 @@ class MockMapsService:
             ]
         }
     
+    def local_caches(self) -> Dict[str, LRUCache]:
+        """In-memory caches worth persisting across restarts"""
+        return {"travel_times": self.meeting_points.cells}
+    
     async def geocode_location(self, location_name: str) -> Optional[Location]:
         """Mock geocoding that returns predefined locations"""
         location_key = location_name.lower()
         return self.mock_locations.get(location_key)
     
     async def calculate_midpoint(self, location1: Location, location2: Location) -> Location:
-        """Calculate midpoint between two locations"""
-        mid_lat = (location1.lat + location2.lat) / 2
-        mid_lng = (location1.lng + location2.lng) / 2
+        """Calculate the travel-time-balanced meeting point between two locations"""
+        return await self.find_meeting_point([location1, location2])
+    
+    async def find_meeting_point(self, locations: List[Location]) -> Location:
+        """Find the point that balances estimated travel time from every location"""
+        point = await self.meeting_points.find([(location.lat, location.lng) for location in locations])
+        names = [location.address for location in locations]
         
         return Location(
-            lat=mid_lat, 
-            lng=mid_lng, 
-            address=f"Midpoint between {location1.address} and {location2.address}"
+            lat=point.lat, 
+            lng=point.lng, 
+            address=f"Midpoint between {', '.join(names[:-1])} and {names[-1]}"
         )
     
+    async def travel_time_matrix(self,
+                                 origins: List[Tuple[float, float]],
+                                 destinations: List[Tuple[float, float]]) -> List[List[Optional[float]]]:
+        """Estimate travel times locally instead of calling the Distance Matrix API"""
+        return estimate_travel_times(origins, destinations)
+    
     async def search_places(self, 
                           place_type: str, 
                           location: Location, 
                           radius: int = 5000,
                           constraints: List[Dict[str, Any]] = None) -> List[PlaceResult]:
         """Mock place search that returns demo data"""
+        ranked = await self.rank_candidates(place_type, location, radius, constraints)
+        return await self.enrich(ranked[:config.MAX_RESULTS])
+    
+    async def rank_candidates(self,
+                              place_type: str,
+                              location: Location,
+                              radius: int = 5000,
+                              constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        """Demo candidates passing the constraints, best first"""
+        pool = await self.candidate_pool(place_type, location, radius, constraints)
+        return self.rank(pool, constraints)
+    
+    async def candidate_pool(self,
+                             place_type: str,
+                             location: Location,
+                             radius: int = 5000,
+                             constraints: List[Dict[str, Any]] = None,
+                             expand: bool = True,
+                             exhaustive: bool = False) -> List[Candidate]:
+        """Every demo place of the requested type, before constraint filtering"""
         
         # Get mock places for the requested type
         places_data = self.mock_places.get(place_type, self.mock_places["restaurant"])
         
-        # Filter by constraints if any
-        filtered_places = places_data.copy()
-        if constraints:
-            for constraint in constraints:
-                if constraint.get("type") == "rating_min":
-                    min_rating = constraint.get("value", 4.0)
-                    filtered_places = [p for p in filtered_places if p.get("rating", 0) >= min_rating]
-        
-        # Select random places (up to 3)
-        selected_places = random.sample(filtered_places, min(3, len(filtered_places)))
-        
-        results = []
-        for i, place_data in enumerate(selected_places):
+        candidates = []
+        for i, place_data in enumerate(places_data):
             # Calculate mock distance
             distance = random.randint(100, 2000)  # meters
             
-            result = PlaceResult(
-                name=place_data["name"],
+            candidates.append(Candidate(
                 place_id=f"mock_place_{i}",
+                name=place_data["name"],
                 address=place_data["address"],
                 rating=place_data["rating"],
                 price_level=random.randint(1, 3),
-                opening_hours={"weekday_text": ["Mon-Sun: 7:00 AM - 10:00 PM"]},
-                photos=[],
-                distance_from_midpoint=distance,
-                distance_text=self._format_distance(distance),
-                types=[place_type]
-            )
-            results.append(result)
-        
-        # Sort by rating
-        results.sort(key=lambda x: x.rating or 0, reverse=True)
-        
-        return results
+                opening_hours=self.mock_opening_hours,
+                types=(place_type,),
+                lat=location.lat,
+                lng=location.lng,
+                distance_from_midpoint=distance
+            ))
+        return candidates
+    
+    def rank(self, candidates: List[Candidate], constraints: List[Dict[str, Any]] = None) -> List[Candidate]:
+        """Filter by constraints and rank the survivors by weighted score"""
+        predicate = compile_constraints(constraints)
+        batch = CandidateBatch.from_results(candidates)
+        batch.constraint_matches = predicate.matches(batch)
+        scores = self.ranking.score(batch)
+        scores[~predicate.mask(batch)] = -np.inf
+        top = self.ranking.top_k(batch, int(np.isfinite(scores).sum()), scores)
+        return [candidates[i] for i in top]
+    
+    async def enrich(self, candidates: List[Candidate]) -> List[PlaceResult]:
+        """Materialize results; mock places have no extra details"""
+        return [candidate.to_result() for candidate in candidates]
     
     def _format_distance(self, distance_meters: float) -> str:
         """Format distance in a human-readable way"""
-        if distance_meters < 1000:
-            return f"{int(distance_meters)}m"
-        else:
-            return f"{distance_meters/1000:.1f}km"
+        return format_distance(distance_meters)
     
     def get_directions_url(self, destination_place_id: str, origin: str = None) -> str:
         """Generate mock directions URL"""
@@ -20,11 +20,12 @@ class PlaceType(str, Enum):
 class ConstraintType(str, Enum):
     PARKING = "parking"
     QUIET = "quiet"
-    OPEN_LATE = "open late"
+    OPEN_LATE = "open_late"
     WIFI = "wifi"
     RATING_MIN = "rating_min"
     TIME_LIMIT = "time_limit"
     PRICE_RANGE = "price_range"
+    OUTDOOR_SEATING = "outdoor_seating"
 
 
 class ParsedQuery(BaseModel):
@@ -33,6 +34,7 @@ class ParsedQuery(BaseModel):
     constraints: List[Dict[str, Any]]
     midpoint_calculation: bool = False
     radius: Optional[int] = None  # in meters
+    corridor: bool = False  # search along the path between the locations instead of around one point
 
 
 class Location(BaseModel):
@@ -52,6 +54,8 @@ class PlaceResult(BaseModel):
     distance_from_midpoint: Optional[float]  # in meters
     distance_text: Optional[str]
     types: List[str]
+    detour: Optional[float] = None  # in meters, extra trip distance for a stop on the way (corridor searches)
+    detour_text: Optional[str] = None
 
 
 class SearchResponse(BaseModel):
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+import secrets
+from typing import List, Optional, Tuple
+from .candidates import Candidate
+from .models import Location, ParsedQuery
+
+
+class RankedSearch:
+    """
+    A finished search with its full ranked candidate list, kept for paging.
+    An incomplete search stopped fetching early, so more candidates may
+    exist upstream once its list runs out.
+    """
+
+    # Searches stored before the flag existed were paged as complete
+    complete = True
+
+    def __init__(self,
+                 parsed_query: ParsedQuery,
+                 locations: List[Location],
+                 midpoint: Optional[Location],
+                 candidates: List[Candidate],
+                 complete: bool = True):
+        self.parsed_query = parsed_query
+        self.locations = locations
+        self.midpoint = midpoint
+        self.candidates = candidates
+        self.complete = complete
+
+
+class ResultPages:
+    """
+    Server-side ranked candidate lists behind opaque /search cursors.
+
+    A cursor names a stored search and an offset into its ranked list, so a
+    next-page request slices the list instead of repeating the search. The
+    store, a TieredCache, bounds memory and expires entries, and with a
+    shared tier cursors work on any worker of the host; an evicted search
+    makes its cursors invalid.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def save(self, search: RankedSearch) -> str:
+        """Store a ranked search and return its id"""
+        search_id = secrets.token_urlsafe(12)
+        self.store.set(search_id, search)
+        return search_id
+
+    def update(self, search_id: str, search: RankedSearch):
+        """Store a search again after its candidate list grew"""
+        self.store.set(search_id, search)
+
+    @staticmethod
+    def cursor(search_id: str, offset: int) -> str:
+        payload = json.dumps([search_id, offset], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    async def resolve(self, cursor: str) -> Optional[Tuple[RankedSearch, str, int]]:
+        """The stored search, its id and the offset a cursor points at; None if unknown or expired"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            search_id, offset = json.loads(base64.urlsafe_b64decode(padded))
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        if not isinstance(search_id, str) or not isinstance(offset, int) or offset < 0:
+            return None
+        search = await self.store.get(search_id)
+        if search is None:
+            return None
+        return search, search_id, offset
+
+    def stats(self) -> dict:
+        return self.store.stats()
@@ -0,0 +1,186 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+class StackSampler:
+    """
+    Sampling profiler that periodically snapshots every thread's stack and
+    aggregates them as collapsed stacks (the input format of flamegraph.pl
+    and speedscope)
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        if wait and self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            time.sleep(self.interval)
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """A single in-flight profile of one request"""
+
+    def __init__(self, profiler: "SearchProfiler", label: str, mode: str):
+        self.profiler = profiler
+        self.label = label
+        self.mode = mode
+        self.path: Optional[str] = None
+        if mode == "pstats":
+            self._backend = cProfile.Profile()
+            self._backend.enable()
+        else:
+            self._backend = StackSampler(profiler.sample_interval)
+            self._backend.start()
+
+    def stop(self) -> str:
+        """
+        Stop profiling and write the output file, returning its path
+        """
+        self.halt()
+        return self.save()
+
+    def halt(self):
+        """
+        Stop collecting without waiting on anything; for pstats this must
+        run on the thread that started the session
+        """
+        if self.mode == "pstats":
+            self._backend.disable()
+        else:
+            self._backend.stop(wait=False)
+
+    def save(self) -> str:
+        """
+        Write the output file after halt() and return its path; this blocks
+        on the sampler thread and the disk, so a server runs it on a worker thread
+        """
+        try:
+            if self.mode != "pstats":
+                self._backend.stop()
+            self.path = self.profiler._next_path(self.label, self.mode)
+            if self.mode == "pstats":
+                pstats.Stats(self._backend).dump_stats(self.path)
+            else:
+                self._backend.write(self.path)
+            self.profiler._rotate()
+        finally:
+            self.profiler._lock.release()
+        return self.path
+
+
+class SearchProfiler:
+    """
+    Decides which requests get profiled and manages the output directory.
+
+    A request is profiled when it carries the privileged header with the
+    configured token, or when it is picked by the sampling rate. Only one
+    request is profiled at a time; concurrent triggers are skipped rather
+    than queued, because both profilers observe the whole process.
+    """
+
+    MODES = ("stacks", "pstats")
+
+    def __init__(self,
+                 output_dir: str = "profiles",
+                 sample_rate: float = 0.0,
+                 token: str = "",
+                 header: str = "X-Profile",
+                 mode: str = "stacks",
+                 max_files: int = 50,
+                 sample_interval: float = 0.001):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.token = token
+        self.header = header
+        self.mode = mode
+        self.max_files = max_files
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+
+    def should_profile(self, headers: Dict[str, str]) -> bool:
+        """
+        Check whether a request with the given headers should be profiled
+        """
+        if self.is_privileged(headers):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def is_privileged(self, headers: Dict[str, str]) -> bool:
+        """
+        Whether the request carries the profiling token
+        """
+        supplied = headers.get(self.header.lower())
+        # Constant-time compare so response timing doesn't leak the token
+        return bool(self.token) and supplied is not None and hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def start(self, label: str = "search", mode: Optional[str] = None) -> Optional[ProfileSession]:
+        """
+        Start profiling, or return None if another profile is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            return ProfileSession(self, label, mode or self.mode)
+        except Exception:
+            self._lock.release()
+            raise
+
+    def _next_path(self, label: str, mode: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        suffix = "pstats" if mode == "pstats" else "collapsed"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.output_dir, f"{stamp}-{time.time_ns() % 10**9:09d}-{label}.{suffix}")
+
+    def _rotate(self):
+        """Delete the oldest profiles beyond max_files"""
+        files = sorted(
+            os.path.join(self.output_dir, name)
+            for name in os.listdir(self.output_dir)
+            if name.endswith((".pstats", ".collapsed"))
+        )
+        for path in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,70 @@
+from typing import Dict, Optional
+import numpy as np
+from .candidates import CandidateBatch
+
+DEFAULT_WEIGHTS = {
+    "rating": 1.0,
+    "distance": 0.3,
+    "price": 0.0,
+    "open_now": 0.1,
+    "constraint_matches": 0.2,
+}
+
+
+class RankingEngine:
+    """
+    Weighted scoring and top-k selection over a candidate batch.
+
+    Every feature is normalized to [0, 1] (higher is better) and combined
+    with configurable weights as whole-array NumPy operations. Selection
+    uses argpartition, so picking k of n candidates costs O(n + k log k)
+    instead of a full O(n log n) sort.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, distance_scale: float = 2000.0):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.distance_scale = distance_scale  # meters at which the distance score halves
+
+    def score(self, batch: CandidateBatch) -> np.ndarray:
+        """
+        Score every candidate in the batch
+        """
+        w = self.weights
+        rating = _fill(batch.rating, 0.0) / 5.0
+        distance = self.distance_scale / (self.distance_scale + _fill(batch.distance, np.inf))
+        price = 1.0 - _fill(batch.price_level, 2.0) / 4.0
+        open_now = _fill(batch.open_now, 0.5)
+        matches = batch.constraint_matches
+        if matches.size and matches.max() > 0:
+            matches = matches / matches.max()
+
+        return (w["rating"] * rating
+                + w["distance"] * distance
+                + w["price"] * price
+                + w["open_now"] * open_now
+                + w["constraint_matches"] * matches)
+
+    def top_k(self, batch: CandidateBatch, k: int, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Indices of the k best candidates, best first (ties go to the closer one)
+        """
+        if scores is None:
+            scores = self.score(batch)
+        n = len(scores)
+        if k <= 0 or n == 0:
+            return np.empty(0, dtype=np.intp)
+        if k < n:
+            # argpartition cuts arbitrarily through scores tied with the k-th,
+            # so keep the whole tied group and let the distance tiebreak choose
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            candidates = np.flatnonzero(scores >= kth)
+        else:
+            candidates = np.arange(n)
+        distance = _fill(batch.distance[candidates], np.inf)
+        order = np.lexsort((distance, -scores[candidates]))
+        return candidates[order][:k]
+
+
+def _fill(column: np.ndarray, value: float) -> np.ndarray:
+    """Replace NaN (missing) entries; cheaper than np.nan_to_num on small batches"""
+    return np.where(np.isnan(column), value, column)
@@ -0,0 +1,38 @@
+from typing import Awaitable, Callable, Optional
+from . import geohash
+from .cache import RefreshingCache, RefreshSlots
+from .shared_cache import TieredCache
+
+
+class ReverseGeocodeCache:
+    """
+    Display addresses for computed points, keyed on geohash cells.
+
+    Lookups never wait on the upstream: a cold cell answers with the
+    placeholder and starts one background resolve, so the next search that
+    lands in the same cell gets the real address. Entries older than the
+    TTL are still served while a refresh runs in the background.
+    """
+
+    def __init__(self,
+                 resolver: Callable[[float, float], Awaitable[Optional[str]]],
+                 precision: int = 6,
+                 max_size: int = 10000,
+                 ttl: float = 86400,
+                 placeholder: str = "Midpoint Location",
+                 refresh_slots: Optional[RefreshSlots] = None):
+        self.resolver = resolver
+        self.precision = precision
+        self.placeholder = placeholder
+        self.cache = RefreshingCache(TieredCache("reverse_geocode", None, max_size),
+                                     soft_ttl=ttl, refresh_slots=refresh_slots)
+
+    def lookup(self, lat: float, lng: float) -> str:
+        """
+        Return the cached address for a point, or the placeholder when cold
+        """
+        key = geohash.encode(lat, lng, self.precision)
+        address, fresh = self.cache.peek(key)
+        if not fresh:
+            self.cache.refresh(key, lambda: self.resolver(lat, lng))
+        return address or self.placeholder
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+import config
+from .candidates import Candidate, is_complete
+from .corridor import CorridorSearch
+from .models import ParsedQuery, Location, PlaceResult
+from .pagination import RankedSearch, ResultPages
+
+
+class InvalidQueryError(Exception):
+    """Raised when a query cannot be turned into a search (reported as HTTP 400)"""
+
+
+class SearchOutcome:
+    """Everything the /search handler needs to build its response"""
+
+    def __init__(self,
+                 parsed_query: ParsedQuery,
+                 locations: List[Location],
+                 midpoint: Optional[Location],
+                 results: List[PlaceResult],
+                 next_cursor: Optional[str] = None):
+        self.parsed_query = parsed_query
+        self.locations = locations
+        self.midpoint = midpoint
+        self.results = results
+        self.next_cursor = next_cursor
+
+
+class SearchSession:
+    """
+    The latest search of a client session, kept so that a refinement can
+    re-filter and re-rank its candidates instead of searching again
+    """
+
+    def __init__(self,
+                 parsed_query: ParsedQuery,
+                 locations: List[Location],
+                 midpoint: Optional[Location],
+                 pool: List[Candidate]):
+        self.parsed_query = parsed_query
+        self.locations = locations
+        self.midpoint = midpoint
+        self.pool = pool
+
+
+class SearchPipeline:
+    """
+    Staged search pipeline: parse -> geocode -> midpoint -> place search.
+
+    Stages overlap wherever their inputs allow it, so the critical path is
+    close to the slowest stage rather than the sum of all of them:
+
+    - the fast local parse runs first and its locations are geocoded
+      speculatively while the full (possibly remote) parse is in flight;
+    - all locations are geocoded concurrently;
+    - once the full parse lands, speculative geocodes for locations it kept
+      are reused, missing ones are started, and the rest are cancelled.
+
+    Ranked results are cached by intent (see intent_key), so different
+    phrasings of the same search skip the place search entirely. With a
+    page store, the full ranked list is kept behind a cursor and later
+    pages only enrich the places they reveal. With a session store, a query
+    that only changes the constraints of the session's previous search
+    re-ranks that search's candidates without any upstream calls.
+    """
+
+    def __init__(self, parser, maps_service, parse_cache=None, intent_cache=None,
+                 pages: Optional[ResultPages] = None, sessions=None):
+        self.parser = parser
+        self.maps_service = maps_service
+        self.corridor = CorridorSearch(
+            maps_service,
+            precision=config.CORRIDOR_PRECISION,
+            max_cells=config.CORRIDOR_MAX_CELLS,
+            concurrency=config.CORRIDOR_CONCURRENCY,
+            detour_step=config.CORRIDOR_DETOUR_STEP,
+            max_radius=config.RADIUS_EXPANSION_MAX
+        )
+        self.parse_cache = parse_cache
+        self.intent_cache = intent_cache
+        self.pages = pages
+        self.sessions = sessions
+        self.refinements = 0
+
+    async def run(self, query: str, session_id: Optional[str] = None) -> SearchOutcome:
+        session = None
+        if session_id and self.sessions is not None:
+            session = await self.sessions.get(session_id)
+
+        parsed_query = None
+        if session is not None:
+            parsed_query = await self.parse(query)
+            if is_refinement(session.parsed_query, parsed_query):
+                ranked = self._rank(parsed_query, session.pool)
+                # A pool cut short under the old constraints may hold too few
+                # matches for the new ones while more exist upstream: search again
+                if len(ranked) >= config.MAX_RESULTS or is_complete(session.pool):
+                    self.refinements += 1
+                    results = await self.maps_service.enrich(ranked[:config.MAX_RESULTS])
+                    return self._finish(parsed_query, session.locations, session.midpoint,
+                                        session.pool, ranked, results, session_id)
+
+        parsed_query, locations = await self.parse_and_geocode(query, parsed_query)
+
+        if parsed_query.corridor and len(locations) >= 2:
+            # Corridors skip the intent cache: each sampled cell is cached by the backend
+            pool = await self._candidate_pool(parsed_query, locations, None)
+            ranked = self._rank(parsed_query, pool)
+            results = await self.maps_service.enrich(ranked[:config.MAX_RESULTS])
+            return self._finish(parsed_query, locations, None, pool, ranked, results, session_id)
+
+        # Find a meeting point for all locations if requested
+        midpoint = None
+        if parsed_query.midpoint_calculation and len(locations) >= 2:
+            midpoint = await self.maps_service.find_meeting_point(locations)
+
+        key = intent_key(parsed_query, midpoint or locations[0])
+        cached = await self.intent_cache.get(key) if self.intent_cache is not None else None
+        if cached is None:
+            pool = await self._candidate_pool(parsed_query, locations, midpoint)
+            ranked = self.maps_service.rank(pool, parsed_query.constraints)
+            results = await self.maps_service.enrich(ranked[:config.MAX_RESULTS])
+            if results and self.intent_cache is not None:
+                self.intent_cache.set(key, (pool, ranked, results))
+        else:
+            pool, ranked, results = cached
+        return self._finish(parsed_query, locations, midpoint, pool, ranked, results, session_id)
+
+    async def _candidate_pool(self,
+                              parsed_query: ParsedQuery,
+                              locations: List[Location],
+                              midpoint: Optional[Location],
+                              exhaustive: bool = False) -> List[Candidate]:
+        """
+        Candidates along the corridor, or around the midpoint (else the first location)
+        """
+        if parsed_query.corridor and len(locations) >= 2:
+            return await self.corridor.candidate_pool(parsed_query.place_type, locations,
+                                                      parsed_query.constraints, exhaustive=exhaustive)
+        return await self.maps_service.candidate_pool(
+            place_type=parsed_query.place_type,
+            location=midpoint or locations[0],
+            radius=parsed_query.radius,
+            constraints=parsed_query.constraints,
+            exhaustive=exhaustive
+        )
+
+    def _rank(self, parsed_query: ParsedQuery, pool: List[Candidate]) -> List[Candidate]:
+        """Corridor searches rank by detour, all others by the backend's weighted score"""
+        ranker = self.corridor if parsed_query.corridor else self.maps_service
+        return ranker.rank(pool, parsed_query.constraints)
+
+    def _finish(self,
+                parsed_query: ParsedQuery,
+                locations: List[Location],
+                midpoint: Optional[Location],
+                pool: List[Candidate],
+                ranked: List[Candidate],
+                results: List[PlaceResult],
+                session_id: Optional[str]) -> SearchOutcome:
+        """
+        Remember the search for its session and issue a cursor when more results
+        remain, or may remain upstream of a pool that stopped fetching early
+        """
+        if session_id and self.sessions is not None:
+            self.sessions.set(session_id, SearchSession(parsed_query, locations, midpoint, pool))
+
+        next_cursor = None
+        complete = is_complete(pool)
+        if self.pages is not None and (len(ranked) > len(results) or not complete):
+            search_id = self.pages.save(RankedSearch(parsed_query, locations, midpoint, ranked, complete))
+            next_cursor = self.pages.cursor(search_id, len(results))
+        return SearchOutcome(parsed_query, locations, midpoint, results, next_cursor)
+
+    async def next_page(self, cursor: str) -> SearchOutcome:
+        """
+        The page of a stored search that a cursor points at
+        """
+        resolved = await self.pages.resolve(cursor) if self.pages is not None else None
+        if resolved is None:
+            raise InvalidQueryError("Cursor is invalid or has expired; repeat the search")
+        search, search_id, offset = resolved
+
+        end = offset + config.MAX_RESULTS
+        if end > len(search.candidates) and not search.complete:
+            await self._fetch_remaining(search)
+            self.pages.update(search_id, search)
+        results = await self.maps_service.enrich(search.candidates[offset:end])
+        next_cursor = self.pages.cursor(search_id, end) if end < len(search.candidates) else None
+        return SearchOutcome(search.parsed_query, search.locations, search.midpoint, results, next_cursor)
+
+    async def _fetch_remaining(self, search: RankedSearch):
+        """
+        Search again without stopping early and append the candidates the
+        stored list is missing, keeping the order of pages already served
+        """
+        pool = await self._candidate_pool(search.parsed_query, search.locations, search.midpoint, exhaustive=True)
+        seen = {candidate.place_id for candidate in search.candidates}
+        more = [candidate for candidate in self._rank(search.parsed_query, pool) if candidate.place_id not in seen]
+        search.candidates = (search.candidates + more)[:config.PAGINATION_MAX_CANDIDATES]
+        # Even if part of the refetch failed, don't search again on every later page
+        search.complete = True
+
+    async def parse(self, query: str) -> ParsedQuery:
+        """
+        Parse a query, from the parse cache when possible
+        """
+        parsed_query = await self._cached_parse(query)
+        return parsed_query if parsed_query is not None else await self._parse_and_cache(query)
+
+    async def parse_and_geocode(self,
+                                query: str,
+                                parsed_query: Optional[ParsedQuery] = None) -> Tuple[ParsedQuery, List[Location]]:
+        """
+        Parse the query (unless already parsed) and geocode its locations,
+        overlapping the two stages
+        """
+        if parsed_query is None:
+            parsed_query = await self._cached_parse(query)
+
+        speculative: Dict[str, asyncio.Task] = {}
+        if parsed_query is None:
+            for name in self.parser.parse_query_fast(query).locations:
+                speculative.setdefault(self._location_key(name), self._start_geocode(name))
+
+        try:
+            if parsed_query is None:
+                parsed_query = await self._parse_and_cache(query)
+            if not parsed_query.locations:
+                raise InvalidQueryError("No locations found in query")
+
+            # Reconcile the speculative geocodes with the final parse
+            tasks = []
+            for name in parsed_query.locations:
+                task = speculative.pop(self._location_key(name), None)
+                tasks.append(task or self._start_geocode(name))
+        finally:
+            for task in speculative.values():
+                task.cancel()
+
+        try:
+            geocoded = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        locations = []
+        for name, location in zip(parsed_query.locations, geocoded):
+            if location is None:
+                raise InvalidQueryError(f"Could not find location: {name}")
+            locations.append(location)
+        return parsed_query, locations
+
+    async def _cached_parse(self, query: str) -> Optional[ParsedQuery]:
+        return await self.parse_cache.get(self._location_key(query)) if self.parse_cache is not None else None
+
+    async def _parse_and_cache(self, query: str) -> ParsedQuery:
+        parsed_query = await self.parser.parse_query(query)
+        if parsed_query.locations and self.parse_cache is not None:
+            self.parse_cache.set(self._location_key(query), parsed_query)
+        return parsed_query
+
+    def _start_geocode(self, name: str) -> asyncio.Task:
+        return asyncio.create_task(self.maps_service.geocode_location(name))
+
+    def _location_key(self, name: str) -> str:
+        return " ".join(name.lower().split())
+
+
+def is_refinement(previous: ParsedQuery, current: ParsedQuery) -> bool:
+    """
+    Whether a query describes the same search as the previous one (place
+    type, locations, radius and midpoint or corridor mode) and so can only
+    differ in its constraints
+    """
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    return (normalize(previous.place_type) == normalize(current.place_type)
+            and [normalize(name) for name in previous.locations] == [normalize(name) for name in current.locations]
+            and previous.radius == current.radius
+            and previous.midpoint_calculation == current.midpoint_calculation
+            and previous.corridor == current.corridor)
+
+
+def intent_key(parsed_query: ParsedQuery, location: Location) -> Tuple:
+    """
+    Canonical form of a search: place type, search point rounded to
+    INTENT_CACHE_PRECISION decimals, radius bucket and the sorted constraint set
+    """
+    radius = parsed_query.radius or config.DEFAULT_SEARCH_RADIUS
+    constraints = sorted(json.dumps(c, sort_keys=True, default=str) for c in parsed_query.constraints)
+    return (
+        " ".join(parsed_query.place_type.lower().split()),
+        round(location.lat, config.INTENT_CACHE_PRECISION),
+        round(location.lng, config.INTENT_CACHE_PRECISION),
+        math.ceil(radius / config.INTENT_CACHE_RADIUS_BUCKET),
+        tuple(constraints)
+    )
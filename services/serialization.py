@@ -0,0 +1,50 @@
+from typing import Optional
+import pydantic_core
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is only needed for internal service-to-service callers
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick the response media type from an Accept header: MessagePack when the
+    caller asks for it (with a non-zero quality) and it is installed,
+    compact JSON otherwise
+    """
+    if not accept or msgpack is None:
+        return JSON_MEDIA_TYPE
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if media_type.lower() in MSGPACK_ALIASES and _quality(params) > 0:
+            return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def _quality(params) -> float:
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def encode(model: BaseModel, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """
+    Serialize a response model to bytes in the given media type.
+
+    JSON is written by pydantic-core straight from the model, without an
+    intermediate dict or a pass through the standard json encoder.
+    """
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(model.model_dump(mode="json"), use_bin_type=True)
+    return pydantic_core.to_json(model)
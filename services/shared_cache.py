@@ -0,0 +1,221 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Hashable, Optional, Tuple
+from .cache import LRUCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL,
+    stored REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored);
+"""
+
+
+class SharedCache:
+    """
+    Host-wide cache shared by every worker process, stored in SQLite.
+
+    WAL mode lets readers proceed while one worker writes, and SQLite's file
+    locking serializes writers across processes, so no external server is
+    needed. All database work and pickling runs on one dedicated thread so
+    the event loop never waits on the file lock: reads are awaited, writes
+    are queued without waiting. A database another worker keeps busy for
+    longer than busy_timeout counts as a miss, and any other database error
+    is reported and treated as a miss too, as is a row that no longer
+    unpickles (written by an older deploy; it is deleted), so the cache can
+    never stall or fail a search. The table is bounded to max_entries by evict(), which
+    the server runs periodically: expired entries go first and then the
+    oldest writes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, busy_timeout: float = 0.05):
+        self.path = path
+        self.max_entries = max_entries
+        self.busy_timeout = busy_timeout
+        self.hits = 0
+        self.misses = 0
+        self.busy = 0
+        self.errors = 0
+        self.entries: Optional[int] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    async def get(self, namespace: str, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """
+        The cached value and its expiry time (epoch seconds, None if it never expires), or None
+        """
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(self.executor, self._read, namespace, key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Queue a write; it happens on the cache thread and never blocks the caller
+        """
+        self.executor.submit(self._write, namespace, key, value, ttl)
+
+    async def evict(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._evict)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.entries,  # as of the last eviction
+            "hits": self.hits,
+            "misses": self.misses,
+            "busy": self.busy,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+    def _read(self, namespace: str, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < time.time()):
+                return None
+        except sqlite3.Error as e:
+            self._error("read", e)
+            return None
+        try:
+            return pickle.loads(row[0]), row[1]
+        except Exception as e:
+            # Rows outlive deploys: a class that moved or changed shape cannot be
+            # loaded any more, so drop the row instead of failing every read of it
+            self._error("read", e)
+            self._delete(namespace, key)
+            return None
+
+    def _delete(self, namespace: str, key: str):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            self._error("delete", e)
+
+    def _write(self, namespace: str, key: str, value: Any, ttl: Optional[float]):
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Not every value pickles (TypeError, AttributeError, ...); nobody awaits this future
+            self._error("write", e)
+            return
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires, stored) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, payload, expires, now)
+            )
+        except sqlite3.Error as e:
+            self._error("write", e)
+
+    def _evict(self):
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            excess = entries - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY stored LIMIT ?)",
+                    (excess,)
+                )
+            self.entries = min(entries, self.max_entries)
+        except sqlite3.Error as e:
+            self._error("eviction", e)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so each process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _error(self, operation: str, error: Exception):
+        # Contention with other workers is expected under load; only count it
+        if isinstance(error, sqlite3.OperationalError) and "locked" in str(error):
+            self.busy += 1
+            return
+        self.errors += 1
+        print(f"Shared cache {operation} failed: {error}")
+
+
+class TieredCache:
+    """
+    Per-process LRU in front of a namespace of the shared host-wide cache.
+
+    Reads try the local tier first and promote shared hits into it for the
+    entry's remaining lifetime only, so a value never outlives its TTL by
+    bouncing between tiers; writes go to both. Without a shared cache it is
+    a plain local LRU.
+    """
+
+    def __init__(self,
+                 namespace: str,
+                 shared: Optional[SharedCache] = None,
+                 max_size: int = 1024,
+                 ttl: Optional[float] = None):
+        self.namespace = namespace
+        self.shared = shared
+        self.ttl = ttl
+        self.local = LRUCache(max_size, ttl=ttl)
+        self.shared_hits = 0
+
+    def get_local(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Look only in this process's tier, without waiting on the shared one
+        """
+        return self.local.get(key, default)
+
+    async def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        if self.shared is not None:
+            entry = await self.shared.get(self.namespace, str(key))
+            if entry is not None:
+                value, expires = entry
+                self.shared_hits += 1
+                self.local.set(key, value, ttl=expires - time.time() if expires is not None else None)
+                return value
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(self.namespace, str(key), value, ttl=self.ttl)
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        stats["shared_hits"] = self.shared_hits
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + self.shared_hits) / lookups if lookups else 0.0
+        return stats
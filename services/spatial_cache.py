@@ -0,0 +1,85 @@
+import math
+from typing import List, Optional, Tuple
+from . import geohash
+from .cache import LRUCache
+from .candidates import Candidate
+from .geo import haversine
+
+
+class CachedArea:
+    """Candidates fetched for one search, and the circle that search covered"""
+
+    __slots__ = ("lat", "lng", "radius", "candidates", "complete")
+
+    def __init__(self, lat: float, lng: float, radius: float, candidates: List[Candidate], complete: bool):
+        self.lat = lat
+        self.lng = lng
+        self.radius = radius
+        self.candidates = candidates
+        # True when the upstream ran out of pages, i.e. nothing was left unfetched
+        self.complete = complete
+
+
+class SpatialCandidateCache:
+    """
+    Candidate sets from earlier searches, bucketed by (query, geohash cell,
+    radius class) so a search a few hundred meters from a previous one can
+    reuse its candidates instead of calling Places again.
+
+    A cached area answers a new search only if it covers the requested
+    circle: distance between the centers plus the requested radius must fit
+    inside the cached radius. Places treats the radius as a bias rather than
+    a hard bound, so the cached radius is stretched by `slack` (10% lets a
+    5km search move ~500m). Reused candidates get their distance recomputed
+    from the new search point so they can be re-ranked locally.
+    """
+
+    def __init__(self, precision: int = 6, slack: float = 0.1, max_size: int = 10000, ttl: float = 600):
+        self.precision = precision
+        self.slack = slack
+        self.areas = LRUCache(max_size, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, query: str, lat: float, lng: float, radius: float) -> Optional[CachedArea]:
+        """
+        The cached area covering the search, with candidates relocated to (lat, lng), or None
+        """
+        cell = geohash.encode(lat, lng, self.precision)
+        radius_class = self.radius_class(radius)
+        best: Optional[Tuple[float, CachedArea]] = None
+        for neighbor in [cell] + geohash.neighbors(cell):
+            key = (query, neighbor, radius_class)
+            area = self.areas.get(key) if key in self.areas else None
+            if area is None:
+                continue
+            offset = haversine(lat, lng, area.lat, area.lng)
+            if offset + radius <= area.radius * (1 + self.slack) and (best is None or offset < best[0]):
+                best = (offset, area)
+
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        area = best[1]
+        candidates = [candidate.with_distance(haversine(lat, lng, candidate.lat, candidate.lng))
+                      for candidate in area.candidates]
+        return CachedArea(lat, lng, radius, candidates, area.complete)
+
+    def store(self, query: str, lat: float, lng: float, radius: float, candidates: List[Candidate], complete: bool):
+        key = (query, geohash.encode(lat, lng, self.precision), self.radius_class(radius))
+        self.areas.set(key, CachedArea(lat, lng, radius, candidates, complete))
+
+    @staticmethod
+    def radius_class(radius: float) -> int:
+        """Power-of-two bucket of the radius, in units of 250m"""
+        return max(0, math.ceil(math.log2(max(radius, 1) / 250)))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.areas),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,373 @@
+import asyncio
+import functools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+_attempt_local = threading.local()
+
+
+def attempt_timeout() -> Optional[float]:
+    """
+    Seconds until the upstream attempt running on this thread is abandoned,
+    so a client can bound its own request to match; None outside an attempt
+    """
+    return getattr(_attempt_local, "timeout", None)
+
+
+class UpstreamUnavailableError(Exception):
+    """
+    Raised when an upstream call still fails with a retryable status after
+    all retries (quota exhausted, upstream overloaded)
+    """
+
+    def __init__(self, endpoint: str, cause: Exception, retry_after: float = 1.0):
+        super().__init__(f"{endpoint} unavailable: {cause}")
+        self.endpoint = endpoint
+        self.cause = cause
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Async token bucket: callers wait their turn instead of being rejected
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Wait for a token and return how long the caller waited, in seconds
+        """
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = self._refill()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+        return time.monotonic() - start
+
+    def try_acquire(self) -> bool:
+        """
+        Take a token only if one is available right now
+        """
+        now = self._refill()
+        if now < self.paused_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def pause(self, seconds: float):
+        """
+        Stop handing out tokens for a while, e.g. after the upstream throttled us
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class AdaptiveTimeout:
+    """
+    Timeout that follows an endpoint's recent latencies: a high percentile of
+    the last `window` calls times `multiplier`, clamped to [minimum, maximum].
+    Until min_samples calls have been seen the maximum applies.
+    """
+
+    def __init__(self,
+                 maximum: float,
+                 minimum: float = 1.0,
+                 percentile: float = 0.99,
+                 multiplier: float = 3.0,
+                 window: int = 200,
+                 min_samples: int = 20):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.timeout_percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        The q-th quantile of recent latencies in seconds, or None while there are too few samples
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def timeout(self) -> float:
+        latency = self.percentile(self.timeout_percentile)
+        if latency is None:
+            return self.maximum
+        return min(self.maximum, max(self.minimum, latency * self.multiplier))
+
+
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.queue_timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts,
+            "queue_timeouts": self.queue_timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "queue_wait_avg_ms": 1000 * self.queue_wait_total / self.calls if self.calls else 0.0,
+            "queue_wait_max_ms": 1000 * self.queue_wait_max
+        }
+
+
+class UpstreamClient:
+    """
+    Shared gateway for blocking upstream SDK calls.
+
+    Each quota gets one token bucket so we stay under its QPS limit;
+    endpoints map to quotas through `quotas` (endpoints of one upstream API
+    draw on the same quota), and an unmapped endpoint is its own quota.
+    Calls run on a dedicated thread pool sized to the connection pool, and
+    retryable failures are retried with full-jitter exponential backoff. A
+    throttling response also pauses the quota's bucket so every caller
+    backs off together instead of each one hammering the quota.
+
+    Each attempt waits at most the endpoint's adaptive timeout, counted from
+    when a thread starts it (time queued for a thread is neither timed nor
+    recorded as latency, but is bounded by the timeout ceiling), and a timed
+    out attempt is retried like a retryable failure. The attempt's timeout
+    is published to its thread (attempt_timeout) so the SDK request gives
+    up, and frees the thread, when the attempt is abandoned. On idempotent
+    (hedge_endpoints) calls, an attempt still running at the endpoint's
+    hedge percentile latency gets a duplicate request and whichever answers
+    first is used. Hedges are capped at hedge_budget of the endpoint's last
+    latency_window calls and need both a spare token, so they never push an
+    endpoint over its quota, and an idle thread, so they never queue.
+    """
+
+    def __init__(self,
+                 qps: Dict[str, float],
+                 is_retryable: Callable[[Exception], bool],
+                 is_throttled: Callable[[Exception], bool] = lambda e: False,
+                 max_retries: int = 3,
+                 base_delay: float = 0.2,
+                 max_delay: float = 5.0,
+                 max_concurrency: int = 32,
+                 default_qps: float = 10.0,
+                 timeout: float = 30.0,
+                 min_timeout: float = 1.0,
+                 timeout_percentile: float = 0.99,
+                 timeout_multiplier: float = 3.0,
+                 latency_window: int = 200,
+                 hedge_endpoints: Iterable[str] = (),
+                 hedge_percentile: float = 0.95,
+                 hedge_budget: float = 0.05,
+                 quotas: Optional[Dict[str, str]] = None):
+        self.qps = qps
+        self.quotas = quotas or {}
+        self.is_retryable = is_retryable
+        self.is_throttled = is_throttled
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_qps = default_qps
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.latency_window = latency_window
+        self.hedge_endpoints = set(hedge_endpoints)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="upstream")
+        self.running = 0  # threads currently inside a request
+        self._running_lock = threading.Lock()
+        self.buckets: Dict[str, TokenBucket] = {}  # by quota
+        self.endpoint_stats: Dict[str, EndpointStats] = {}
+        self.latencies: Dict[str, AdaptiveTimeout] = {}
+        # Call numbers (stats.calls) at which each recent hedge was sent
+        self.recent_hedges: Dict[str, deque] = {}
+
+    async def call(self, endpoint: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Call a blocking upstream function under the endpoint's rate limit and retry policy
+        """
+        bucket = self._bucket(endpoint)
+        stats = self.endpoint_stats[endpoint]
+
+        for attempt in range(self.max_retries + 1):
+            waited = await bucket.acquire()
+            stats.calls += 1
+            stats.queue_wait_total += waited
+            stats.queue_wait_max = max(stats.queue_wait_max, waited)
+            try:
+                return await self._attempt(endpoint, functools.partial(fn, *args, **kwargs))
+            except Exception as e:
+                stats.failures += 1
+                if not isinstance(e, asyncio.TimeoutError) and not self.is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if self.is_throttled(e):
+                    stats.throttled += 1
+                    bucket.pause(delay)
+                if attempt == self.max_retries:
+                    raise UpstreamUnavailableError(endpoint, e, retry_after=max(delay, 1.0)) from e
+                stats.retries += 1
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, endpoint: str, request: Callable[[], Any]) -> Any:
+        """
+        Run one attempt under the endpoint's adaptive timeout, hedged if the endpoint allows it
+        """
+        stats = self.endpoint_stats[endpoint]
+        latency = self.latencies[endpoint]
+        timeout = latency.timeout
+        loop = asyncio.get_running_loop()
+        started, first = self._submit(loop, request, timeout)
+        requests = [first]
+
+        try:
+            try:
+                start = await asyncio.wait_for(started, latency.maximum)
+            except asyncio.TimeoutError:
+                stats.queue_timeouts += 1
+                raise asyncio.TimeoutError(f"{endpoint} found no free upstream thread in {latency.maximum:.1f}s")
+
+            hedge_after = latency.percentile(self.hedge_percentile) if endpoint in self.hedge_endpoints else None
+            if hedge_after is not None and hedge_after < timeout:
+                done, _ = await asyncio.wait(requests, timeout=max(0.0, start + hedge_after - loop.time()))
+                if not done and self._may_hedge(endpoint):
+                    stats.hedges += 1
+                    self.recent_hedges[endpoint].append(stats.calls)
+                    requests.append(self._submit(loop, request, timeout)[1])
+
+            pending = set(requests)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=start + timeout - loop.time(),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    stats.timeouts += 1
+                    # A lower bound, but it lets the timeout grow when the endpoint slows down
+                    latency.record(timeout)
+                    raise asyncio.TimeoutError(f"{endpoint} timed out after {timeout:.1f}s")
+                for future in done:
+                    if future.exception() is None:
+                        latency.record(loop.time() - start)
+                        if future is not first:
+                            stats.hedge_wins += 1
+                        return future.result()
+                    error = error or future.exception()
+            raise error
+        finally:
+            for future in requests:
+                future.cancel()
+
+    def _submit(self, loop: asyncio.AbstractEventLoop, request: Callable[[], Any],
+                timeout: float) -> Tuple[asyncio.Future, asyncio.Future]:
+        """
+        Queue a request on the thread pool; the first future resolves to the
+        loop time at which a thread started it, the second to its result
+        """
+        started = loop.create_future()
+
+        def run():
+            with self._running_lock:
+                self.running += 1
+            _attempt_local.timeout = timeout
+            try:
+                loop.call_soon_threadsafe(_resolve, started, loop.time())
+            except RuntimeError:
+                pass  # the loop is gone; nobody is waiting
+            try:
+                return request()
+            finally:
+                _attempt_local.timeout = None
+                with self._running_lock:
+                    self.running -= 1
+
+        return started, loop.run_in_executor(self.executor, run)
+
+    def _may_hedge(self, endpoint: str) -> bool:
+        """
+        Whether a hedge fits the rolling budget, has an idle thread and a spare token
+        """
+        calls = self.endpoint_stats[endpoint].calls
+        recent = self.recent_hedges[endpoint]
+        while recent and recent[0] <= calls - self.latency_window:
+            recent.popleft()
+        return (len(recent) < self.hedge_budget * min(calls, self.latency_window)
+                and self.running < self.max_concurrency
+                and self._bucket(endpoint).try_acquire())
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: dict(stats.to_dict(), **self._latency_stats(endpoint))
+                for endpoint, stats in self.endpoint_stats.items()}
+
+    def _latency_stats(self, endpoint: str) -> Dict[str, Any]:
+        latency = self.latencies[endpoint]
+        p50, p95 = latency.percentile(0.5), latency.percentile(0.95)
+        return {
+            "latency_p50_ms": 1000 * p50 if p50 is not None else None,
+            "latency_p95_ms": 1000 * p95 if p95 is not None else None,
+            "timeout_s": latency.timeout
+        }
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        quota = self.quotas.get(endpoint, endpoint)
+        if quota not in self.buckets:
+            self.buckets[quota] = TokenBucket(self.qps.get(quota, self.default_qps))
+        if endpoint not in self.endpoint_stats:
+            self.endpoint_stats[endpoint] = EndpointStats()
+            self.latencies[endpoint] = AdaptiveTimeout(
+                self.timeout,
+                minimum=self.min_timeout,
+                percentile=self.timeout_percentile,
+                multiplier=self.timeout_multiplier,
+                window=self.latency_window
+            )
+            self.recent_hedges[endpoint] = deque()
+        return self.buckets[quota]
+
+
+def _resolve(future: asyncio.Future, value: Any):
+    if not future.done():
+        future.set_result(value)
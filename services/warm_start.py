@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import pickle
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from .cache import LRUCache
+
+
+class CacheSnapshot:
+    """
+    Persists in-memory caches to one file so a restarted worker starts warm.
+
+    The file is replaced atomically, so concurrent workers writing the same
+    snapshot never leave a torn file behind; the last writer wins. Entries
+    keep the TTL they had left, minus the time the snapshot sat on disk.
+    """
+
+    def __init__(self, path: str, caches: Dict[str, LRUCache]):
+        self.path = path
+        self.caches = caches
+
+    def save(self):
+        self.write(self.capture())
+
+    def capture(self) -> dict:
+        """
+        Copy the live entries; cheap, but must run on the thread that uses the caches
+        """
+        return {
+            "saved_at": time.time(),
+            "caches": {name: cache.dump() for name, cache in self.caches.items()}
+        }
+
+    def write(self, snapshot: dict):
+        """
+        Pickle a captured snapshot to disk; safe to run on another thread
+        """
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path)
+        except Exception as e:
+            print(f"Error saving cache snapshot: {e}")
+
+    def load(self) -> int:
+        """
+        Restore every known cache from the snapshot; returns the number of entries loaded
+        """
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            print(f"Error loading cache snapshot: {e}")
+            return 0
+
+        age = max(0.0, time.time() - snapshot.get("saved_at", 0.0))
+        loaded = 0
+        for name, entries in snapshot.get("caches", {}).items():
+            cache = self.caches.get(name)
+            if cache is None:
+                continue
+            live = [(key, value, None if remaining is None else remaining - age)
+                    for key, value, remaining in entries
+                    if remaining is None or remaining > age]
+            cache.load(live)
+            loaded += len(live)
+        return loaded
+
+
+class QueryLog:
+    """
+    Append-only JSON lines log of search queries, used to pick the hot
+    queries to replay on startup. Queries are buffered on the event loop
+    and each flush appends the swapped-out buffer on a worker thread, so
+    the request path never touches the disk; a full buffer starts a flush
+    in the background. Once the log passes max_bytes it is rotated to a
+    single `.1` backup.
+    """
+
+    def __init__(self, path: str, max_buffer: int = 1000, max_bytes: int = 10 * 1024 * 1024):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.max_bytes = max_bytes
+        self._buffer: List[str] = []
+        self._flushing: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+
+    def record(self, query: str):
+        self._buffer.append(json.dumps({"ts": time.time(), "query": query}))
+        if len(self._buffer) >= self.max_buffer and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """
+        Swap out the buffer on the event loop and append it on a worker thread
+        """
+        lines, self._buffer = self._buffer, []
+        if lines:
+            await asyncio.to_thread(self.write, lines)
+
+    def write(self, lines: List[str]):
+        """
+        Append lines to the log and rotate it if it grew too big; blocking
+        """
+        with self._write_lock:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+            except OSError as e:
+                print(f"Error writing query log: {e}")
+
+    def top_queries(self, n: int, window: float) -> List[str]:
+        """
+        The n most frequent queries logged within the last `window` seconds
+        """
+        cutoff = time.time() - window
+        counts: Counter = Counter()
+        for path in (f"{self.path}.1", self.path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if entry.get("ts", 0) >= cutoff and entry.get("query"):
+                            counts[" ".join(entry["query"].split())] += 1
+            except FileNotFoundError:
+                continue
+        return [query for query, _ in counts.most_common(n)]
@@ -2,6 +2,8 @@
 """
 Startup script for Intent-Based Maps Search MVP
 """
+import argparse
+import importlib.util
 import subprocess
 import sys
 import os
@@ -55,6 +57,71 @@ def start_backend():
         print(f"❌ Failed to start backend: {e}")
         return None
 
+def default_worker_count():
+    """One worker per core available to this process"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(1, int(os.getenv("WEB_CONCURRENCY", cores)))
+
+def production_command(host="0.0.0.0", port=8000, workers=None):
+    """
+    Command and environment for the production server.
+    
+    Uses gunicorn with preloading when available: the app and the configured
+    backend are imported once in the master and forked, so read-only data is
+    shared copy-on-write. SIGHUP replaces workers gracefully, but forks them
+    from the preloaded master, so they run the code it already has; new code
+    needs SIGUSR2 (a new master) then SIGWINCH and SIGQUIT to the old one,
+    or a full restart. Without gunicorn (e.g. on Windows) it falls back to
+    uvicorn's own process manager.
+    The worker count is exported so each worker takes its share of the
+    upstream QPS quotas.
+    """
+    workers = workers or default_worker_count()
+    env = dict(os.environ, PRELOAD_APP="1", WEB_CONCURRENCY=str(workers))
+    
+    if importlib.util.find_spec("gunicorn"):
+        command = [
+            sys.executable, "-m", "gunicorn", "backend.main:app",
+            "--worker-class", "backend.worker.ProductionWorker",
+            "--workers", str(workers),
+            "--bind", f"{host}:{port}",
+            "--preload",
+            "--graceful-timeout", os.getenv("GRACEFUL_TIMEOUT", "30"),
+            "--keep-alive", "5",
+            "--max-requests", os.getenv("WORKER_MAX_REQUESTS", "0"),
+            "--max-requests-jitter", os.getenv("WORKER_MAX_REQUESTS_JITTER", "0"),
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--host", host,
+            "--port", str(port),
+            "--workers", str(workers),
+        ]
+    return command, env
+
+def start_production(host, port, workers):
+    """Run the production server in the foreground"""
+    command, env = production_command(host, port, workers)
+    print(f"🚀 Starting production server: {' '.join(command[2:])}")
+    if "gunicorn" not in command:
+        print("⚠️  gunicorn not installed: no preloading or graceful reloads")
+    process = subprocess.Popen(command, env=env)
+    print(f"✅ Serving on http://{host}:{port} (master pid {process.pid})")
+    if "gunicorn" in command:
+        print(f"   Replace workers (same code): kill -HUP {process.pid}")
+        print(f"   Deploy new code: kill -USR2 {process.pid}, then once the new master's workers are up "
+              f"kill -WINCH {process.pid} and kill -QUIT {process.pid}")
+    try:
+        process.wait()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down...")
+        process.terminate()
+        process.wait()
+
 def start_frontend():
     """Start the Streamlit frontend"""
     print("🎨 Starting Streamlit frontend...")
@@ -70,9 +137,22 @@ def start_frontend():
         print(f"❌ Failed to start frontend: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Start the Intent-Based Maps Search MVP")
+    parser.add_argument("--production", action="store_true",
+                        help="run only the API with multiple preloaded workers")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per available core)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    
     print("🗺️  Intent-Based Maps Search MVP")
     print("=" * 40)
     
+    if args.production:
+        start_production(args.host, args.port, args.workers)
+        return
+    
     # Check environment
     if not check_env_file():
         return
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from services.batch_loader import BatchLoader
+
+
+class FakeSource:
+    """load_one stand-in that records calls and can be held until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = None
+
+    async def load_one(self, key):
+        self.calls.append(key)
+        if self.release is not None:
+            await self.release.wait()
+        if key == "bad":
+            raise KeyError(key)
+        return key.upper()
+
+
+def test_same_tick_keys_share_one_deduplicated_batch():
+    async def main():
+        source = FakeSource()
+        loader = BatchLoader(source.load_one)
+        results = await asyncio.gather(*(loader.load(key) for key in ["a", "b", "a", "c", "b"]))
+        return source, loader, results
+
+    source, loader, results = asyncio.run(main())
+    assert results == ["A", "B", "A", "C", "B"]
+    assert sorted(source.calls) == ["a", "b", "c"]
+    assert loader.stats() == {"requests": 5, "batches": 1, "loads": 3, "avg_batch_size": 3.0}
+
+
+def test_window_groups_keys_until_it_closes():
+    async def main():
+        source = FakeSource()
+        loader = BatchLoader(source.load_one, window=0.05)
+        first = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(loader.load("b"))
+        await asyncio.gather(first, second)
+        # After the window closed, a new key starts a new batch
+        await loader.load("c")
+        return loader
+
+    loader = asyncio.run(main())
+    assert loader.batches == 2
+    assert loader.loads == 3
+
+
+def test_full_batch_dispatches_without_waiting_for_the_window():
+    async def main():
+        source = FakeSource()
+        loader = BatchLoader(source.load_one, window=10, max_batch=2)
+        return await asyncio.wait_for(asyncio.gather(loader.load("a"), loader.load("b")), timeout=1)
+
+    assert asyncio.run(main()) == ["A", "B"]
+
+
+def test_key_in_flight_is_joined_not_reloaded():
+    async def main():
+        source = FakeSource()
+        source.release = asyncio.Event()
+        loader = BatchLoader(source.load_one)
+        first = asyncio.ensure_future(loader.load("a"))
+        while not source.calls:
+            await asyncio.sleep(0)
+        # A later batch asking for the same key waits on the first load
+        second = asyncio.ensure_future(loader.load("a"))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        source.release.set()
+        return source, loader, await asyncio.gather(first, second)
+
+    source, loader, results = asyncio.run(main())
+    assert results == ["A", "A"]
+    assert source.calls == ["a"]
+    assert loader.batches == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def main():
+        source = FakeSource()
+        loader = BatchLoader(source.load_one)
+        results = await asyncio.gather(loader.load("bad"), loader.load("bad"), loader.load("ok"),
+                                       return_exceptions=True)
+        with pytest.raises(KeyError):
+            await loader.load("bad")
+        return source, results
+
+    source, results = asyncio.run(main())
+    assert isinstance(results[0], KeyError) and results[0] is results[1]
+    assert results[2] == "OK"
+    assert source.calls.count("bad") == 2
+
+
+def test_cancelled_caller_leaves_other_waiters_served():
+    async def main():
+        source = FakeSource()
+        source.release = asyncio.Event()
+        loader = BatchLoader(source.load_one)
+        impatient = asyncio.ensure_future(loader.load("a"))
+        patient = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        await asyncio.sleep(0)
+        source.release.set()
+        return await patient
+
+    assert asyncio.run(main()) == "A"
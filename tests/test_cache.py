@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from services import cache
+from services.cache import RefreshingCache, RefreshSlots
+from services.shared_cache import TieredCache
+
+
+class Clock:
+    """time.time stand-in that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeLoader:
+    """Loader that records calls and can be held until released"""
+
+    def __init__(self, value="fresh"):
+        self.value = value
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+
+def refreshing_cache(slots=None):
+    return RefreshingCache(TieredCache("test", None, 100), soft_ttl=60, refresh_slots=slots)
+
+
+async def settle(refreshing):
+    while refreshing._tasks:
+        await asyncio.sleep(0)
+
+
+def test_fresh_entry_is_served_without_loading(clock):
+    async def main():
+        refreshing = refreshing_cache()
+        refreshing.set("k", "cached")
+        loader = FakeLoader()
+        clock.now += 59
+        return refreshing, loader, await refreshing.get("k", loader)
+
+    refreshing, loader, value = asyncio.run(main())
+    assert value == "cached"
+    assert loader.calls == 0
+    assert refreshing.stale_hits == 0
+
+
+def test_stale_value_is_served_immediately_and_refreshed_once(clock):
+    async def main():
+        refreshing = refreshing_cache()
+        refreshing.set("k", "old")
+        clock.now += 61
+        loader = FakeLoader("new")
+        loader.release = asyncio.Event()
+        # The refresh is held, so the old value can only come back if nobody waits on it
+        values = [await refreshing.get("k", loader) for _ in range(3)]
+        assert refreshing.peek("k") == ("old", False)
+        loader.release.set()
+        await settle(refreshing)
+        return refreshing, loader, values
+
+    refreshing, loader, values = asyncio.run(main())
+    assert values == ["old", "old", "old"]
+    assert loader.calls == 1
+    assert refreshing.stale_hits == 3
+    assert refreshing.refreshes == 1
+    assert refreshing.peek("k") == ("new", True)
+
+
+def test_concurrent_misses_share_one_load(clock):
+    async def main():
+        refreshing = refreshing_cache()
+        loader = FakeLoader("loaded")
+        values = await asyncio.gather(*(refreshing.get("k", loader) for _ in range(5)))
+        return loader, values
+
+    loader, values = asyncio.run(main())
+    assert values == ["loaded"] * 5
+    assert loader.calls == 1
+
+
+def test_refresh_is_skipped_when_slots_are_used_up(clock):
+    async def main():
+        refreshing = refreshing_cache(RefreshSlots(1))
+        for key in "abc":
+            refreshing.set(key, key)
+        clock.now += 61
+        loaders = {key: FakeLoader(key.upper()) for key in "abc"}
+        # All three stale reads land in the same tick
+        values = await asyncio.gather(*(refreshing.get(key, loaders[key]) for key in "abc"))
+        await settle(refreshing)
+        return refreshing, loaders, values
+
+    refreshing, loaders, values = asyncio.run(main())
+    assert values == ["a", "b", "c"]
+    assert refreshing.refreshes == 1
+    assert sum(loader.calls for loader in loaders.values()) == 1
+    assert refreshing.refresh_slots.in_use == 0
+
+
+def test_slot_is_returned_when_a_refresh_fails(clock, capsys):
+    async def main():
+        refreshing = refreshing_cache(RefreshSlots(1))
+        refreshing.set("k", "old")
+        clock.now += 61
+        await refreshing.get("k", FakeLoader(RuntimeError("upstream down")))
+        await settle(refreshing)
+        return refreshing
+
+    refreshing = asyncio.run(main())
+    assert refreshing.refresh_slots.in_use == 0
+    assert refreshing.peek("k") == ("old", False)
+    assert "upstream down" in capsys.readouterr().out
+
+
+def test_failed_or_empty_loads_are_not_cached(clock):
+    async def main():
+        refreshing = refreshing_cache()
+        with pytest.raises(RuntimeError):
+            await refreshing.get("k", FakeLoader(RuntimeError("upstream down")))
+        empty = FakeLoader(None)
+        await refreshing.get("k", empty)
+        await refreshing.get("k", empty)
+        return refreshing, empty
+
+    refreshing, empty = asyncio.run(main())
+    assert empty.calls == 2
+    assert refreshing.peek("k") == (None, False)
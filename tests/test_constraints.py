@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from services import candidates
+from services.candidates import Candidate, CandidateBatch, closes_late, reserve_type_bits, type_bit
+from services.constraints import compile_constraints
+from services.models import PlaceResult
+
+
+def place(name="Corner Spot", rating=None, price_level=None, opening_hours=None, types=("restaurant",)):
+    return PlaceResult(name=name, place_id=name.lower().replace(" ", "-"), address="", rating=rating,
+                       price_level=price_level, opening_hours=opening_hours, photos=None,
+                       distance_from_midpoint=100.0, distance_text=None, types=list(types))
+
+
+def periods(*closing):
+    """Opening hours with one period per (open day, close day, close time)"""
+    return {"periods": [{"open": {"day": open_day, "time": "0900"}, "close": {"day": close_day, "time": time}}
+                        for open_day, close_day, time in closing]}
+
+
+def weekday_text(*lines):
+    return {"weekday_text": list(lines)}
+
+
+PLACES = [
+    place("Blue Bottle Coffee", rating=4.6, price_level=2, types=("cafe",),
+          opening_hours=periods((1, 1, "1800"))),
+    place("Night Owl", rating=4.1, price_level=3, types=("bar", "night_club"),
+          opening_hours=periods((5, 6, "0200"))),
+    place("Rooftop Garden Grill", rating=3.2, price_level=4, types=("restaurant",),
+          opening_hours=weekday_text("Monday: 5:00 PM – 11:00 PM")),
+    place("Main St Deli", types=("meal_takeaway", "parking")),
+]
+
+
+@pytest.mark.parametrize("constraint, expected", [
+    ({"type": "rating_min", "value": 4.0}, [True, True, False, True]),
+    ({"type": "price_range", "value": 2}, [True, False, False, True]),
+    ({"type": "open_late", "value": True}, [False, True, True, True]),
+    ({"type": "parking", "value": True}, [False, False, False, True]),
+    ({"type": "quiet", "value": True}, [True, False, True, True]),
+    ({"type": "wifi", "value": True}, [True, False, False, False]),
+    ({"type": "time_limit", "value": True}, [True, False, False, True]),
+    ({"type": "outdoor_seating", "value": True}, [False, False, True, False]),
+])
+def test_place_and_batch_checks_agree(constraint, expected):
+    evaluator = compile_constraints([constraint]).evaluators[0]
+    batch = CandidateBatch.from_results(PLACES)
+    assert [evaluator.place_check(p) for p in PLACES] == expected
+    assert evaluator.batch_check(batch).tolist() == expected
+
+
+def test_only_hard_constraints_filter():
+    predicate = compile_constraints([
+        {"type": "rating_min", "value": 4.0},
+        {"type": "wifi", "value": True},
+        {"type": "unknown", "value": True},
+        {"type": "quiet", "value": False},
+    ])
+    batch = CandidateBatch.from_results(PLACES)
+    assert [e.name for e in predicate.evaluators] == ["rating_min", "wifi"]
+    assert [predicate(p) for p in PLACES] == [True, True, False, True]
+    assert predicate.mask(batch).tolist() == [True, True, False, True]
+    assert predicate.matches(batch).tolist() == [2, 1, 0, 1]
+    assert predicate.match_count(PLACES[0]) == 2
+
+
+@pytest.mark.parametrize("opening_hours, expected", [
+    (None, None),
+    ({}, None),
+    (periods((1, 1, "1800"), (2, 2, "2100")), 0.0),
+    (periods((1, 1, "1800"), (5, 5, "2200")), 1.0),
+    (periods((5, 6, "0100")), 1.0),
+    ({"periods": [{"open": {"day": 0, "time": "0000"}}]}, 1.0),
+    (weekday_text("Monday: 7:00 AM – 9:00 PM", "Tuesday: Closed"), 0.0),
+    (weekday_text("Monday: 7:00 AM – 10:00 PM"), 1.0),
+    (weekday_text("Friday: 6:00 PM – 2:00 AM"), 1.0),
+    (weekday_text("Saturday: Open 24 hours"), 1.0),
+    (weekday_text("Sunday: Closed"), None),
+])
+def test_closes_late(opening_hours, expected):
+    assert closes_late(opening_hours) == expected
+
+
+def test_unknown_hours_pass_open_late():
+    evaluator = compile_constraints([{"type": "open_late", "value": True}]).evaluators[0]
+    unknown = place("Mystery Diner")
+    assert evaluator.place_check(unknown)
+    assert evaluator.batch_check(CandidateBatch.from_results([unknown])).tolist() == [True]
+
+
+def test_overflowing_types_are_matched_exactly(monkeypatch):
+    monkeypatch.setattr(candidates, "_TYPE_BITS", {})
+    reserve_type_bits(["cafe"])
+    for i in range(62):
+        type_bit(f"filler_{i}")
+    # Every type from here on shares the overflow bit
+    assert type_bit("rare_a") == type_bit("rare_b") == candidates._OVERFLOW_BIT
+    with pytest.raises(ValueError):
+        reserve_type_bits(["rare_c"])
+
+    batch = CandidateBatch.from_results([
+        Candidate("a", "A", "", None, None, None, ["rare_a"], 0.0, 0.0, 0.0),
+        Candidate("b", "B", "", None, None, None, ["rare_b", "cafe"], 0.0, 0.0, 0.0),
+        Candidate("c", "C", "", None, None, None, ["filler_3"], 0.0, 0.0, 0.0),
+    ])
+    assert batch.has_any_type(["rare_a"]).tolist() == [True, False, False]
+    assert batch.has_any_type(["rare_b"]).tolist() == [False, True, False]
+    assert batch.has_any_type(["cafe", "filler_3"]).tolist() == [False, True, True]
+    assert batch.has_any_type(["rare_a", "filler_3"]).tolist() == [True, False, True]
+    assert isinstance(batch.has_any_type([]), np.ndarray)
@@ -0,0 +1,46 @@
+import pytest
+from services import geohash
+from services.corridor import CorridorSearch
+from services.geo import great_circle_points, haversine
+
+SAN_FRANCISCO = (37.7749, -122.4194)
+SAN_JOSE = (37.3382, -121.8863)
+LOS_ANGELES = (34.0522, -118.2437)
+NEW_YORK = (40.7128, -74.0060)
+
+
+def corridor() -> CorridorSearch:
+    return CorridorSearch(maps_service=None, precision=5, max_cells=20, max_radius=50000)
+
+
+def uncovered(waypoints, cells, radius, slack=0.0):
+    """Points of the path farther than radius (plus slack) from every searched cell center"""
+    centers = [geohash.decode(cell) for cell in cells]
+    path = [point for start, end in zip(waypoints, waypoints[1:])
+            for point in great_circle_points(*start, *end, 1000)]
+    return [point for point in path
+            if min(haversine(*point, *center) for center in centers) > radius + slack]
+
+
+def test_short_trip_uses_fine_cells():
+    waypoints = [SAN_FRANCISCO, SAN_JOSE]
+    cells, radius = corridor().cells(waypoints)
+    assert len(cells) <= 20
+    assert radius < 50000
+    # Sampling can skip a corner the path barely clips, a few meters outside the radius
+    assert not uncovered(waypoints, cells, radius, slack=0.01 * radius)
+
+
+@pytest.mark.parametrize("waypoints", [[SAN_FRANCISCO, LOS_ANGELES], [NEW_YORK, LOS_ANGELES],
+                                       [SAN_FRANCISCO, LOS_ANGELES, NEW_YORK]])
+def test_long_trip_radius_stays_within_the_places_limit(waypoints):
+    cells, radius = corridor().cells(waypoints)
+    assert radius <= 50000
+    assert not uncovered(waypoints, cells, radius)
+
+
+def test_same_route_either_way_searches_the_same_cells():
+    search = corridor()
+    forward, _ = search.cells([NEW_YORK, LOS_ANGELES])
+    backward, _ = search.cells([LOS_ANGELES, NEW_YORK])
+    assert set(forward) == set(backward)
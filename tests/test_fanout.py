@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+from services.candidates import Candidate, CandidatePool
+from services.fanout import FanoutMapsService
+from services.models import Location
+from services.upstream import UpstreamUnavailableError
+
+LOCATION = Location(lat=40.0, lng=-74.0, address="Midpoint")
+UNAVAILABLE = UpstreamUnavailableError("places_nearby", RuntimeError("quota exceeded"))
+
+
+class FakeProvider:
+    """Provider answering with a fixed number of candidates after a delay, or raising"""
+
+    def __init__(self, name, count=0, delay=0.0, error=None, complete=True):
+        self.name = name
+        self.count = count
+        self.delay = delay
+        self.error = error
+        self.complete = complete
+        self.calls = 0
+
+    async def candidate_pool(self, place_type, location, radius, constraints, expand, exhaustive):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        # Spread out so no two providers' places collapse into one when deduplicated
+        offset = 0.01 if self.name == "slow" else 0.0
+        return CandidatePool([
+            Candidate(f"{self.name}-{i}", f"{self.name} {i}", "", 4.0, 1, None, ["cafe"],
+                      location.lat + offset + i * 0.001, location.lng, 100.0 * i)
+            for i in range(self.count)
+        ], self.complete)
+
+
+def ids(pool):
+    return [candidate.place_id for candidate in pool]
+
+
+def test_slow_provider_with_enough_candidates_wins_over_fast_short_one():
+    async def main():
+        fanout = FanoutMapsService(FakeProvider("fast", count=1), FakeProvider("slow", count=3, delay=0.05), deadline=1)
+        return fanout, await fanout.candidate_pool("cafe", LOCATION)
+
+    fanout, pool = asyncio.run(main())
+    # The winner's candidates come first, then whatever the others had
+    assert ids(pool) == ["slow-0", "slow-1", "slow-2", "fast-0"]
+    assert fanout.wins == [0, 1]
+    assert fanout.shortfalls == 0
+    assert pool.complete
+
+
+def test_late_answer_is_merged_into_the_cached_pool():
+    async def main():
+        fast = FakeProvider("fast", count=3)
+        slow = FakeProvider("slow", count=2, delay=0.1)
+        fanout = FanoutMapsService(fast, slow, deadline=1)
+        pool = await fanout.candidate_pool("cafe", LOCATION)
+        await asyncio.sleep(0.2)
+        repeat = await fanout.candidate_pool("cafe", LOCATION)
+        return fanout, fast, slow, pool, repeat
+
+    fanout, fast, slow, pool, repeat = asyncio.run(main())
+    # The fast provider had enough, so the search did not wait for the slow one
+    assert ids(pool) == ["fast-0", "fast-1", "fast-2"]
+    assert not pool.complete
+    assert fanout.wins == [1, 0]
+    assert fanout.late_merges == 1
+    assert ids(repeat) == ["fast-0", "fast-1", "fast-2", "slow-0", "slow-1"]
+    assert not repeat.complete
+    assert fast.calls == slow.calls == 1
+    # Late candidates are enriched through the provider that listed them
+    assert fanout.origins.get("slow-0") == 1
+
+
+def test_deadline_returns_what_has_arrived():
+    async def main():
+        fanout = FanoutMapsService(FakeProvider("fast", count=1), FakeProvider("slow", count=3, delay=0.5),
+                                   deadline=0.05)
+        pool = await fanout.candidate_pool("cafe", LOCATION)
+        fanout.close()
+        return fanout, pool
+
+    fanout, pool = asyncio.run(main())
+    assert ids(pool) == ["fast-0"]
+    assert not pool.complete
+    assert fanout.wins == [0, 0]
+    assert fanout.shortfalls == 1
+
+
+def test_unavailable_provider_is_skipped_but_leaves_the_pool_incomplete():
+    async def main():
+        fanout = FanoutMapsService(FakeProvider("fast", error=UNAVAILABLE),
+                                   FakeProvider("slow", count=2, delay=0.01), deadline=1)
+        return fanout, await fanout.candidate_pool("cafe", LOCATION)
+
+    fanout, pool = asyncio.run(main())
+    assert ids(pool) == ["slow-0", "slow-1"]
+    assert not pool.complete
+    assert fanout.shortfalls == 1
+
+
+def test_all_providers_unavailable_raises():
+    async def main():
+        fanout = FanoutMapsService(FakeProvider("fast", error=UNAVAILABLE), FakeProvider("slow", error=UNAVAILABLE),
+                                   deadline=1)
+        await fanout.candidate_pool("cafe", LOCATION)
+
+    with pytest.raises(UpstreamUnavailableError):
+        asyncio.run(main())
+
+
+def test_exhaustive_search_waits_for_every_provider():
+    async def main():
+        fanout = FanoutMapsService(FakeProvider("fast", count=3), FakeProvider("slow", count=2, delay=0.05),
+                                   deadline=0.01)
+        return fanout, await fanout.candidate_pool("cafe", LOCATION, exhaustive=True)
+
+    fanout, pool = asyncio.run(main())
+    assert ids(pool) == ["fast-0", "fast-1", "fast-2", "slow-0", "slow-1"]
+    assert pool.complete
+    assert fanout.wins == [0, 0]
+    assert fanout.shortfalls == 0
+    assert fanout.late_merges == 0
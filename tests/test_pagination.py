@@ -0,0 +1,75 @@
+import asyncio
+import base64
+import json
+from services import cache
+from services.models import ParsedQuery
+from services.pagination import RankedSearch, ResultPages
+from services.shared_cache import SharedCache, TieredCache
+
+
+def ranked_search() -> RankedSearch:
+    return RankedSearch(ParsedQuery(place_type="cafe", locations=["Oakland"], constraints=[]), [], None, [])
+
+
+def encode(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    pages = ResultPages(TieredCache("pages", max_size=10))
+    search = ranked_search()
+    search_id = pages.save(search)
+    cursor = pages.cursor(search_id, 5)
+    assert "=" not in cursor
+    assert asyncio.run(pages.resolve(cursor)) == (search, search_id, 5)
+
+
+def test_tampered_cursors_resolve_to_none():
+    pages = ResultPages(TieredCache("pages", max_size=10))
+    search_id = pages.save(ranked_search())
+    cursor = pages.cursor(search_id, 5)
+    tampered = [
+        "",
+        "not base64!",
+        cursor[:-3],
+        encode({"id": search_id}),
+        encode([search_id]),
+        encode([search_id, -1]),
+        encode([search_id, "5"]),
+        encode([123, 5]),
+        encode([search_id + "x", 5]),
+    ]
+    for bad in tampered:
+        assert asyncio.run(pages.resolve(bad)) is None, bad
+
+
+def test_expired_search_resolves_to_none(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    pages = ResultPages(TieredCache("pages", max_size=10, ttl=60))
+    cursor = pages.cursor(pages.save(ranked_search()), 3)
+    now[0] += 59
+    assert asyncio.run(pages.resolve(cursor)) is not None
+    now[0] += 2
+    assert asyncio.run(pages.resolve(cursor)) is None
+
+
+def test_evicted_search_resolves_to_none():
+    pages = ResultPages(TieredCache("pages", max_size=1))
+    cursor = pages.cursor(pages.save(ranked_search()), 3)
+    pages.save(ranked_search())
+    assert asyncio.run(pages.resolve(cursor)) is None
+
+
+def test_cursor_resolves_on_another_worker(tmp_path):
+    shared = SharedCache(str(tmp_path / "shared.db"))
+    try:
+        pages = ResultPages(TieredCache("pages", shared, max_size=10, ttl=60))
+        other_worker = ResultPages(TieredCache("pages", shared, max_size=10, ttl=60))
+        search_id = pages.save(ranked_search())
+        resolved = asyncio.run(other_worker.resolve(pages.cursor(search_id, 3)))
+        assert resolved is not None
+        search, resolved_id, offset = resolved
+        assert (resolved_id, offset, search.parsed_query.place_type) == (search_id, 3, "cafe")
+    finally:
+        shared.close()
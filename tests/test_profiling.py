@@ -0,0 +1,30 @@
+import os
+import threading
+import pytest
+from services.profiling import SearchProfiler
+
+
+def test_only_the_token_is_privileged():
+    profiler = SearchProfiler(token="secret", sample_rate=1.0)
+    assert profiler.is_privileged({"x-profile": "secret"})
+    assert not profiler.is_privileged({"x-profile": "guess"})
+    assert not profiler.is_privileged({})
+    # Sampled requests are profiled without being privileged
+    assert profiler.should_profile({})
+    assert not SearchProfiler().is_privileged({"x-profile": ""})
+
+
+@pytest.mark.parametrize("mode", SearchProfiler.MODES)
+def test_session_saves_on_another_thread(tmp_path, mode):
+    profiler = SearchProfiler(output_dir=str(tmp_path), mode=mode, max_files=1)
+    for _ in range(2):
+        session = profiler.start()
+        assert profiler.start() is None  # one profile at a time
+        sum(range(10000))
+        session.halt()
+        saver = threading.Thread(target=session.save)
+        saver.start()
+        saver.join()
+        assert os.path.exists(session.path)
+    # Older profiles beyond max_files are rotated out
+    assert len(os.listdir(tmp_path)) == 1
@@ -0,0 +1,62 @@
+import numpy as np
+from services.candidates import Candidate, CandidateBatch
+from services.ranking import RankingEngine
+
+
+def candidate(place_id: str, rating=None, distance=None, price_level=None) -> Candidate:
+    return Candidate(place_id, place_id, "", rating, price_level, None, ("cafe",), 0.0, 0.0, distance)
+
+
+def batch(*candidates: Candidate) -> CandidateBatch:
+    return CandidateBatch.from_results(candidates)
+
+
+def ids(batch: CandidateBatch, indices: np.ndarray):
+    return [batch.place_ids[i] for i in indices]
+
+
+def test_top_k_orders_best_first():
+    b = batch(candidate("low", 3.0, 100), candidate("high", 4.8, 100), candidate("mid", 4.0, 100))
+    assert ids(b, RankingEngine().top_k(b, 3)) == ["high", "mid", "low"]
+
+
+def test_top_k_matches_full_sort_when_k_is_smaller_than_n():
+    rng = np.random.default_rng(7)
+    b = batch(*(candidate(str(i), float(r), float(d))
+                for i, (r, d) in enumerate(zip(rng.uniform(1, 5, 200), rng.uniform(0, 5000, 200)))))
+    engine = RankingEngine()
+    scores = engine.score(b)
+    top = engine.top_k(b, 10)
+    assert list(top) == list(np.argsort(-scores, kind="stable")[:10])
+
+
+def test_top_k_breaks_ties_by_distance():
+    engine = RankingEngine(weights={"distance": 0.0})
+    b = batch(candidate("far", 4.5, 3000), candidate("near", 4.5, 200), candidate("middle", 4.5, 900))
+    assert ids(b, engine.top_k(b, 3)) == ["near", "middle", "far"]
+    # The tie order holds when argpartition has to cut through the tied group
+    assert ids(b, engine.top_k(b, 2)) == ["near", "middle"]
+
+
+def test_top_k_puts_unknown_distance_last_among_ties():
+    engine = RankingEngine(weights={"distance": 0.0})
+    b = batch(candidate("unknown", 4.0, None), candidate("known", 4.0, 500))
+    assert ids(b, engine.top_k(b, 2)) == ["known", "unknown"]
+
+
+def test_top_k_uses_given_scores():
+    b = batch(candidate("a", 5.0, 100), candidate("b", 1.0, 100))
+    assert ids(b, RankingEngine().top_k(b, 1, scores=np.array([0.1, 0.9]))) == ["b"]
+
+
+def test_top_k_edge_sizes():
+    engine = RankingEngine()
+    b = batch(candidate("a", 4.0, 100), candidate("b", 3.0, 100))
+    assert len(engine.top_k(b, 0)) == 0
+    assert len(engine.top_k(batch(), 5)) == 0
+    assert ids(b, engine.top_k(b, 10)) == ["a", "b"]
+
+
+def test_missing_rating_scores_lowest():
+    b = batch(candidate("unrated", None, 100), candidate("rated", 2.0, 100))
+    assert ids(b, RankingEngine().top_k(b, 2)) == ["rated", "unrated"]
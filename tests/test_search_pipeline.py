@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+import config
+from services.maps_service import MapsService
+from services.models import ParsedQuery
+from services.pagination import ResultPages
+from services.search_pipeline import SearchPipeline
+from services.shared_cache import TieredCache
+
+
+class FakeParser:
+    def __init__(self, parsed_query: ParsedQuery):
+        self.parsed_query = parsed_query
+
+    def parse_query_fast(self, query: str) -> ParsedQuery:
+        return self.parsed_query
+
+    async def parse_query(self, query: str) -> ParsedQuery:
+        return self.parsed_query
+
+
+class FakeGoogleMaps:
+    """googlemaps.Client stand-in serving a text search of several full pages"""
+
+    def __init__(self, pages: int = 3, page_size: int = 20):
+        self.pages = pages
+        self.page_size = page_size
+        self.places_calls = 0
+
+    def geocode(self, address):
+        return [{"geometry": {"location": {"lat": 37.8, "lng": -122.27}}, "formatted_address": address}]
+
+    def places(self, query=None, location=None, radius=None, type=None, page_token=None):
+        self.places_calls += 1
+        page = int(page_token) if page_token else 0
+        results = [self._place(page * self.page_size + i) for i in range(self.page_size)]
+        more = page + 1 < self.pages
+        return {"results": results, "next_page_token": str(page + 1) if more else None}
+
+    def place(self, place_id=None, fields=None):
+        return {"result": {}}
+
+    @staticmethod
+    def _place(i: int) -> dict:
+        return {
+            "place_id": f"place_{i}",
+            "name": f"Cafe {i}",
+            "rating": round(5.0 - i * 0.05, 2),
+            "types": ["cafe"],
+            "geometry": {"location": {"lat": 37.8 + i * 1e-4, "lng": -122.27}},
+        }
+
+
+@pytest.fixture
+def maps_service(monkeypatch):
+    monkeypatch.setenv("GOOGLE_MAPS_API_KEY", "AIza-test-key")
+    monkeypatch.setattr(config, "PLACES_PAGE_TOKEN_DELAY", 0.0)
+    monkeypatch.setattr(config, "UPSTREAM_QPS", {endpoint: 1000.0 for endpoint in config.UPSTREAM_QPS})
+    service = MapsService()
+    service.gmaps = FakeGoogleMaps()
+    yield service
+    service.close()
+
+
+def pipeline(maps_service) -> SearchPipeline:
+    parsed_query = ParsedQuery(place_type="cafe", locations=["Oakland"], constraints=[], radius=1000)
+    return SearchPipeline(FakeParser(parsed_query), maps_service,
+                          pages=ResultPages(TieredCache("pages", max_size=100)))
+
+
+def test_cursors_page_past_an_early_stopped_fetch(maps_service):
+    async def main():
+        search = pipeline(maps_service)
+        outcome = await search.run("cafes in Oakland")
+        first_calls = maps_service.gmaps.places_calls
+        served = [result.place_id for result in outcome.results]
+        while outcome.next_cursor:
+            outcome = await search.next_page(outcome.next_cursor)
+            served.extend(result.place_id for result in outcome.results)
+        return first_calls, served
+
+    first_calls, served = asyncio.run(main())
+    # The first page of Places is enough for the first page of results
+    assert first_calls == 1
+    # Following the cursors reaches every place Places serves, each once
+    assert len(served) == 60
+    assert len(set(served)) == 60
+    assert served[:3] == ["place_0", "place_1", "place_2"]
+    # The rest was fetched once, when the cursor ran past the first Places page
+    assert maps_service.gmaps.places_calls == 1 + 3
+
+
+def test_fetched_page_is_used_whole(maps_service):
+    async def main():
+        return await maps_service.candidate_pool("cafe", await maps_service.geocode_location("Oakland"), 1000)
+
+    pool = asyncio.run(main())
+    assert len(pool) == 20
+    assert not pool.complete
+
+
+def test_search_with_one_page_has_no_cursor_past_it(maps_service):
+    maps_service.gmaps = FakeGoogleMaps(pages=1, page_size=5)
+
+    async def main():
+        search = pipeline(maps_service)
+        outcome = await search.run("cafes in Oakland")
+        second = await search.next_page(outcome.next_cursor)
+        return second
+
+    second = asyncio.run(main())
+    assert len(second.results) == 2
+    assert second.next_cursor is None
+    assert maps_service.gmaps.places_calls == 1
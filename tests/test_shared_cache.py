@@ -0,0 +1,54 @@
+import asyncio
+import sqlite3
+from services.shared_cache import SharedCache, TieredCache
+
+
+def stale_payload() -> bytes:
+    """A pickle naming a class an older deploy had and this one doesn't"""
+    return b"\x80\x04\x95\x1e\x00\x00\x00\x00\x00\x00\x00\x8c\x0cservices.old\x94\x8c\x06Before\x94\x93\x94)\x81\x94."
+
+
+def rows(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def test_round_trip_through_the_cache_thread(tmp_path):
+    shared = SharedCache(str(tmp_path / "shared.db"))
+    try:
+        shared.set("geocode", "oakland", {"lat": 37.8}, ttl=60)
+        value, expires = asyncio.run(shared.get("geocode", "oakland"))
+        assert value == {"lat": 37.8} and expires is not None
+        assert asyncio.run(shared.get("geocode", "berkeley")) is None
+        assert (shared.hits, shared.misses) == (1, 1)
+    finally:
+        shared.close()
+
+
+def test_row_from_an_older_deploy_is_a_miss_and_is_dropped(tmp_path):
+    path = str(tmp_path / "shared.db")
+    shared = SharedCache(path)
+    try:
+        shared.set("geocode", "oakland", "placeholder")
+        asyncio.run(shared.get("geocode", "oakland"))
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE entries SET value = ?", (stale_payload(),))
+        cache = TieredCache("geocode", shared)
+        assert asyncio.run(cache.get("oakland")) is None
+        assert shared.errors == 1
+        asyncio.run(shared.evict())
+        assert rows(path) == 0
+    finally:
+        shared.close()
+
+
+def test_unpicklable_value_is_counted_not_raised(tmp_path):
+    shared = SharedCache(str(tmp_path / "shared.db"))
+    try:
+        shared.set("geocode", "oakland", lambda: None)
+        shared.set("geocode", "berkeley", "ok")
+        assert asyncio.run(shared.get("geocode", "oakland")) is None
+        assert asyncio.run(shared.get("geocode", "berkeley"))[0] == "ok"
+        assert shared.errors == 1
+    finally:
+        shared.close()
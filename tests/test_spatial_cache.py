@@ -0,0 +1,87 @@
+import pytest
+from services import geohash
+from services.candidates import Candidate
+from services.geo import haversine
+from services.spatial_cache import SpatialCandidateCache
+
+# Degrees of latitude per meter
+LAT_PER_METER = 1 / 111195
+
+
+def candidates(lat, lng):
+    return [Candidate(f"p{i}", f"Place {i}", "", 4.0, 1, None, ["cafe"], lat + i * 0.001, lng, 0.0)
+            for i in range(3)]
+
+
+@pytest.fixture
+def center():
+    # Middle of a precision 6 cell, so small offsets stay in the same cell
+    return geohash.decode(geohash.encode(40.7128, -74.0060, 6))
+
+
+def test_search_inside_a_cached_area_reuses_it(center):
+    lat, lng = center
+    cache = SpatialCandidateCache()
+    cache.store("cafe", lat, lng, 5000, candidates(lat, lng), complete=True)
+
+    moved = lat + 300 * LAT_PER_METER
+    area = cache.lookup("cafe", moved, lng, 5000)
+    assert area is not None
+    assert (area.lat, area.lng, area.radius, area.complete) == (moved, lng, 5000, True)
+    # Distances are measured from the new search point
+    for candidate in area.candidates:
+        assert candidate.distance_from_midpoint == pytest.approx(haversine(moved, lng, candidate.lat, candidate.lng))
+    assert cache.stats()["hits"] == 1
+
+
+def test_search_reaching_outside_the_cached_area_misses(center):
+    lat, lng = center
+    cache = SpatialCandidateCache()
+    cache.store("cafe", lat, lng, 5000, candidates(lat, lng), complete=True)
+
+    # 10% slack on 5km lets the search move ~500m, not 800m
+    assert cache.lookup("cafe", lat + 800 * LAT_PER_METER, lng, 5000) is None
+    assert cache.lookup("cafe", lat, lng, 5400) is not None
+    assert cache.lookup("cafe", lat, lng, 5600) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_other_queries_and_radius_classes_miss(center):
+    lat, lng = center
+    cache = SpatialCandidateCache()
+    cache.store("cafe", lat, lng, 5000, candidates(lat, lng), complete=True)
+
+    assert cache.lookup("bar", lat, lng, 5000) is None
+    # A 1km search fits inside the 5km area but lives in another radius class
+    assert cache.lookup("cafe", lat, lng, 1000) is None
+
+
+def test_area_stored_in_a_neighbouring_cell_is_found():
+    cell = geohash.encode(40.7128, -74.0060, 6)
+    min_lat, min_lng, max_lat, max_lng = geohash.bounds(cell)
+    lng = (min_lng + max_lng) / 2
+    # Just below and just above the cell's northern edge
+    stored_lat = max_lat - 50 * LAT_PER_METER
+    search_lat = max_lat + 50 * LAT_PER_METER
+    assert geohash.encode(search_lat, lng, 6) != cell
+
+    cache = SpatialCandidateCache()
+    cache.store("cafe", stored_lat, lng, 5000, candidates(stored_lat, lng), complete=False)
+    area = cache.lookup("cafe", search_lat, lng, 5000)
+    assert area is not None
+    assert not area.complete
+
+
+def test_closest_covering_area_wins():
+    cell = geohash.encode(40.7128, -74.0060, 6)
+    min_lat, min_lng, max_lat, max_lng = geohash.bounds(cell)
+    lat, lng = geohash.decode(cell)
+    north = geohash.decode(geohash.encode(max_lat + 10 * LAT_PER_METER, lng, 6))
+
+    cache = SpatialCandidateCache()
+    cache.store("cafe", lat, lng, 5000, candidates(lat, lng), complete=True)
+    cache.store("cafe", north[0], north[1], 5000, candidates(north[0], north[1]), complete=False)
+    # Both cover a search just past the edge; the northern center is nearer
+    area = cache.lookup("cafe", max_lat + 100 * LAT_PER_METER, lng, 4800)
+    assert area is not None
+    assert not area.complete
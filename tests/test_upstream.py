@@ -0,0 +1,337 @@
+import asyncio
+import threading
+import pytest
+from services import upstream
+from services.upstream import AdaptiveTimeout, TokenBucket, UpstreamClient, UpstreamUnavailableError, attempt_timeout
+
+
+class Retryable(Exception):
+    pass
+
+
+class Throttled(Retryable):
+    pass
+
+
+class FakeEndpoint:
+    """
+    Blocking SDK call stand-in: plays back a script of outcomes, one per
+    request; "block" holds the calling thread until released
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.requests = 0
+        self.arguments = []
+        self.timeouts = []
+        self.released = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            outcome = self.script[min(self.requests, len(self.script) - 1)]
+            self.requests += 1
+            self.arguments.append((args, kwargs))
+            self.timeouts.append(attempt_timeout())
+        if outcome == "block":
+            self.released.wait(5)
+            return "late"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def client(**kwargs) -> UpstreamClient:
+    options = dict(
+        qps={"places": 100.0},
+        is_retryable=lambda e: isinstance(e, Retryable),
+        is_throttled=lambda e: isinstance(e, Throttled),
+        max_retries=2,
+        base_delay=0.001,
+        max_delay=0.01,
+        max_concurrency=4,
+    )
+    options.update(kwargs)
+    return UpstreamClient(**options)
+
+
+def call(client: UpstreamClient, fn: FakeEndpoint, endpoint: str = "places", prime: float = None):
+    async def main():
+        if prime is not None:
+            client._bucket(endpoint)
+            for _ in range(client.latencies[endpoint].min_samples):
+                client.latencies[endpoint].record(prime)
+        return await client.call(endpoint, fn, "query", radius=500)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        fn.released.set()
+        client.close()
+
+
+class FakeClock:
+    def __init__(self, monkeypatch):
+        self.now = 100.0
+        monkeypatch.setattr(upstream.time, "monotonic", lambda: self.now)
+
+
+def test_bucket_refills_at_its_rate(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now += 0.4
+    assert not bucket.try_acquire()
+    clock.now += 0.1
+    assert bucket.try_acquire()
+    # Refill never exceeds the burst
+    clock.now += 60
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+
+
+def test_bucket_pause_drains_and_blocks_until_it_ends(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.pause(2.0)
+    clock.now += 1.9
+    assert not bucket.try_acquire()
+    clock.now += 0.2
+    assert bucket.try_acquire()
+    # A shorter pause never cuts an earlier, longer one short
+    bucket.pause(3.0)
+    bucket.pause(1.0)
+    clock.now += 2.0
+    assert not bucket.try_acquire()
+
+
+def test_acquire_waits_for_a_token():
+    async def main():
+        bucket = TokenBucket(rate=20, burst=1)
+        first = await bucket.acquire()
+        second = await bucket.acquire()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first < 0.01
+    assert 0.03 < second < 0.5
+
+
+def test_acquire_waits_out_a_pause():
+    async def main():
+        bucket = TokenBucket(rate=1000)
+        bucket.pause(0.05)
+        return await bucket.acquire()
+
+    assert asyncio.run(main()) >= 0.04
+
+
+def test_adaptive_timeout_follows_recent_latencies():
+    timeout = AdaptiveTimeout(maximum=10.0, minimum=0.5, percentile=0.9, multiplier=2.0, window=10, min_samples=5)
+    assert timeout.timeout == 10.0
+    for latency in [0.1, 0.2, 0.3, 0.4, 0.5]:
+        timeout.record(latency)
+    assert timeout.timeout == pytest.approx(1.0)
+    for _ in range(10):
+        timeout.record(0.01)
+    assert timeout.timeout == 0.5
+    for _ in range(10):
+        timeout.record(60.0)
+    assert timeout.timeout == 10.0
+
+
+def test_call_passes_arguments_and_returns_result():
+    fn = FakeEndpoint("ok")
+    assert call(client(), fn) == "ok"
+    assert fn.arguments == [(("query",), {"radius": 500})]
+
+
+def test_call_retries_retryable_failures():
+    upstream_client = client()
+    fn = FakeEndpoint(Retryable("503"), Retryable("503"), "ok")
+    assert call(upstream_client, fn) == "ok"
+    stats = upstream_client.endpoint_stats["places"]
+    assert (fn.requests, stats.calls, stats.failures, stats.retries) == (3, 3, 2, 2)
+
+
+def test_call_raises_other_failures_immediately():
+    upstream_client = client()
+    fn = FakeEndpoint(ValueError("bad request"), "ok")
+    with pytest.raises(ValueError):
+        call(upstream_client, fn)
+    assert fn.requests == 1
+
+
+def test_call_gives_up_after_max_retries():
+    upstream_client = client()
+    fn = FakeEndpoint(Retryable("503"))
+    with pytest.raises(UpstreamUnavailableError) as raised:
+        call(upstream_client, fn)
+    assert fn.requests == 3
+    assert raised.value.endpoint == "places"
+    assert isinstance(raised.value.cause, Retryable)
+    assert raised.value.retry_after >= 1.0
+
+
+def test_throttling_pauses_the_bucket():
+    upstream_client = client(max_retries=1)
+    fn = FakeEndpoint(Throttled("429"), "ok")
+    assert call(upstream_client, fn) == "ok"
+    stats = upstream_client.endpoint_stats["places"]
+    assert stats.throttled == 1
+    assert upstream_client.buckets["places"].paused_until > 0
+
+
+def test_timed_out_attempts_are_retried():
+    upstream_client = client(max_retries=1, timeout=0.05, min_timeout=0.01)
+    fn = FakeEndpoint("block", "ok")
+    assert call(upstream_client, fn) == "ok"
+    stats = upstream_client.endpoint_stats["places"]
+    assert (stats.timeouts, stats.retries) == (1, 1)
+    # The timed out attempt counts as a latency sample of at least the timeout
+    assert 0.05 in upstream_client.latencies["places"].latencies
+
+
+def test_call_times_out_when_every_attempt_hangs():
+    upstream_client = client(max_retries=1, timeout=0.05, min_timeout=0.01)
+    fn = FakeEndpoint("block")
+    with pytest.raises(UpstreamUnavailableError) as raised:
+        call(upstream_client, fn)
+    assert isinstance(raised.value.cause, asyncio.TimeoutError)
+    assert upstream_client.endpoint_stats["places"].timeouts == 2
+
+
+def test_slow_idempotent_call_is_hedged():
+    upstream_client = client(hedge_endpoints=["places"], hedge_budget=1.0, timeout=5.0, min_timeout=1.0)
+    fn = FakeEndpoint("block", "hedged")
+    assert call(upstream_client, fn, prime=0.01) == "hedged"
+    stats = upstream_client.endpoint_stats["places"]
+    assert (fn.requests, stats.hedges, stats.hedge_wins, stats.timeouts) == (2, 1, 1, 0)
+
+
+def test_fast_call_is_not_hedged():
+    upstream_client = client(hedge_endpoints=["places"], hedge_budget=1.0, timeout=5.0, min_timeout=1.0)
+    fn = FakeEndpoint("ok")
+    assert call(upstream_client, fn, prime=0.5) == "ok"
+    assert upstream_client.endpoint_stats["places"].hedges == 0
+
+
+def test_hedging_is_limited_to_hedge_endpoints_and_budget():
+    for options in ({"hedge_endpoints": []}, {"hedge_endpoints": ["places"], "hedge_budget": 0.0}):
+        upstream_client = client(timeout=5.0, min_timeout=0.2, **options)
+        fn = FakeEndpoint("block", "hedged")
+        timer = threading.Timer(0.1, fn.released.set)
+        timer.start()
+        assert call(upstream_client, fn, prime=0.01) == "late"
+        assert fn.requests == 1
+        assert upstream_client.endpoint_stats["places"].hedges == 0
+
+
+def test_hedge_needs_a_spare_token():
+    upstream_client = client(qps={"places": 1.0}, hedge_endpoints=["places"], hedge_budget=1.0,
+                             timeout=5.0, min_timeout=0.3)
+    fn = FakeEndpoint("block", "hedged")
+    timer = threading.Timer(0.1, fn.released.set)
+    timer.start()
+    assert call(upstream_client, fn, prime=0.01) == "late"
+    assert upstream_client.endpoint_stats["places"].hedges == 0
+
+
+def test_attempt_timeout_is_published_to_the_request_thread():
+    upstream_client = client(timeout=4.0)
+    fn = FakeEndpoint("ok")
+    assert call(upstream_client, fn) == "ok"
+    assert fn.timeouts == [4.0]
+    assert attempt_timeout() is None
+
+
+def test_waiting_for_a_thread_is_not_upstream_latency():
+    upstream_client = client(max_concurrency=1, max_retries=0, timeout=5.0, min_timeout=0.1)
+    slow = FakeEndpoint("block")
+    fast = FakeEndpoint("ok")
+
+    async def main():
+        upstream_client._bucket("places")
+        latency = upstream_client.latencies["places"]
+        for _ in range(latency.min_samples):
+            latency.record(0.01)
+        # The only thread is held for 0.3s, well past the 0.1s adaptive timeout
+        blocked = asyncio.ensure_future(upstream_client.call("places", slow))
+        await asyncio.sleep(0.01)
+        threading.Timer(0.3, slow.released.set).start()
+        queued = await upstream_client.call("places", fast)
+        with pytest.raises(UpstreamUnavailableError):
+            await blocked
+        return queued, max(list(latency.latencies)[latency.min_samples:])
+
+    try:
+        queued, recorded = asyncio.run(main())
+    finally:
+        slow.released.set()
+        upstream_client.close()
+    assert queued == "ok"
+    # Only the blocked attempt timed out; its timeout is the largest sample recorded
+    assert upstream_client.endpoint_stats["places"].timeouts == 1
+    assert recorded == pytest.approx(0.1)
+
+
+def test_queue_wait_is_bounded_by_the_timeout_ceiling():
+    upstream_client = client(max_concurrency=1, max_retries=0, timeout=0.1, min_timeout=0.1)
+    slow = FakeEndpoint("block")
+    fast = FakeEndpoint("ok")
+
+    async def main():
+        blocked = asyncio.ensure_future(upstream_client.call("places", slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(UpstreamUnavailableError):
+            await upstream_client.call("places", fast)
+        with pytest.raises(UpstreamUnavailableError):
+            await blocked
+
+    try:
+        asyncio.run(main())
+    finally:
+        slow.released.set()
+        upstream_client.close()
+    stats = upstream_client.endpoint_stats["places"]
+    assert (stats.queue_timeouts, stats.timeouts) == (1, 1)
+    # The queued request was withdrawn, never sent
+    assert fast.requests == 0
+
+
+def test_hedge_needs_an_idle_thread():
+    upstream_client = client(max_concurrency=1, hedge_endpoints=["places"], hedge_budget=1.0,
+                             timeout=5.0, min_timeout=0.3)
+    fn = FakeEndpoint("block", "hedged")
+    threading.Timer(0.1, fn.released.set).start()
+    assert call(upstream_client, fn, prime=0.01) == "late"
+    assert upstream_client.endpoint_stats["places"].hedges == 0
+
+
+def test_hedge_budget_covers_recent_calls_only():
+    upstream_client = client(hedge_endpoints=["places"], hedge_budget=0.05, latency_window=100)
+    upstream_client._bucket("places")
+    stats = upstream_client.endpoint_stats["places"]
+    # Hours of calm traffic don't bank hedges for the next slowdown
+    stats.calls = 100000
+    allowed = 0
+    while upstream_client._may_hedge("places"):
+        upstream_client.recent_hedges["places"].append(stats.calls)
+        allowed += 1
+    assert allowed == 5
+    # Once those hedges are older than the window the budget is free again
+    stats.calls += 100
+    assert upstream_client._may_hedge("places")
+    upstream_client.close()
+
+
+def test_endpoints_of_one_api_share_its_quota():
+    upstream_client = client(qps={"geocoding": 2.0}, quotas={"geocode": "geocoding", "reverse_geocode": "geocoding"})
+    geocode = upstream_client._bucket("geocode")
+    assert upstream_client._bucket("reverse_geocode") is geocode
+    assert upstream_client._bucket("places") is not geocode
+    assert geocode.try_acquire() and geocode.try_acquire()
+    assert not upstream_client._bucket("reverse_geocode").try_acquire()
+    # Stats stay per endpoint
+    assert set(upstream_client.endpoint_stats) == {"geocode", "reverse_geocode", "places"}
+    upstream_client.close()
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import threading
+from services.warm_start import QueryLog
+
+
+def test_record_only_buffers(tmp_path, monkeypatch):
+    log = QueryLog(str(tmp_path / "queries.log"), max_buffer=3)
+    writers = []
+    monkeypatch.setattr(log, "write", lambda lines: writers.append((threading.current_thread(), len(lines))))
+
+    async def main():
+        log.record("coffee in Oakland")
+        log.record("tacos in Berkeley")
+        # The third query fills the buffer and starts a flush, but doesn't wait for it
+        log.record("coffee in Oakland")
+        assert writers == []
+        await log._flushing
+
+    asyncio.run(main())
+    assert len(writers) == 1
+    thread, lines = writers[0]
+    assert thread is not threading.main_thread()
+    assert lines == 3
+
+
+def test_flush_appends_and_top_queries_reads_back(tmp_path):
+    path = str(tmp_path / "logs" / "queries.log")
+    log = QueryLog(path)
+
+    async def main():
+        for query in ["coffee in Oakland", "tacos  in Berkeley", "coffee in Oakland"]:
+            log.record(query)
+        await log.flush()
+        await log.flush()  # nothing buffered: no empty write
+
+    asyncio.run(main())
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    assert log.top_queries(2, window=60) == ["coffee in Oakland", "tacos in Berkeley"]
+
+
+def test_log_rotates_past_max_bytes(tmp_path):
+    path = str(tmp_path / "queries.log")
+    log = QueryLog(path, max_bytes=100)
+    log.write(["x" * 200])
+    log.write(["y"])
+    assert os.path.exists(f"{path}.1")
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "y\n"